@@ -6,13 +6,78 @@ Integra Audiveris (PDF → MusicXML) y music21 (análisis musical)
 
 import os
 import sys
+import glob
+import time
+import shutil
+import struct
+import zipfile
 import subprocess
+import multiprocessing
+import xml.etree.ElementTree as ET
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
 from pathlib import Path
-from music21 import converter
+from cache_partituras import CacheConversion, CachePartituras, CachePaginas
+from lector_musicxml import LectorMusicXML, NotaXML, ErrorLecturaMusicXML, dividir_partes, cabecera_de_parte
+from lector_midi import LectorMIDI, ErrorLecturaMIDI
+import exportadores
+from instrumentacion import Instrumentacion, medir_etapa, ejecutar_subproceso
+from importacion_diferida import modulo_diferido
+from trabajo_temporal import directorio_trabajo, mover_atomico
+
+# Módulos pesados: se importan al usarlos por primera vez (arranque rápido de la CLI)
+music21 = modulo_diferido('music21')
+tabla_notas = modulo_diferido('tabla_notas')
+indice_partitura = modulo_diferido('indice_partitura')
+fragmentos_omr = modulo_diferido('fragmentos_omr')
+
+# Análisis por partes en paralelo con music21: cada proceso tarda ~1 s en arrancar
+# e importar music21 y el análisis avanza ~3 MB/s, así que por debajo de unos
+# 8 MB de XML (sin comprimir) es más rápido analizar la partitura de una vez
+TAMANO_MINIMO_POR_PARTES = 8 * 1024 * 1024
 
 class ConversorPartitura:
-    def __init__(self):
+    def __init__(self, usar_cache=True, directorio_cache=None, limite_cache_mb=None, formato='txt',
+                 paginas_por_fragmento=None, trabajos_fragmentos=None, incremental=False,
+                 archivo_metricas=None, directorio_trabajo=None, trabajos_partes=None,
+                 rango_compases=None, guardar_indice=False):
         self.audiveris_path = "/opt/audiveris/bin/Audiveris"
+        # Formato de exportación de las notas (ver exportadores.FORMATOS)
+        self.formato = formato
+        # Reconocimiento fragmentado: páginas por ejecución de Audiveris (None = PDF completo)
+        self.paginas_por_fragmento = paginas_por_fragmento
+        self.trabajos_fragmentos = trabajos_fragmentos
+        # Reprocesamiento incremental: reconocer página por página y reutilizar las no modificadas
+        self.incremental = incremental
+        # Métricas por etapa (desactivadas si no se indica un archivo JSON Lines ni hooks)
+        self.archivo_metricas = archivo_metricas
+        self.instrumentacion = Instrumentacion(archivo_metricas)
+        # Carpeta donde se crea el directorio de trabajo de cada conversión
+        # (None = BARDONEON_SCRATCH_DIR, /dev/shm o la carpeta temporal del sistema)
+        self.directorio_trabajo = directorio_trabajo
+        # Procesos para analizar con music21 las partes de una partitura grande
+        # (None o 1 = secuencial). Los procesos se crean con 'spawn': un script que
+        # use el conversor debe proteger su código con if __name__ == '__main__'
+        self.trabajos_partes = trabajos_partes
+        # Filtro de compases (desde, hasta) de las notas mostradas y exportadas (None = todas)
+        self.rango_compases = rango_compases
+        # Guardar el índice de compases junto a la exportación (siempre que se filtra)
+        self.guardar_indice = guardar_indice or rango_compases is not None
+        self.opciones_audiveris = ['-batch', '-export']
+        self._version_audiveris = None
+        # Cachés de conversiones PDF → MXL y de partituras de music21 (None = desactivadas)
+        self.directorio_cache = directorio_cache
+        self.limite_cache_mb = limite_cache_mb
+        self.cache = None
+        self.cache_partituras = None
+        self.cache_paginas = None
+        if usar_cache:
+            base = Path(directorio_cache) if directorio_cache else None
+            self.cache = CacheConversion(base / 'mxl' if base else None, limite_cache_mb or 2048)
+            self.cache_partituras = CachePartituras(base / 'partituras' if base else None,
+                                                    limite_cache_mb or 1024)
+            self.cache_paginas = CachePaginas(base / 'paginas' if base else None, limite_cache_mb or 2048)
+        # Memoria aproximada que reserva cada JVM de Audiveris (en MB)
+        self.memoria_por_trabajo_mb = 2048
         # Mapeo de nombres anglosajones a latinos
         self.nombres_latino = {
             'C': 'Do',
@@ -31,6 +96,23 @@ class ConversorPartitura:
             return False
         return True
     
+    def obtener_version_audiveris(self):
+        """
+        Identifica la instalación de Audiveris para invalidar la caché al actualizarla
+        
+        Usa el nombre del JAR de Audiveris si se encuentra; si no, el tamaño y la
+        fecha de modificación del ejecutable.
+        """
+        if self._version_audiveris is None:
+            ejecutable = Path(self.audiveris_path)
+            jars = sorted((ejecutable.parent.parent / 'lib').glob('audiveris*.jar'))
+            if jars:
+                self._version_audiveris = jars[-1].name
+            else:
+                info = ejecutable.stat()
+                self._version_audiveris = f"{info.st_size}-{int(info.st_mtime)}"
+        return self._version_audiveris
+    
     def convertir_nota_a_latino(self, nombre_nota):
         """
         Convierte un nombre de nota del formato anglo (C, D, E...) al latino (Do, Re, Mi...)
@@ -56,6 +138,7 @@ class ConversorPartitura:
         else:
             return nombre_nota  # Si no se puede convertir, devolver original
     
+    @medir_etapa('convertir_pdf_a_mxl')
     def convertir_pdf_a_mxl(self, pdf_path, output_path=None):
         """
         Convierte PDF a MusicXML usando Audiveris
@@ -81,24 +164,47 @@ class ConversorPartitura:
         if not output_path:
             output_path = str(Path(pdf_path).with_suffix('.mxl'))
         
-        try:
-            # Ejecutar Audiveris en modo batch
-            cmd = [self.audiveris_path, '-batch', '-export', pdf_path]
-            result = subprocess.run(
-                cmd, 
-                capture_output=True, 
-                text=True, 
-                cwd=Path(pdf_path).parent  # Ejecutar en el directorio del PDF
-            )
-            
-            # Verificar que se generó el archivo
-            if Path(output_path).exists():
-                return output_path
-            else:
-                print("ERROR: No se generó el archivo MXL")
-                if result.stderr:
-                    print(f"ERROR: {result.stderr}")
+        # Reconocer solo las páginas que cambiaron desde la última conversión
+        if self.incremental:
+            if self.cache_paginas:
+                return self.convertir_pdf_incremental(pdf_path, output_path)
+            print("⚠️  El modo incremental necesita la caché; se convierte el PDF completo")
+        
+        # Las partituras largas se reconocen por fragmentos en paralelo
+        if self.paginas_por_fragmento:
+            try:
+                paginas = fragmentos_omr.contar_paginas(pdf_path)
+            except Exception as e:
+                print(f"ERROR: No se pudo abrir el PDF: {e}")
                 return None
+            if paginas > self.paginas_por_fragmento:
+                return self.convertir_pdf_fragmentado(pdf_path, output_path)
+        
+        # Buscar la conversión en la caché antes de lanzar Audiveris
+        clave, recuperado = self._buscar_en_cache(pdf_path, output_path)
+        if recuperado:
+            return output_path
+        
+        try:
+            # Ejecutar Audiveris en modo batch sobre una copia del PDF en un directorio
+            # propio: sus archivos (.omr, .log, .mxl) no tocan la carpeta del PDF
+            with directorio_trabajo(self.directorio_trabajo) as trabajo:
+                copia = Path(trabajo) / Path(pdf_path).name
+                shutil.copyfile(pdf_path, copia)
+                cmd = [self.audiveris_path, *self.opciones_audiveris, str(copia)]
+                result = self._ejecutar_subproceso(cmd, cwd=trabajo)
+                
+                # Verificar que se generó el archivo
+                generado = copia.with_suffix('.mxl')
+                if generado.exists():
+                    self._guardar_en_cache(clave, generado)
+                    mover_atomico(generado, output_path)
+                    return output_path
+                else:
+                    print("ERROR: No se generó el archivo MXL")
+                    if result.stderr:
+                        print(f"ERROR: {result.stderr}")
+                    return None
                 
         except subprocess.SubprocessError as e:
             print(f"ERROR: {e}")
@@ -107,129 +213,391 @@ class ConversorPartitura:
             print(f"ERROR: {e}")
             return None
     
-    def exportar_notas_txt(self, notas, archivo_txt, titulo="Sin título", compositor="Desconocido"):
+    @medir_etapa('convertir_pdfs_a_mxl')
+    def convertir_pdfs_a_mxl(self, pdf_paths, directorio_salida=None):
         """
-        Exporta todas las notas a un archivo de texto
+        Convierte varios PDFs a MusicXML con una sola invocación de Audiveris,
+        pagando el arranque de la JVM una única vez para todo el grupo
         
         Args:
-            notas (list): Lista de notas extraídas de music21
-            archivo_txt (str): Ruta del archivo TXT de salida
-            titulo (str): Título de la partitura
-            compositor (str): Compositor de la partitura
+            pdf_paths (list): Rutas a los archivos PDF
+            directorio_salida (str): Carpeta donde dejar los MXL (una subcarpeta por
+                                     PDF, así dos PDFs con el mismo nombre no chocan);
+                                     None = junto a cada PDF
+        
+        Returns:
+            dict: {pdf_path: ruta al MXL generado, o None si falló ese archivo}
         """
+        resultados = {}
         
+        if not self.verificar_audiveris():
+            return {pdf_path: None for pdf_path in pdf_paths}
+        
+        # Descartar los que no existen y los que ya están en la caché
+        pendientes = []
+        for indice, pdf_path in enumerate(pdf_paths):
+            if not Path(pdf_path).exists():
+                print(f"ERROR: El archivo PDF '{pdf_path}' no existe")
+                resultados[pdf_path] = None
+                continue
+            
+            if directorio_salida:
+                carpeta = Path(directorio_salida) / str(indice)
+                carpeta.mkdir(parents=True, exist_ok=True)
+                output_path = str(carpeta / f"{Path(pdf_path).stem}.mxl")
+            else:
+                output_path = str(Path(pdf_path).with_suffix('.mxl'))
+            clave, recuperado = self._buscar_en_cache(pdf_path, output_path)
+            if recuperado:
+                resultados[pdf_path] = output_path
+            else:
+                pendientes.append((pdf_path, output_path, clave))
+        
+        if not pendientes:
+            return resultados
+        
+        hubo_fallos = False
+        with directorio_trabajo(self.directorio_trabajo) as trabajo:
+            # Copias de las entradas en el directorio de trabajo (una subcarpeta por
+            # PDF, por si dos tienen el mismo nombre en carpetas distintas)
+            copias = []
+            for indice, (pdf_path, _, _) in enumerate(pendientes):
+                carpeta = Path(trabajo) / str(indice)
+                carpeta.mkdir()
+                copias.append(carpeta / Path(pdf_path).name)
+                shutil.copyfile(pdf_path, copias[-1])
+            
+            # Una sola ejecución de Audiveris con todas las entradas pendientes
+            result = self._ejecutar_audiveris(copias)
+            
+            # Asociar cada MXL exportado con su PDF de origen
+            for (pdf_path, output_path, clave), copia in zip(pendientes, copias):
+                generado = copia.with_suffix('.mxl')
+                if generado.exists():
+                    self._guardar_en_cache(clave, generado)
+                    resultados[pdf_path] = mover_atomico(generado, output_path)
+                else:
+                    print(f"ERROR: No se generó el archivo MXL para '{pdf_path}'")
+                    resultados[pdf_path] = None
+                    hubo_fallos = True
+        
+        if hubo_fallos and result is not None and result.stderr:
+            print(f"ERROR: {result.stderr}")
+        
+        return {pdf_path: resultados[pdf_path] for pdf_path in pdf_paths}
+    
+    def _ejecutar_audiveris(self, pdf_paths):
+        """
+        Ejecuta Audiveris en modo batch sobre uno o varios PDFs
+        
+        Returns:
+            subprocess.CompletedProcess|None: Resultado de la ejecución, None si no se pudo lanzar
+        """
         try:
-            with open(archivo_txt, 'w', encoding='utf-8') as f:
-                # Encabezado del archivo
-                f.write("=" * 80 + "\n")
-                f.write("ANÁLISIS MUSICAL - NOTAS EXTRAÍDAS\n")
-                f.write("=" * 80 + "\n\n")
-                f.write(f"Título: {titulo}\n")
-                f.write(f"Compositor: {compositor}\n")
-                f.write(f"Total de notas: {len(notas)}\n")
-                f.write(f"Fecha de análisis: {self.obtener_fecha_actual()}\n\n")
-                
-                f.write("-" * 80 + "\n")
-                f.write("LISTADO COMPLETO DE NOTAS\n")
-                f.write("-" * 80 + "\n\n")
-                
-                # Encabezado de la tabla (sin columnas de offset y duración)
-                f.write(f"{'Nº':<4} {'Tipo':<8} {'Nota/Acorde':<20} {'Octava':<7} {'Compás':<7}\n")
-                f.write("-" * 50 + "\n")
+            cmd = [self.audiveris_path, *self.opciones_audiveris,
+                   *(str(Path(pdf_path).resolve()) for pdf_path in pdf_paths)]
+            return self._ejecutar_subproceso(cmd, cwd=Path(pdf_paths[0]).parent)
+        except (subprocess.SubprocessError, OSError) as e:
+            print(f"ERROR: {e}")
+            return None
+    
+    def _ejecutar_subproceso(self, cmd, cwd):
+        """
+        Ejecuta un comando capturando su salida y registra su duración, código de
+        salida y el uso de CPU y memoria de ese subproceso
+        """
+        inicio = time.perf_counter()
+        codigo = uso = None
+        try:
+            result, uso = ejecutar_subproceso(cmd, cwd=cwd)
+            codigo = result.returncode
+            return result
+        finally:
+            self.instrumentacion.registrar_subproceso(cmd, codigo, time.perf_counter() - inicio, uso)
+    
+    def convertir_pdf_fragmentado(self, pdf_path, output_path=None):
+        """
+        Convierte un PDF a MusicXML reconociendo fragmentos de páginas en paralelo
+        
+        Cada fragmento se reconoce con su propia ejecución de Audiveris y los
+        resultados se unen en orden de páginas con numeración de compases
+        continua, de modo que la latencia total es aproximadamente la del
+        fragmento más lento.
+        
+        Args:
+            pdf_path (str): Ruta al archivo PDF
+            output_path (str): Ruta de salida opcional (si no se especifica, usa el mismo nombre)
+        
+        Returns:
+            str|None: Ruta al archivo MXL unido o None si falla algún fragmento
+        """
+        if not self.verificar_audiveris():
+            return None
+        
+        if not output_path:
+            output_path = str(Path(pdf_path).with_suffix('.mxl'))
+        
+        # El resultado unido se guarda en la caché con su propia clave
+        opciones = [*self.opciones_audiveris, f"fragmentos={self.paginas_por_fragmento}"]
+        clave, recuperado = self._buscar_en_cache(pdf_path, output_path, opciones)
+        if recuperado:
+            return output_path
+        
+        with directorio_trabajo(self.directorio_trabajo, 'bardoneon_fragmentos_') as directorio:
+            fragmentos = fragmentos_omr.dividir_pdf(pdf_path, self.paginas_por_fragmento, directorio)
+            print(f"🧩 Reconociendo {len(fragmentos)} fragmentos de {self.paginas_por_fragmento} páginas")
+            archivos_mxl = self._reconocer_fragmentos(fragmentos)
+            if archivos_mxl is None:
+                return None
+            
+            try:
+                unido = str(Path(directorio) / Path(output_path).name)
+                compases = fragmentos_omr.unir_musicxml(archivos_mxl, unido)
+                self._guardar_en_cache(clave, unido)
+                mover_atomico(unido, output_path)
+            except (ET.ParseError, ErrorLecturaMusicXML, zipfile.BadZipFile, OSError) as e:
+                print(f"ERROR: No se pudieron unir los fragmentos: {e}")
+                return None
+        
+        print(f"🧩 Fragmentos unidos en {output_path} ({compases} compases)")
+        return output_path
+    
+    def _reconocer_fragmentos(self, fragmentos):
+        """
+        Reconoce varios PDFs, cada uno con su propia ejecución de Audiveris en paralelo
+        
+        Args:
+            fragmentos (list): Rutas de los PDFs a reconocer
+        
+        Returns:
+            list|None: MXL de cada PDF en el mismo orden, o None si falla alguno
+        """
+        trabajos = min(len(fragmentos), self.calcular_trabajos_paralelos(self.trabajos_fragmentos))
+        print(f"⚙️  {trabajos} ejecuciones simultáneas de Audiveris")
+        
+        # Cada hilo solo espera a su proceso de Audiveris
+        with ThreadPoolExecutor(max_workers=trabajos) as pool:
+            ejecuciones = list(pool.map(lambda fragmento: self._ejecutar_audiveris([fragmento]), fragmentos))
+        
+        archivos_mxl = []
+        for fragmento, result in zip(fragmentos, ejecuciones):
+            archivo_mxl = Path(fragmento).with_suffix('.mxl')
+            if not archivo_mxl.exists():
+                print(f"ERROR: No se generó el archivo MXL de '{Path(fragmento).name}'")
+                if result is not None and result.stderr:
+                    print(f"ERROR: {result.stderr}")
+                return None
+            archivos_mxl.append(str(archivo_mxl))
+        
+        return archivos_mxl
+    
+    def convertir_pdf_incremental(self, pdf_path, output_path=None):
+        """
+        Convierte un PDF a MusicXML reconociendo solo las páginas modificadas
+        
+        Cada página se identifica por el hash de su contenido y su reconocimiento
+        se guarda en la caché de páginas. Al volver a enviar un PDF con algunas
+        páginas corregidas, solo esas se reconocen de nuevo (en paralelo); el
+        MusicXML completo se vuelve a unir con las páginas ya reconocidas.
+        
+        Args:
+            pdf_path (str): Ruta al archivo PDF
+            output_path (str): Ruta de salida opcional (si no se especifica, usa el mismo nombre)
+        
+        Returns:
+            str|None: Ruta al archivo MXL unido o None si falla alguna página
+        """
+        if not self.verificar_audiveris():
+            return None
+        
+        if not output_path:
+            output_path = str(Path(pdf_path).with_suffix('.mxl'))
+        
+        try:
+            hashes = fragmentos_omr.hashes_paginas(pdf_path)
+        except Exception as e:
+            print(f"ERROR: No se pudo abrir el PDF: {e}")
+            return None
+        
+        version = self.obtener_version_audiveris()
+        claves = [self.cache_paginas.calcular_clave(h, version, self.opciones_audiveris) for h in hashes]
+        entradas = [self.cache_paginas.obtener(clave) for clave in claves]
+        pendientes = [pagina for pagina, entrada in enumerate(entradas) if entrada is None]
+        
+        print(f"♻️  Páginas sin cambios: {len(hashes) - len(pendientes)} de {len(hashes)}")
+        
+        with directorio_trabajo(self.directorio_trabajo, 'bardoneon_paginas_') as directorio:
+            if pendientes:
+                print(f"📄 Reconociendo páginas: {', '.join(str(p + 1) for p in pendientes)}")
+                paginas_pdf = fragmentos_omr.extraer_paginas(pdf_path, pendientes, directorio)
+                archivos_mxl = self._reconocer_fragmentos(paginas_pdf)
+                if archivos_mxl is None:
+                    return None
                 
-                # Exportar todas las notas (sin offset y duración)
-                for i, nota in enumerate(notas):
+                for pagina, archivo_mxl in zip(pendientes, archivos_mxl):
+                    entradas[pagina] = archivo_mxl
                     try:
-                        if hasattr(nota, 'pitch'):  # Nota simple
-                            nota_latino = self.convertir_nota_a_latino(nota.pitch.name)
-                            f.write(f"{i+1:<4} {'Nota':<8} {nota_latino:<20} "
-                                   f"{nota.pitch.octave:<7} "
-                                   f"{nota.measureNumber if nota.measureNumber else 'N/A':<7}\n")
-                        elif hasattr(nota, 'pitches'):  # Acorde
-                            notas_acorde = [self.convertir_nota_a_latino(p.name) for p in nota.pitches]
-                            acorde_str = '/'.join(notas_acorde)
-                            f.write(f"{i+1:<4} {'Acorde':<8} {acorde_str:<20} "
-                                   f"{'Multi':<7} "
-                                   f"{nota.measureNumber if nota.measureNumber else 'N/A':<7}\n")
-                        else:
-                            f.write(f"{i+1:<4} {'Otro':<8} {type(nota).__name__:<20} "
-                                   f"{'N/A':<7} "
-                                   f"{nota.measureNumber if nota.measureNumber else 'N/A':<7}\n")
-                    except Exception as e:
-                        f.write(f"{i+1:<4} {'Error':<8} {'Error al procesar':<20} "
-                               f"{'N/A':<7} {'N/A':<7}\n")
-                
-                # Fin del archivo (se removió el resumen estadístico)
-                f.write("\n" + "=" * 50 + "\n")
-                f.write("Fin del análisis\n")
-                f.write("=" * 50 + "\n")
+                        self.cache_paginas.guardar(claves[pagina], archivo_mxl)
+                    except OSError as e:
+                        print(f"ERROR guardando en la caché: {e}")
             
-            print(f"📄 Notas exportadas a: {archivo_txt}")
+            try:
+                unido = str(Path(directorio) / Path(output_path).name)
+                compases = fragmentos_omr.unir_musicxml([str(e) for e in entradas], unido)
+                mover_atomico(unido, output_path)
+            except (ET.ParseError, ErrorLecturaMusicXML, zipfile.BadZipFile, OSError) as e:
+                print(f"ERROR: No se pudieron unir las páginas: {e}")
+                return None
+        
+        print(f"🧩 Páginas unidas en {output_path} ({compases} compases)")
+        return output_path
+    
+    def _buscar_en_cache(self, pdf_path, output_path, opciones=None):
+        """
+        Busca la conversión de un PDF en la caché y, si existe, la copia a output_path
+        
+        Args:
+            opciones (list): Opciones que identifican la conversión (por defecto, las de Audiveris)
+        
+        Returns:
+            tuple: (clave de caché o None, True si se recuperó de la caché)
+        """
+        if not self.cache:
+            return None, False
+        
+        try:
+            clave = self.cache.calcular_clave(pdf_path, self.obtener_version_audiveris(),
+                                              opciones or self.opciones_audiveris)
+            entrada = self.cache.obtener(clave)
+            if entrada:
+                shutil.copyfile(entrada, output_path)
+                print(f"♻️  Conversión recuperada de la caché: {output_path}")
+                return clave, True
+            return clave, False
+        except OSError as e:
+            print(f"ERROR accediendo a la caché: {e}")
+            return None, False
+    
+    def _guardar_en_cache(self, clave, archivo_mxl):
+        """Guarda un MXL recién generado en la caché (si está activada)"""
+        if not clave:
+            return
+        try:
+            self.cache.guardar(clave, archivo_mxl)
+        except OSError as e:
+            print(f"ERROR guardando en la caché: {e}")
+    
+    def exportar_notas_txt(self, tabla, archivo_txt, titulo=None, compositor=None):
+        """
+        Exporta todas las notas a un archivo de texto
+        
+        Args:
+            tabla (TablaNotas): Tabla de notas extraídas
+            archivo_txt (str): Ruta del archivo TXT de salida
+            titulo (str): Título de la partitura (por defecto, el de la tabla)
+            compositor (str): Compositor de la partitura (por defecto, el de la tabla)
+        """
+        return self.exportar_notas(tabla, archivo_txt, 'txt', titulo, compositor)
+    
+    @medir_etapa('exportar_notas')
+    def exportar_notas(self, tabla, archivo_salida, formato=None, titulo=None, compositor=None):
+        """
+        Exporta todas las notas en el formato indicado (txt, csv, jsonl o npz)
+        
+        Args:
+            tabla (TablaNotas): Tabla de notas extraídas
+            archivo_salida (str): Ruta del archivo de salida
+            formato (str): Formato de salida (por defecto, self.formato)
+            titulo (str): Título de la partitura (solo TXT)
+            compositor (str): Compositor de la partitura (solo TXT)
+        
+        Returns:
+            bool: True si se exportó correctamente
+        """
+        formato = formato or self.formato
+        try:
+            exportadores.exportar(tabla, archivo_salida, formato, titulo, compositor,
+                                  self.obtener_fecha_actual())
+            print(f"📄 Notas exportadas a: {archivo_salida}")
             return True
-            
         except Exception as e:
             print(f"ERROR: {e}")
             return False
     
+    def archivo_exportacion(self, archivo):
+        """Ruta del archivo de notas exportadas para una partitura o PDF"""
+        return str(Path(archivo).with_suffix(exportadores.FORMATOS[self.formato]))
+    
     def obtener_fecha_actual(self):
         """Obtiene la fecha y hora actual en formato legible"""
         from datetime import datetime
         return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
     
-    def limpiar_archivos_temporales(self, archivo_base, mantener_txt=True, incluir_mxl=True):
+    def como_nota_xml(self, nota, parte=None):
+        """
+        Convierte una nota o acorde de music21 al formato NotaXML del lector rápido
+        
+        Args:
+            nota: Elemento de music21 (Note, Chord...)
+            parte (int): Índice de la parte a la que pertenece
+        
+        Returns:
+            NotaXML: Tipo, nombres, octavas, compás, offset y duración del elemento
+        """
+        return nota_music21_a_xml(nota, parte)
+    
+    def cargar_partitura(self, archivo):
         """
-        Elimina archivos temporales generados por Audiveris
+        Carga una partitura con music21, reutilizando la versión congelada de la caché
+        si el archivo ya se analizó antes con la misma versión de music21
         
         Args:
-            archivo_base (str): Ruta base del archivo (sin extensión)
-            mantener_txt (bool): Si True, mantiene el archivo .txt
-            incluir_mxl (bool): Si True, también elimina archivos .mxl
+            archivo (str): Ruta a la partitura (MusicXML o MIDI)
+        
+        Returns:
+            music21.stream.Score: Partitura analizada
         """
+        if not self.cache_partituras:
+            return music21.converter.parse(archivo)
         
-        # Siempre eliminar archivos temporales (.omr y .log)
-        extensiones_temporales = ['.omr']
-        if incluir_mxl:
-            extensiones_temporales.append('.mxl')
-            
-        archivos_eliminados = []
+        from music21 import freezeThaw
         
+        clave = None
         try:
-            # Obtener el directorio y nombre base del archivo
-            path_base = Path(archivo_base)
-            directorio = path_base.parent
-            nombre_base = path_base.stem
-            
-            # Buscar y eliminar archivos específicos del proyecto
-            for extension in extensiones_temporales:
-                archivo_temp = directorio / f"{nombre_base}{extension}"
-                if archivo_temp.exists():
-                    try:
-                        archivo_temp.unlink()
-                        archivos_eliminados.append(str(archivo_temp))
-                    except Exception as e:
-                        print(f"ERROR eliminando {archivo_temp.name}: {e}")
-            
-            # Buscar y eliminar TODOS los archivos .log en el directorio actual
-            log_files = list(directorio.glob("*.log"))
-            for log_file in log_files:
-                try:
-                    log_file.unlink()
-                    archivos_eliminados.append(str(log_file))
-                except Exception as e:
-                    print(f"ERROR eliminando {log_file.name}: {e}")
-                
+            clave = self.cache_partituras.calcular_clave(archivo, music21.VERSION_STR)
+            entrada = self.cache_partituras.obtener(clave)
+            if entrada:
+                thawer = freezeThaw.StreamThawer()
+                thawer.openStr(entrada.read_bytes())
+                print("♻️  Partitura recuperada de la caché")
+                return thawer.stream
         except Exception as e:
-            print(f"ERROR durante la limpieza: {e}")
+            print(f"ERROR accediendo a la caché de partituras: {e}")
         
-        return archivos_eliminados
+        score = music21.converter.parse(archivo)
+        
+        if clave:
+            try:
+                datos = freezeThaw.StreamFreezer(score).writeStr(fmt='pickle')
+                self.cache_partituras.guardar_bytes(clave, datos)
+            except Exception as e:
+                print(f"ERROR guardando en la caché de partituras: {e}")
+        
+        return score
     
-    def leer_partitura(self, archivo_mxl, exportar_txt=True):
+    @medir_etapa('leer_partitura')
+    def leer_partitura(self, archivo_mxl, exportar_txt=True, analisis_completo=False, archivo_salida=None):
         """
         Lee una partitura MusicXML y extrae información musical
         
+        Los archivos MusicXML y MIDI se leen con los lectores rápidos (sin music21);
+        music21 se usa cuando se pide el análisis completo o si el lector rápido falla.
+        
         Args:
             archivo_mxl (str): Ruta al archivo MusicXML
             exportar_txt (bool): Si True, exporta las notas a un archivo .txt
+            analisis_completo (bool): Si True, fuerza el análisis con music21
+            archivo_salida (str): Archivo de exportación (por defecto, junto a la partitura)
         
         Returns:
             bool: True si se procesó correctamente, False en caso contrario
@@ -250,132 +618,575 @@ class ConversorPartitura:
             return False
         
         try:
-            print(f"\n🎼 Analizando partitura con music21...")
-            print(f"📄 Cargando archivo: {archivo_mxl}")
-            score = converter.parse(archivo_mxl)
-            
-            # Información general de la partitura
-            titulo = score.metadata.title if score.metadata and score.metadata.title else 'Sin título'
-            compositor = score.metadata.composer if score.metadata and score.metadata.composer else 'Desconocido'
-            
-            print(f"🎵 Título: {titulo}")
-            print(f"🎼 Compositor: {compositor}")
-            
-            # Contar elementos
-            notas = list(score.recurse().notes)
-            compases = len(score.parts[0].getElementsByClass('Measure')) if score.parts else 0
-            
-            print(f"\n📊 Estadísticas:")
-            print(f"   • Total de notas: {len(notas)}")
-            print(f"   • Número de compases: {compases}")
-            print(f"   • Número de partes: {len(score.parts)}")
-            
-            print(f"\n🎶 Primeras 20 notas:")
-            print("-" * 70)
-            
-            for i, nota in enumerate(notas[:20]):
-                try:
-                    if hasattr(nota, 'pitch'):  # Nota simple
-                        nota_latino = self.convertir_nota_a_latino(nota.pitch.name)
-                        print(f"{i+1:3d}. Nota: {nota_latino:<3} "
-                              f"Octava: {nota.pitch.octave} "
-                              f"Compás: {nota.measureNumber if nota.measureNumber else 'N/A':<3} "
-                              f"Offset: {float(nota.offset):<6.2f} "
-                              f"Duración: {nota.quarterLength}")
-                    elif hasattr(nota, 'pitches'):  # Acorde
-                        notas_acorde = [self.convertir_nota_a_latino(p.name) for p in nota.pitches]
-                        print(f"{i+1:3d}. Acorde: {'/'.join(notas_acorde):<12} "
-                              f"Compás: {nota.measureNumber if nota.measureNumber else 'N/A':<3} "
-                              f"Offset: {float(nota.offset):<6.2f} "
-                              f"Duración: {nota.quarterLength}")
-                    else:
-                        print(f"{i+1:3d}. Elemento musical (tipo: {type(nota).__name__})")
-                        
-                except AttributeError as e:
-                    print(f"{i+1:3d}. Error procesando nota: {e}")
-            
-            if len(notas) > 20:
-                print(f"... y {len(notas) - 20} notas más")
-
-            # Exportar a archivo TXT si se solicita
-            if exportar_txt:
-                archivo_txt = str(Path(archivo_mxl).with_suffix('.txt'))
-                self.exportar_notas_txt(notas, archivo_txt, titulo, compositor)
-            
-            return True
-            
+            tabla = self.extraer_tabla(archivo_mxl, analisis_completo)
+            if self.guardar_indice:
+                salida = archivo_salida or self.archivo_exportacion(archivo_mxl)
+                indice = self.obtener_indice(tabla, archivo_mxl,
+                                             self.archivo_indice(salida) if exportar_txt else None)
+                if self.rango_compases:
+                    tabla = self.filtrar_compases(tabla, indice, *self.rango_compases)
+            return self._mostrar_y_exportar(archivo_mxl, tabla, exportar_txt, archivo_salida)
         except Exception as e:
             print(f"❌ Error al procesar el archivo: {e}")
             return False
     
-    def procesar_archivo_completo(self, archivo_pdf, exportar_txt=True, limpiar_temporales=True):
+    def extraer_tabla(self, archivo_mxl, analisis_completo=False):
+        """
+        Extrae las notas de una partitura a una TablaNotas en una sola pasada
+        
+        Args:
+            archivo_mxl (str): Ruta a la partitura (MusicXML o MIDI)
+            analisis_completo (bool): Si True, fuerza el análisis con music21
+        
+        Returns:
+            TablaNotas: Notas y metadatos de la partitura
+        """
+        extension = Path(archivo_mxl).suffix.lower()
+        
+        es_musicxml = extension in ('.mxl', '.xml', '.musicxml')
+        
+        if es_musicxml and not analisis_completo:
+            try:
+                print(f"\n🎼 Analizando partitura (lector rápido)...")
+                print(f"📄 Cargando archivo: {archivo_mxl}")
+                lector = LectorMusicXML(archivo_mxl)
+                tabla = tabla_notas.TablaNotas.desde_notas(lector.notas())
+                
+                # Los metadatos del lector se completan al terminar el recorrido
+                tabla.titulo = lector.titulo or 'Sin título'
+                tabla.compositor = lector.compositor or 'Desconocido'
+                tabla.compases_por_parte = lector.compases_por_parte
+                return tabla
+            except (ErrorLecturaMusicXML, ET.ParseError, zipfile.BadZipFile, ValueError) as e:
+                print(f"⚠️  Lector rápido no disponible ({e}), usando music21")
+        
+        if extension in ('.mid', '.midi') and not analisis_completo:
+            try:
+                print(f"\n🎼 Analizando MIDI (lector rápido)...")
+                print(f"📄 Cargando archivo: {archivo_mxl}")
+                lector = LectorMIDI(archivo_mxl)
+                tabla = tabla_notas.TablaNotas.desde_notas(lector.notas())
+                tabla.compases_por_parte = lector.compases_por_parte
+                return tabla
+            except (ErrorLecturaMIDI, IndexError, struct.error) as e:
+                print(f"⚠️  Lector rápido no disponible ({e}), usando music21")
+        
+        # Sin caché de partituras, music21 también puede analizar por partes (con caché
+        # se analiza la partitura completa para congelarla y reutilizarla después)
+        if es_musicxml and not self.cache_partituras:
+            tabla = self._extraer_tabla_por_partes(archivo_mxl)
+            if tabla is not None:
+                return tabla
+        
+        print(f"\n🎼 Analizando partitura con music21...")
+        print(f"📄 Cargando archivo: {archivo_mxl}")
+        score = self.cargar_partitura(archivo_mxl)
+        
+        # Información general de la partitura
+        titulo = score.metadata.title if score.metadata and score.metadata.title else 'Sin título'
+        compositor = score.metadata.composer if score.metadata and score.metadata.composer else 'Desconocido'
+        
+        # Recorrer las partes una sola vez para llenar la tabla
+        partes = list(score.parts) or [score]
+        notas = (self.como_nota_xml(nota, indice)
+                 for indice, parte in enumerate(partes)
+                 for nota in parte.recurse().notes)
+        compases_por_parte = [len(parte.getElementsByClass('Measure')) for parte in partes]
+        
+        return tabla_notas.TablaNotas.desde_notas(notas, titulo=titulo, compositor=compositor,
+                                      compases_por_parte=compases_por_parte)
+    
+    def _extraer_tabla_por_partes(self, archivo_mxl):
+        """
+        Analiza con music21 las partes de una partitura MusicXML en procesos
+        separados y une los resultados en el orden de las partes
+        
+        Cada proceso recibe un MusicXML con una sola parte; las partes con varios
+        pentagramas (PartStaff) se numeran igual que al analizar la partitura completa.
+        
+        Args:
+            archivo_mxl (str): Ruta a la partitura MusicXML
+        
+        Returns:
+            TablaNotas: Notas y metadatos de la partitura, o None si el análisis por
+                        partes está desactivado, no compensa (un núcleo, una parte,
+                        partitura pequeña) o las partes no se pueden separar
+        """
+        trabajos = min(self.trabajos_partes or 1, os.cpu_count() or 1)
+        if trabajos <= 1:
+            return None
+        
+        try:
+            cabecera, partes, cierre = dividir_partes(archivo_mxl)
+            if len(partes) < 2 or sum(len(parte) for parte in partes) < TAMANO_MINIMO_POR_PARTES:
+                return None
+            cabeceras = [cabecera_de_parte(cabecera, parte) for parte in partes]
+        except ErrorLecturaMusicXML:
+            return None
+        
+        trabajos = min(len(partes), trabajos)
+        print(f"\n🎼 Analizando {len(partes)} partes en {trabajos} procesos (music21)...")
+        print(f"📄 Cargando archivo: {archivo_mxl}")
+        
+        # 'spawn' en lugar de fork: el conversor puede estar en un proceso con varios hilos
+        with ProcessPoolExecutor(max_workers=trabajos,
+                                 mp_context=multiprocessing.get_context('spawn')) as pool:
+            # map conserva el orden de las partes: la salida no depende de cuál termina antes
+            resultados = list(pool.map(_extraer_parte_en_proceso, cabeceras, partes,
+                                       [cierre] * len(partes)))
+        
+        tablas = [tabla for tabla, _, _ in resultados]
+        _, titulo, compositor = resultados[0]
+        return tabla_notas.TablaNotas.concatenar(tablas, titulo=titulo or 'Sin título',
+                                                 compositor=compositor or 'Desconocido')
+    
+    def archivo_indice(self, archivo_salida):
+        """Ruta del índice de compases que acompaña a un archivo de notas exportadas"""
+        return str(Path(archivo_salida).with_suffix('.indice.npz'))
+    
+    def obtener_indice(self, tabla, archivo_mxl, archivo_indice=None):
+        """
+        Obtiene el índice de compases de una tabla, reutilizando el guardado si sigue vigente
+        
+        Args:
+            tabla (TablaNotas): Notas de la partitura
+            archivo_mxl (str): Partitura de la que se extrajo la tabla
+            archivo_indice (str): Dónde está o dónde guardar el índice (None = no se guarda)
+        
+        Returns:
+            IndicePartitura: Índice de la tabla
+        """
+        if archivo_indice:
+            indice = indice_partitura.IndicePartitura.cargar_vigente(archivo_indice, archivo_mxl, tabla)
+            if indice is not None:
+                print(f"♻️  Índice de compases recuperado: {archivo_indice}")
+                return indice
+        
+        indice = indice_partitura.IndicePartitura.desde_tabla(tabla)
+        if archivo_indice:
+            try:
+                indice.guardar(archivo_indice)
+                print(f"🗂️  Índice de compases guardado en: {archivo_indice}")
+            except OSError as e:
+                print(f"ERROR guardando el índice de compases: {e}")
+        return indice
+    
+    def filtrar_compases(self, tabla, indice, desde, hasta):
+        """
+        Deja en la tabla solo las notas de un rango de compases
+        
+        Args:
+            tabla (TablaNotas): Notas de la partitura
+            indice (IndicePartitura): Índice de la tabla
+            desde, hasta (int): Primer y último compás (incluidos; None = sin límite)
+        
+        Returns:
+            TablaNotas: Tabla con las notas del rango, en el mismo orden
+        """
+        filtrada = tabla.subtabla(indice.consultar(desde, hasta))
+        # Compases distintos de cada parte dentro del rango (sin suponer numeración 1..N)
+        filtrada.compases_por_parte = indice.compases_distintos(desde, hasta)
+        rango = f"{desde if desde is not None else ''}-{hasta if hasta is not None else ''}"
+        print(f"🔎 Compases {rango}: {len(filtrada)} de {len(tabla)} notas")
+        return filtrada
+    
+    def _mostrar_y_exportar(self, archivo_mxl, tabla, exportar_txt, archivo_salida=None):
+        """
+        Muestra las estadísticas y las primeras notas de una partitura y exporta el TXT
+        
+        Returns:
+            bool: True si se procesó correctamente
+        """
+        print(f"🎵 Título: {tabla.titulo}")
+        print(f"🎼 Compositor: {tabla.compositor}")
+        
+        estadisticas = tabla.estadisticas()
+        print(f"\n📊 Estadísticas:")
+        print(f"   • Total de notas: {estadisticas['elementos']}")
+        print(f"   • Número de compases: {tabla.num_compases}")
+        print(f"   • Número de partes: {tabla.num_partes}")
+        if estadisticas['nota_min']:
+            nombre_min, octava_min = estadisticas['nota_min']
+            nombre_max, octava_max = estadisticas['nota_max']
+            print(f"   • Rango: {self.convertir_nota_a_latino(nombre_min)}{octava_min} - "
+                  f"{self.convertir_nota_a_latino(nombre_max)}{octava_max}")
+        
+        if tabla.num_partes > 1:
+            print(f"\n📊 Estadísticas por parte:")
+            for parte in tabla.estadisticas_por_parte():
+                rango = ''
+                if parte['nota_min']:
+                    nombre_min, octava_min = parte['nota_min']
+                    nombre_max, octava_max = parte['nota_max']
+                    rango = (f", rango {self.convertir_nota_a_latino(nombre_min)}{octava_min} - "
+                             f"{self.convertir_nota_a_latino(nombre_max)}{octava_max}")
+                print(f"   • Parte {parte['parte'] + 1}: {parte['elementos']} notas, "
+                      f"{parte['compases']} compases{rango}")
+        
+        print(f"\n🎶 Primeras 20 notas:")
+        print("-" * 70)
+        
+        for i, nota in enumerate(tabla.elementos(0, 20)):
+            compas = nota.compas if nota.compas else 'N/A'
+            if nota.tipo == 'Nota':
+                nota_latino = self.convertir_nota_a_latino(nota.nombres[0])
+                print(f"{i+1:3d}. Nota: {nota_latino:<3} "
+                      f"Octava: {nota.octavas[0]} "
+                      f"Compás: {compas:<3} "
+                      f"Offset: {nota.offset:<6.2f} "
+                      f"Duración: {nota.duracion}")
+            elif nota.tipo == 'Acorde':
+                notas_acorde = [self.convertir_nota_a_latino(n) for n in nota.nombres]
+                print(f"{i+1:3d}. Acorde: {'/'.join(notas_acorde):<12} "
+                      f"Compás: {compas:<3} "
+                      f"Offset: {nota.offset:<6.2f} "
+                      f"Duración: {nota.duracion}")
+            else:
+                print(f"{i+1:3d}. Elemento musical (tipo: {nota.nombres[0]})")
+        
+        if estadisticas['elementos'] > 20:
+            print(f"... y {estadisticas['elementos'] - 20} notas más")
+
+        # Exportar las notas si se solicita
+        if exportar_txt:
+            self.exportar_notas(tabla, archivo_salida or self.archivo_exportacion(archivo_mxl))
+        
+        return True
+    
+    def procesar_archivo_completo(self, archivo_pdf, exportar_txt=True, limpiar_temporales=True, archivo_mxl=None):
         """
         Proceso completo: PDF → MXL → Análisis → Limpieza
         
+        Con las métricas activadas, emite un registro con las etapas del documento.
+        
         Args:
             archivo_pdf (str): Ruta al archivo PDF
             exportar_txt (bool): Si True, exporta las notas a TXT
             limpiar_temporales (bool): Si True, elimina archivos temporales al final
+            archivo_mxl (str): MXL ya convertido del PDF (si se indica, se omite el paso 1)
         
         Returns:
             bool: True si todo el proceso fue exitoso
         """
+        with self.instrumentacion.documento(archivo_pdf, formato=self.formato) as registro:
+            exito = self._procesar_archivo_completo(archivo_pdf, exportar_txt, limpiar_temporales, archivo_mxl)
+            registro['exito'] = exito
+        return exito
+    
+    def _procesar_archivo_completo(self, archivo_pdf, exportar_txt, limpiar_temporales, archivo_mxl):
+        """Cuerpo de procesar_archivo_completo (ver sus argumentos)"""
         print(f"🚀 Iniciando proceso completo para: {archivo_pdf}")
         print("=" * 60)
         
-        archivo_base = str(Path(archivo_pdf).with_suffix(''))
+        destino = self.archivo_exportacion(archivo_pdf)
         
         try:
-            # Paso 1: Convertir PDF a MXL
-            archivo_mxl = self.convertir_pdf_a_mxl(archivo_pdf)
-            if not archivo_mxl:
-                print("❌ Falló la conversión PDF → MXL")
-                # Limpiar archivos temporales aunque falle la conversión
-                if limpiar_temporales:
-                    self.limpiar_archivos_temporales(archivo_base, mantener_txt=False, incluir_mxl=False)
-                return False
-            
-            # Paso 2: Analizar la partitura
-            if self.leer_partitura(archivo_mxl, exportar_txt):
-                print("\n✅ Proceso completo exitoso!")
-                if exportar_txt:
-                    archivo_txt = str(Path(archivo_pdf).with_suffix('.txt'))
-                    print(f"📁 Archivos generados:")
-                    print(f"   • Notas TXT: {archivo_txt}")
+            with directorio_trabajo(self.directorio_trabajo) as trabajo:
+                # Paso 1: Convertir PDF a MXL (si se limpian los temporales, el MXL
+                # no sale del directorio de trabajo)
+                if not archivo_mxl:
+                    salida_mxl = str(Path(trabajo) / f"{Path(archivo_pdf).stem}.mxl") if limpiar_temporales else None
+                    archivo_mxl = self.convertir_pdf_a_mxl(archivo_pdf, salida_mxl)
+                if not archivo_mxl:
+                    print("❌ Falló la conversión PDF → MXL")
+                    return False
                 
-                # Paso 3: Limpiar archivos temporales (incluir .mxl si corresponde)
-                if limpiar_temporales:
-                    self.limpiar_archivos_temporales(archivo_base, mantener_txt=exportar_txt, incluir_mxl=True)
+                # Paso 2: Analizar la partitura, exportando en el directorio de trabajo
+                exportado = str(Path(trabajo) / Path(destino).name)
+                if not self.leer_partitura(archivo_mxl, exportar_txt, archivo_salida=exportado):
+                    print("\n❌ Falló el análisis musical")
+                    return False
                 
-                print("=" * 60)
-                return True
-            else:
-                print("\n❌ Falló el análisis musical")
-                # Limpiar archivos temporales aunque falle el análisis
-                if limpiar_temporales:
-                    self.limpiar_archivos_temporales(archivo_base, mantener_txt=False, incluir_mxl=True)
-                return False
+                # Paso 3: Publicar el resultado de una vez en su destino
+                if exportar_txt:
+                    mover_atomico(exportado, destino)
+                    if self.guardar_indice and Path(self.archivo_indice(exportado)).exists():
+                        mover_atomico(self.archivo_indice(exportado), self.archivo_indice(destino))
+            
+            print("\n✅ Proceso completo exitoso!")
+            if exportar_txt:
+                print(f"📁 Archivos generados:")
+                print(f"   • Notas {self.formato.upper()}: {destino}")
+            print("=" * 60)
+            return True
                 
         except Exception as e:
             print(f"❌ Error inesperado: {e}")
-            # Siempre limpiar archivos temporales en caso de error
-            if limpiar_temporales:
-                self.limpiar_archivos_temporales(archivo_base, mantener_txt=False, incluir_mxl=True)
             return False
+    
+    def procesar_grupo(self, archivos_pdf, exportar_txt=True, limpiar_temporales=True):
+        """
+        Procesa un grupo de PDFs convirtiéndolos con una sola ejecución de Audiveris
+        y analizando después cada resultado
+        
+        Args:
+            archivos_pdf (list): Rutas de los PDFs del grupo
+            exportar_txt (bool): Si True, exporta las notas a TXT
+            limpiar_temporales (bool): Si True, elimina archivos temporales al final
+        
+        Returns:
+            list: Tuplas (archivo_pdf, exito, duracion_en_segundos, mensaje_de_error)
+        """
+        # Si se limpian los temporales, los MXL del grupo no salen de su directorio
+        # de trabajo (que se borra completo al terminar); si no, quedan junto a cada PDF
+        with directorio_trabajo(self.directorio_trabajo) as trabajo:
+            inicio = time.perf_counter()
+            archivos_mxl = self.convertir_pdfs_a_mxl(archivos_pdf, trabajo if limpiar_temporales else None)
+            # El arranque y la conversión se reparten entre los archivos del grupo
+            duracion_conversion = (time.perf_counter() - inicio) / max(1, len(archivos_pdf))
+            
+            resultados = []
+            for archivo_pdf in archivos_pdf:
+                archivo_mxl = archivos_mxl.get(archivo_pdf)
+                if not archivo_mxl:
+                    resultados.append((archivo_pdf, False, duracion_conversion, "Falló la conversión PDF → MXL"))
+                    continue
+                
+                inicio_analisis = time.perf_counter()
+                try:
+                    exito = self.procesar_archivo_completo(archivo_pdf, exportar_txt, limpiar_temporales, archivo_mxl)
+                    error = None
+                except Exception as e:
+                    exito, error = False, str(e)
+                duracion = duracion_conversion + time.perf_counter() - inicio_analisis
+                resultados.append((archivo_pdf, exito, duracion, error))
+        
+        return resultados
+    
+    def resolver_entradas_lote(self, patron):
+        """
+        Obtiene la lista de PDFs a procesar a partir de un directorio o un patrón glob
+        
+        Args:
+            patron (str): Directorio (se toman sus *.pdf) o patrón glob (ej: 'scans/**/*.pdf')
+        
+        Returns:
+            list: Rutas de los PDFs encontrados, ordenadas
+        """
+        ruta = Path(patron)
+        if ruta.is_dir():
+            candidatos = [str(p) for p in ruta.iterdir() if p.is_file()]
+        else:
+            candidatos = glob.glob(patron, recursive=True)
+        
+        return sorted(c for c in candidatos if c.lower().endswith('.pdf'))
+    
+    def memoria_disponible_mb(self):
+        """Devuelve la memoria disponible del sistema en MB (None si no se puede determinar)"""
+        try:
+            with open('/proc/meminfo', encoding='utf-8') as f:
+                for linea in f:
+                    if linea.startswith('MemAvailable:'):
+                        return int(linea.split()[1]) // 1024
+        except OSError:
+            pass
+        
+        try:
+            return os.sysconf('SC_AVPHYS_PAGES') * os.sysconf('SC_PAGE_SIZE') // (1024 * 1024)
+        except (ValueError, OSError, AttributeError):
+            return None
+    
+    def calcular_trabajos_paralelos(self, maximo=None):
+        """
+        Calcula cuántas conversiones pueden ejecutarse a la vez según los núcleos
+        y la memoria disponibles (cada trabajo lanza una JVM de Audiveris)
+        
+        Args:
+            maximo (int): Límite superior opcional indicado por el usuario
+        
+        Returns:
+            int: Número de trabajos simultáneos (al menos 1)
+        """
+        trabajos = os.cpu_count() or 1
+        
+        memoria = self.memoria_disponible_mb()
+        if memoria is not None:
+            trabajos = min(trabajos, memoria // self.memoria_por_trabajo_mb)
+        
+        if maximo:
+            trabajos = min(trabajos, maximo)
+        
+        return max(1, trabajos)
+    
+    def procesar_lote(self, archivos_pdf, exportar_txt=True, limpiar_temporales=True, max_trabajos=None,
+                      tam_grupo=8):
+        """
+        Procesa muchos PDFs en paralelo con un pool de procesos acotado.
+        Cada trabajo convierte un grupo de PDFs con una sola ejecución de Audiveris.
+        Un fallo en un archivo no detiene el resto del lote.
+        
+        Args:
+            archivos_pdf (list): Rutas de los PDFs a procesar
+            exportar_txt (bool): Si True, exporta las notas a TXT
+            limpiar_temporales (bool): Si True, elimina archivos temporales al final
+            max_trabajos (int): Máximo de trabajos simultáneos (None = automático)
+            tam_grupo (int): Máximo de PDFs por ejecución de Audiveris
+        
+        Returns:
+            dict: Resumen del lote (totales, duración, rendimiento y fallos por archivo)
+        """
+        trabajos = self.calcular_trabajos_paralelos(max_trabajos)
+        
+        # No agrupar tanto como para dejar trabajos sin archivos
+        tam_grupo = max(1, min(tam_grupo, -(-len(archivos_pdf) // trabajos)))
+        grupos = [archivos_pdf[i:i + tam_grupo] for i in range(0, len(archivos_pdf), tam_grupo)]
+        
+        print(f"🚀 Procesando lote de {len(archivos_pdf)} PDFs con {trabajos} trabajos simultáneos "
+              f"({len(grupos)} grupos de hasta {tam_grupo})")
+        print("=" * 60)
+        
+        resultados = {}
+        fallidos = {}
+        inicio = time.perf_counter()
+        
+        # Los procesos del pool comparten la misma carpeta de caché
+        opciones_conversor = {
+            'usar_cache': self.cache is not None,
+            'directorio_cache': self.directorio_cache,
+            'limite_cache_mb': self.limite_cache_mb,
+            'formato': self.formato,
+            'archivo_metricas': self.archivo_metricas,
+            'directorio_trabajo': self.directorio_trabajo,
+            # El lote ya ocupa los núcleos: cada partitura se extrae en su proceso
+            'trabajos_partes': 1,
+            'rango_compases': self.rango_compases,
+            'guardar_indice': self.guardar_indice,
+        }
+        
+        with ProcessPoolExecutor(max_workers=trabajos) as pool:
+            futuros = {
+                pool.submit(_procesar_grupo_en_proceso, grupo, exportar_txt, limpiar_temporales,
+                            opciones_conversor): grupo
+                for grupo in grupos
+            }
+            
+            for futuro in as_completed(futuros):
+                try:
+                    resultados_grupo = futuro.result()
+                except Exception as e:
+                    resultados_grupo = [(archivo, False, 0.0, str(e)) for archivo in futuros[futuro]]
+                
+                for archivo, exito, duracion, error in resultados_grupo:
+                    resultados[archivo] = {'exito': exito, 'duracion': duracion}
+                    if not exito:
+                        fallidos[archivo] = error or "El proceso terminó con errores"
+        
+        duracion_total = time.perf_counter() - inicio
+        
+        return {
+            'total': len(archivos_pdf),
+            'exitosos': len(archivos_pdf) - len(fallidos),
+            'fallidos': fallidos,
+            'resultados': resultados,
+            'trabajos': trabajos,
+            'duracion': duracion_total,
+            'archivos_por_minuto': len(archivos_pdf) * 60 / duracion_total if duracion_total > 0 else 0.0,
+        }
+    
+    def imprimir_resumen_lote(self, resumen):
+        """Muestra el resumen de rendimiento y fallos de un lote"""
+        print("\n" + "=" * 60)
+        print("📊 RESUMEN DEL LOTE:")
+        print(f"   • Archivos procesados: {resumen['total']}")
+        print(f"   • Exitosos: {resumen['exitosos']}")
+        print(f"   • Fallidos: {len(resumen['fallidos'])}")
+        print(f"   • Trabajos simultáneos: {resumen['trabajos']}")
+        print(f"   • Duración total: {resumen['duracion']:.1f} s")
+        print(f"   • Rendimiento: {resumen['archivos_por_minuto']:.2f} archivos/minuto")
+        
+        if resumen['fallidos']:
+            print("\n❌ Archivos con errores:")
+            for archivo, motivo in sorted(resumen['fallidos'].items()):
+                print(f"   • {archivo}: {motivo}")
+        print("=" * 60)
+
+def _procesar_grupo_en_proceso(archivos_pdf, exportar_txt, limpiar_temporales, opciones_conversor):
+    """
+    Procesa un grupo de PDFs dentro de un proceso del pool del lote
+    
+    Args:
+        opciones_conversor (dict): Argumentos para construir el ConversorPartitura del proceso
+    
+    Returns:
+        list: Tuplas (archivo_pdf, exito, duracion_en_segundos, mensaje_de_error)
+    """
+    conversor = ConversorPartitura(**opciones_conversor)
+    return conversor.procesar_grupo(archivos_pdf, exportar_txt, limpiar_temporales)
+
+def nota_music21_a_xml(nota, parte=None):
+    """
+    Convierte una nota o acorde de music21 al formato NotaXML del lector rápido
+    
+    Args:
+        nota: Elemento de music21 (Note, Chord...)
+        parte (int): Índice de la parte a la que pertenece
+    
+    Returns:
+        NotaXML: Tipo, nombres, octavas, compás, offset y duración del elemento
+    """
+    if hasattr(nota, 'pitch'):  # Nota simple
+        alturas, tipo = [nota.pitch], 'Nota'
+    elif hasattr(nota, 'pitches'):  # Acorde
+        alturas, tipo = list(nota.pitches), 'Acorde'
+    else:
+        return NotaXML('Otro', (type(nota).__name__,), (None,), nota.measureNumber,
+                       float(nota.offset), float(nota.quarterLength), parte)
+    
+    nombres = tuple(p.name for p in alturas)
+    octavas = tuple(p.octave if p.octave is not None else p.implicitOctave for p in alturas)
+    return NotaXML(tipo, nombres, octavas, nota.measureNumber,
+                   float(nota.offset), float(nota.quarterLength), parte)
+
+def _extraer_parte_en_proceso(cabecera, parte, cierre):
+    """
+    Analiza con music21 una sola parte dentro de un proceso del pool
+    
+    Args:
+        cabecera, parte, cierre (bytes): Trozos de dividir_partes() (con la cabecera
+                                         de cabecera_de_parte()) que forman un
+                                         MusicXML con solo esa parte
+    
+    Returns:
+        tuple: (TablaNotas con las partes numeradas desde 0 (una por pentagrama),
+                título, compositor)
+    """
+    datos = cabecera + parte + cierre
+    score = music21.converter.parseData(datos.decode('utf-8'), format='musicxml')
+    # Una parte de piano llega como varios PartStaff, igual que en la partitura completa
+    partes = list(score.parts) or [score]
+    notas = (nota_music21_a_xml(nota, indice)
+             for indice, pentagrama in enumerate(partes)
+             for nota in pentagrama.recurse().notes)
+    tabla = tabla_notas.TablaNotas.desde_notas(
+        notas, compases_por_parte=[len(pentagrama.getElementsByClass('Measure')) for pentagrama in partes])
+    metadatos = score.metadata
+    return (tabla, metadatos.title if metadatos else None,
+            metadatos.composer if metadatos else None)
 
 def main():
     """Función principal"""
     
-    conversor = ConversorPartitura()
-    
     if len(sys.argv) < 2:
         print("🎼 Conversor y Lector de Partituras Musicales")
         print("=" * 50)
         print("Uso:")
         print(f"  {sys.argv[0]} <archivo.pdf>         # Proceso completo (PDF → TXT) + limpieza")
         print(f"  {sys.argv[0]} --mxl <archivo.mxl>    # Solo análisis (MXL → TXT)")
+        print(f"  {sys.argv[0]} --full --mxl <archivo.mxl> # Análisis completo con music21")
+        print(f"  {sys.argv[0]} --full --no-cache --part-jobs N --mxl <archivo.mxl> # Analizar las partes en N procesos")
+        print(f"  {sys.argv[0]} --measures A-B --mxl <archivo.mxl> # Solo las notas de los compases A a B")
+        print(f"  {sys.argv[0]} --index <archivo.pdf>   # Guardar el índice de compases junto a la exportación")
         print(f"  {sys.argv[0]} --no-txt <archivo.pdf>  # Sin exportar TXT")
+        print(f"  {sys.argv[0]} --format <txt|csv|jsonl|npz> <archivo.pdf> # Formato de exportación")
         print(f"  {sys.argv[0]} --no-clean <archivo.pdf> # Sin limpiar archivos temporales")
+        print(f"  {sys.argv[0]} --batch <directorio|glob> [--jobs N] [--group-size N]  # Lote de PDFs en paralelo")
+        print(f"  {sys.argv[0]} --shard-pages N [--jobs N] <archivo.pdf> # Reconocer fragmentos de N páginas en paralelo")
+        print(f"  {sys.argv[0]} --incremental <archivo.pdf> # Reconocer solo las páginas modificadas")
+        print(f"  {sys.argv[0]} --metrics <archivo.jsonl> <archivo.pdf> # Métricas por etapa en JSON Lines")
+        print(f"  {sys.argv[0]} --scratch-dir <carpeta> <archivo.pdf> # Directorios de trabajo (ej: /dev/shm)")
+        print(f"  {sys.argv[0]} --no-cache <archivo.pdf> # Sin usar las cachés (conversiones y partituras)")
+        print(f"  {sys.argv[0]} --cache-dir <carpeta> <archivo.pdf> # Carpeta base de las cachés")
+        print(f"  {sys.argv[0]} --cache-size <MB> <archivo.pdf> # Tamaño máximo de cada caché")
         print()
         
         # Buscar archivos PDF automáticamente
@@ -394,24 +1205,115 @@ def main():
     exportar_txt = True
     limpiar_temporales = True
     archivo_a_procesar = None
+    archivo_mxl = None
+    analisis_completo = False
+    patron_lote = None
+    max_trabajos = None
+    tam_grupo = 8
+    usar_cache = True
+    directorio_cache = None
+    limite_cache_mb = None
+    formato = 'txt'
+    paginas_por_fragmento = None
+    incremental = False
+    archivo_metricas = None
+    directorio_trabajo_base = None
+    trabajos_partes = None
+    rango_compases = None
+    guardar_indice = False
     
-    if len(sys.argv) >= 2:
-        if sys.argv[1] == '--no-txt' and len(sys.argv) > 2:
+    argumentos = sys.argv[1:]
+    while argumentos:
+        opcion = argumentos.pop(0)
+        if opcion == '--no-txt':
             exportar_txt = False
-            archivo_a_procesar = sys.argv[2]
-        elif sys.argv[1] == '--no-clean' and len(sys.argv) > 2:
+        elif opcion == '--no-clean':
             limpiar_temporales = False
-            archivo_a_procesar = sys.argv[2]
-        elif sys.argv[1] == '--mxl' and len(sys.argv) > 2:
-            archivo_mxl = sys.argv[2]
-            if conversor.leer_partitura(archivo_mxl, exportar_txt):
-                print("✅ Análisis completado exitosamente")
-                return 0
-            else:
-                print("❌ Falló el análisis")
+        elif opcion == '--mxl' and argumentos:
+            archivo_mxl = argumentos.pop(0)
+        elif opcion == '--full':
+            analisis_completo = True
+        elif opcion == '--format' and argumentos:
+            formato = argumentos.pop(0).lower()
+            if formato not in exportadores.FORMATOS:
+                print(f"❌ Error: Formato '{formato}' no soportado ({', '.join(exportadores.FORMATOS)})")
+                return 1
+        elif opcion == '--scratch-dir' and argumentos:
+            directorio_trabajo_base = argumentos.pop(0)
+        elif opcion == '--metrics' and argumentos:
+            archivo_metricas = argumentos.pop(0)
+        elif opcion == '--incremental':
+            incremental = True
+        elif opcion == '--no-cache':
+            usar_cache = False
+        elif opcion == '--cache-dir' and argumentos:
+            directorio_cache = argumentos.pop(0)
+        elif opcion == '--cache-size' and argumentos:
+            try:
+                limite_cache_mb = int(argumentos.pop(0))
+            except ValueError:
+                print("❌ Error: --cache-size requiere un número entero (MB)")
+                return 1
+        elif opcion == '--batch' and argumentos:
+            patron_lote = argumentos.pop(0)
+        elif opcion == '--jobs' and argumentos:
+            try:
+                max_trabajos = int(argumentos.pop(0))
+            except ValueError:
+                print("❌ Error: --jobs requiere un número entero")
+                return 1
+        elif opcion == '--measures' and argumentos:
+            try:
+                rango_compases = indice_partitura.parsear_rango_compases(argumentos.pop(0))
+            except ValueError:
+                print("❌ Error: --measures requiere un rango de compases (ej: 120-160)")
+                return 1
+        elif opcion == '--index':
+            guardar_indice = True
+        elif opcion == '--part-jobs' and argumentos:
+            try:
+                trabajos_partes = int(argumentos.pop(0))
+            except ValueError:
+                print("❌ Error: --part-jobs requiere un número entero")
+                return 1
+        elif opcion == '--shard-pages' and argumentos:
+            try:
+                paginas_por_fragmento = int(argumentos.pop(0))
+            except ValueError:
+                print("❌ Error: --shard-pages requiere un número entero")
+                return 1
+        elif opcion == '--group-size' and argumentos:
+            try:
+                tam_grupo = int(argumentos.pop(0))
+            except ValueError:
+                print("❌ Error: --group-size requiere un número entero")
                 return 1
         else:
-            archivo_a_procesar = sys.argv[1]
+            archivo_a_procesar = opcion
+    
+    conversor = ConversorPartitura(usar_cache, directorio_cache, limite_cache_mb, formato,
+                                   paginas_por_fragmento, max_trabajos, incremental, archivo_metricas,
+                                   directorio_trabajo_base, trabajos_partes, rango_compases, guardar_indice)
+    
+    if archivo_mxl:
+        with conversor.instrumentacion.documento(archivo_mxl, formato=formato) as registro:
+            registro['exito'] = conversor.leer_partitura(archivo_mxl, exportar_txt, analisis_completo)
+        if registro['exito']:
+            print("✅ Análisis completado exitosamente")
+            return 0
+        else:
+            print("❌ Falló el análisis")
+            return 1
+    
+    if patron_lote:
+        archivos_pdf = conversor.resolver_entradas_lote(patron_lote)
+        if not archivos_pdf:
+            print(f"❌ Error: No se encontraron PDFs en '{patron_lote}'")
+            return 1
+        
+        resumen = conversor.procesar_lote(archivos_pdf, exportar_txt, limpiar_temporales, max_trabajos, tam_grupo)
+        conversor.imprimir_resumen_lote(resumen)
+        return 0 if not resumen['fallidos'] else 1
     
     if not archivo_a_procesar:
         print("❌ Error: No se especificó archivo a procesar")
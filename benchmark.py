@@ -0,0 +1,382 @@
+#!/usr/bin/env python3
+"""
+Banco de pruebas de rendimiento de Bardoneon
+Genera entradas sintéticas de tamaño controlado, mide cada etapa del proceso por
+separado y guarda los resultados en JSON para compararlos entre ejecuciones
+"""
+
+import io
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import platform
+import subprocess
+import statistics
+import tempfile
+from contextlib import redirect_stdout
+from pathlib import Path
+
+import numpy as np
+import fitz  # PyMuPDF
+import music21
+from music21 import converter, stream, note, chord, meter, metadata
+
+import detector_pymupdf
+from bardoneon import ConversorPartitura
+
+# Tamaños por defecto: (partes, compases) de las partituras y DPI de los PDFs
+TAMANOS_PARTITURA = [(1, 32), (4, 128)]
+DPIS = [150, 300]
+PAGINAS_PDF = 4
+REPETICIONES = 5
+SEMILLA = 1234
+
+# Audiveris de prueba: copia el MusicXML sintético junto a cada PDF recibido
+AUDIVERIS_STUB = '''#!{python}
+import sys, shutil
+from pathlib import Path
+for argumento in sys.argv[1:]:
+    if argumento.lower().endswith('.pdf'):
+        shutil.copyfile({origen!r}, str(Path(argumento).with_suffix('.mxl')))
+'''
+
+
+def generar_partitura(ruta, partes, compases, semilla=SEMILLA):
+    """
+    Genera una partitura MusicXML sintética con music21
+
+    Cada compás de 4/4 tiene cuatro negras; una de cada cuatro es un acorde.
+
+    Args:
+        ruta (str): Archivo de salida (.musicxml, o .mxl comprimido)
+        partes (int): Número de partes
+        compases (int): Compases por parte
+        semilla (int): Semilla de las alturas aleatorias
+    """
+    azar = random.Random(semilla)
+    partitura = stream.Score()
+    partitura.metadata = metadata.Metadata(title=f"Sintética {partes}x{compases}", composer='Bardoneon')
+
+    for _ in range(partes):
+        parte = stream.Part()
+        for numero in range(1, compases + 1):
+            compas = stream.Measure(number=numero)
+            if numero == 1:
+                compas.append(meter.TimeSignature('4/4'))
+            for tiempo in range(4):
+                midi = azar.randint(48, 84)
+                if tiempo == 3:
+                    compas.append(chord.Chord([midi, midi + 4, midi + 7], quarterLength=1))
+                else:
+                    compas.append(note.Note(midi, quarterLength=1))
+            parte.append(compas)
+        partitura.append(parte)
+
+    partitura.write('mxl' if str(ruta).lower().endswith('.mxl') else 'musicxml', fp=ruta)
+
+
+def generar_pdf(ruta, paginas=PAGINAS_PDF, pentagramas=8):
+    """
+    Genera un PDF sintético con pentagramas y cabezas de nota dibujados con PyMuPDF
+
+    Args:
+        ruta (str): Archivo de salida
+        paginas (int): Número de páginas (A4)
+        pentagramas (int): Pentagramas por página
+    """
+    with fitz.open() as doc:
+        for _ in range(paginas):
+            pagina = doc.new_page(width=595, height=842)
+            for indice in range(pentagramas):
+                y0 = 80 + indice * 90
+                for linea in range(5):
+                    y = y0 + linea * 6
+                    pagina.draw_line((50, y), (545, y), width=0.8)
+                for k in range(10):
+                    pagina.draw_circle((80 + k * 45, y0 + (k % 5) * 3), 3, fill=(0, 0, 0))
+        doc.save(ruta)
+
+
+def crear_audiveris_stub(directorio, archivo_mxl):
+    """Escribe el ejecutable que sustituye a Audiveris y devuelve su ruta"""
+    ruta = Path(directorio) / 'audiveris_stub'
+    ruta.write_text(AUDIVERIS_STUB.format(python=sys.executable, origen=str(archivo_mxl)), encoding='utf-8')
+    ruta.chmod(0o755)
+    return str(ruta)
+
+
+def medir(funcion, repeticiones=REPETICIONES):
+    """
+    Ejecuta una función varias veces y resume sus tiempos (sin su salida por pantalla)
+
+    Returns:
+        dict: Tiempos mínimo, mediana y media en segundos, y número de repeticiones
+    """
+    tiempos = []
+    for _ in range(repeticiones):
+        with redirect_stdout(io.StringIO()):
+            inicio = time.perf_counter()
+            funcion()
+            tiempos.append(time.perf_counter() - inicio)
+    return {
+        'min': min(tiempos),
+        'mediana': statistics.median(tiempos),
+        'media': statistics.fmean(tiempos),
+        'repeticiones': repeticiones,
+    }
+
+
+def renderizar(doc, dpi):
+    """Renderiza la primera página copiando los píxeles (la vista sin copia no se debe conservar)"""
+    return np.array(detector_pymupdf.renderizar_pagina(doc, 0, dpi))
+
+
+def medir_detector(ruta_pdf, dpi, repeticiones, resultados):
+    """Mide las etapas del detector sobre la primera página de un PDF"""
+    sufijo = f"{dpi}dpi"
+    with fitz.open(ruta_pdf) as doc:
+        resultados[f"renderizar_pagina_{sufijo}"] = medir(lambda: renderizar(doc, dpi), repeticiones)
+
+        imagen = renderizar(doc, dpi)
+        resultados[f"detectar_lineas_pentagrama_{sufijo}"] = medir(
+            lambda: detector_pymupdf.detectar_lineas_pentagrama(imagen), repeticiones)
+
+        lineas, _ = detector_pymupdf.detectar_lineas_pentagrama(imagen)
+        grosor, espaciado = detector_pymupdf.estimar_espaciado_pentagrama(imagen)
+        resultados[f"agrupar_pentagramas_{sufijo}"] = medir(
+            lambda: detector_pymupdf.agrupar_pentagramas(lineas, espaciado=espaciado, grosor=grosor),
+            repeticiones)
+
+        pentagramas = detector_pymupdf.agrupar_pentagramas(lineas, espaciado=espaciado, grosor=grosor)
+        resultados[f"extraer_recortes_{sufijo}"] = medir(
+            lambda: detector_pymupdf.extraer_recortes(imagen, pentagramas, dpi), repeticiones)
+
+        # Página completa frente a localización a 100 DPI + recortes renderizados a 'dpi'
+        resultados[f"analizar_pagina_{sufijo}"] = medir(
+            lambda: detector_pymupdf.analizar_pagina(doc, ruta_pdf, 0, dpi), repeticiones)
+        if dpi > 100:
+            resultados[f"analizar_pagina_localizada_{sufijo}"] = medir(
+                lambda: detector_pymupdf.analizar_pagina(doc, ruta_pdf, 0, dpi, dpi_localizacion=100),
+                repeticiones)
+
+
+def medir_partitura(ruta_xml, etiqueta, directorio, repeticiones, resultados):
+    """Mide la lectura, la extracción de notas y la exportación de una partitura"""
+    conversor = ConversorPartitura(usar_cache=False)
+
+    resultados[f"converter_parse_{etiqueta}"] = medir(lambda: converter.parse(ruta_xml), repeticiones)
+    resultados[f"extraer_notas_rapido_{etiqueta}"] = medir(
+        lambda: conversor.extraer_tabla(ruta_xml), repeticiones)
+    resultados[f"extraer_notas_music21_{etiqueta}"] = medir(
+        lambda: conversor.extraer_tabla(ruta_xml, analisis_completo=True), repeticiones)
+
+    with redirect_stdout(io.StringIO()):
+        tabla = conversor.extraer_tabla(ruta_xml)
+    archivo_txt = str(Path(directorio) / f"{etiqueta}.txt")
+    resultados[f"exportar_notas_txt_{etiqueta}"] = medir(
+        lambda: conversor.exportar_notas_txt(tabla, archivo_txt), repeticiones)
+
+
+def medir_proceso_completo(ruta_pdf, ruta_mxl, etiqueta, directorio, repeticiones, resultados):
+    """Mide el proceso completo PDF → TXT con Audiveris sustituido por un ejecutable de prueba"""
+    conversor = ConversorPartitura(usar_cache=False)
+    conversor.audiveris_path = crear_audiveris_stub(directorio, ruta_mxl)
+
+    # Cada repetición trabaja sobre una copia, porque el proceso limpia sus temporales
+    def proceso():
+        copia = str(Path(directorio) / 'proceso.pdf')
+        shutil.copyfile(ruta_pdf, copia)
+        if not conversor.procesar_archivo_completo(copia):
+            raise RuntimeError("Falló el proceso completo con el Audiveris de prueba")
+
+    resultados[f"proceso_completo_{etiqueta}"] = medir(proceso, repeticiones)
+
+
+def medir_arranque(repeticiones, resultados):
+    """Mide el arranque de las CLIs hasta mostrar la ayuda (sin argumentos), en un intérprete nuevo"""
+    carpeta = Path(__file__).resolve().parent
+    for programa in ('bardoneon.py', 'detector_pymupdf.py'):
+        comando = [sys.executable, str(carpeta / programa)]
+        resultados[f"arranque_{Path(programa).stem}"] = medir(
+            lambda: subprocess.run(comando, capture_output=True, cwd=carpeta), repeticiones)
+
+
+def entorno():
+    """Datos del entorno que afectan a los tiempos"""
+    return {
+        'python': platform.python_version(),
+        'plataforma': platform.platform(),
+        'cpus': os.cpu_count(),
+        'numpy': np.__version__,
+        'music21': music21.VERSION_STR,
+        'pymupdf': fitz.VersionBind,
+    }
+
+
+def ejecutar_benchmark(tamanos=None, dpis=None, repeticiones=REPETICIONES):
+    """
+    Ejecuta el banco de pruebas completo
+
+    Args:
+        tamanos (list): Tuplas (partes, compases) de las partituras sintéticas
+        dpis (list): Resoluciones a las que se miden las etapas del detector
+        repeticiones (int): Repeticiones de cada medición
+
+    Returns:
+        dict: Entorno, parámetros y tiempos de cada etapa
+    """
+    tamanos = tamanos or TAMANOS_PARTITURA
+    dpis = dpis or DPIS
+    resultados = {}
+
+    print("⏱️  Arranque de las CLIs...")
+    medir_arranque(repeticiones, resultados)
+
+    with tempfile.TemporaryDirectory(prefix='bardoneon_benchmark_') as directorio:
+        ruta_pdf = str(Path(directorio) / 'sintetico.pdf')
+        generar_pdf(ruta_pdf)
+
+        for dpi in dpis:
+            print(f"⏱️  Detector a {dpi} DPI...")
+            medir_detector(ruta_pdf, dpi, repeticiones, resultados)
+
+        for partes, compases in tamanos:
+            etiqueta = f"{partes}x{compases}"
+            print(f"⏱️  Partitura {etiqueta}...")
+            ruta_xml = str(Path(directorio) / f"sintetica_{etiqueta}.musicxml")
+            generar_partitura(ruta_xml, partes, compases)
+            medir_partitura(ruta_xml, etiqueta, directorio, repeticiones, resultados)
+            # Lo que "reconoce" el Audiveris de prueba: la misma partitura en .mxl
+            ruta_mxl = str(Path(directorio) / f"sintetica_{etiqueta}.mxl")
+            generar_partitura(ruta_mxl, partes, compases)
+            medir_proceso_completo(ruta_pdf, ruta_mxl, etiqueta, directorio, repeticiones, resultados)
+
+    return {
+        'fecha': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'entorno': entorno(),
+        'parametros': {
+            'tamanos': [list(t) for t in tamanos],
+            'dpis': dpis,
+            'paginas_pdf': PAGINAS_PDF,
+            'repeticiones': repeticiones,
+            'semilla': SEMILLA,
+        },
+        'resultados': resultados,
+    }
+
+
+def comparar_resultados(base, nuevo, umbral=0.10, diferencia_minima=0.001):
+    """
+    Compara dos ejecuciones del banco de pruebas por la mediana de cada etapa
+
+    Args:
+        base (dict): Resultados de referencia
+        nuevo (dict): Resultados a evaluar
+        umbral (float): Aumento relativo a partir del cual se considera regresión
+        diferencia_minima (float): Aumento absoluto mínimo en segundos (evita marcar
+                                   como regresión el ruido de las etapas de microsegundos)
+
+    Returns:
+        list: Etapas con regresión, como tuplas (etapa, mediana_base, mediana_nueva, cambio)
+    """
+    regresiones = []
+    print(f"{'Etapa':<40} {'Base (ms)':>10} {'Nuevo (ms)':>11} {'Cambio':>8}")
+    print("-" * 72)
+
+    for etapa in sorted(set(base['resultados']) | set(nuevo['resultados'])):
+        anterior = base['resultados'].get(etapa)
+        actual = nuevo['resultados'].get(etapa)
+        if not anterior or not actual:
+            print(f"{etapa:<40} {'(solo en una de las ejecuciones)':>31}")
+            continue
+
+        cambio = actual['mediana'] / anterior['mediana'] - 1 if anterior['mediana'] > 0 else 0.0
+        marca = ''
+        diferencia = abs(actual['mediana'] - anterior['mediana'])
+        if cambio > umbral and diferencia >= diferencia_minima:
+            marca = ' ❌'
+            regresiones.append((etapa, anterior['mediana'], actual['mediana'], cambio))
+        elif cambio < -umbral and diferencia >= diferencia_minima:
+            marca = ' ✅'
+        print(f"{etapa:<40} {anterior['mediana'] * 1000:>10.2f} {actual['mediana'] * 1000:>11.2f} "
+              f"{cambio:>+7.1%}{marca}")
+
+    return regresiones
+
+
+def parsear_tamanos(texto):
+    """Convierte '1x32,4x128' en [(1, 32), (4, 128)]"""
+    return [tuple(int(n) for n in tamano.split('x')) for tamano in texto.split(',')]
+
+
+def main():
+    """Función principal"""
+
+    if len(sys.argv) < 2 or sys.argv[1] not in ('run', 'compare'):
+        print("⏱️  Banco de pruebas de Bardoneon")
+        print("Uso:")
+        print(f"  {sys.argv[0]} run [--out resultados.json] [--repeat N] [--sizes 1x32,4x128] [--dpi 150,300]")
+        print(f"  {sys.argv[0]} compare <base.json> <nuevo.json> [--threshold 10]")
+        return 1
+
+    comando = sys.argv[1]
+    argumentos = sys.argv[2:]
+    salida = 'benchmark.json'
+    repeticiones = REPETICIONES
+    tamanos = None
+    dpis = None
+    umbral = 10.0
+    archivos = []
+
+    try:
+        while argumentos:
+            opcion = argumentos.pop(0)
+            if opcion == '--out' and argumentos:
+                salida = argumentos.pop(0)
+            elif opcion == '--repeat' and argumentos:
+                repeticiones = int(argumentos.pop(0))
+            elif opcion == '--sizes' and argumentos:
+                tamanos = parsear_tamanos(argumentos.pop(0))
+            elif opcion == '--dpi' and argumentos:
+                dpis = [int(dpi) for dpi in argumentos.pop(0).split(',')]
+            elif opcion == '--threshold' and argumentos:
+                umbral = float(argumentos.pop(0))
+            else:
+                archivos.append(opcion)
+    except ValueError as e:
+        print(f"❌ Error: valor de opción no válido ({e})")
+        return 1
+
+    if comando == 'compare':
+        if len(archivos) != 2:
+            print("❌ Error: compare necesita dos archivos de resultados")
+            return 1
+        with open(archivos[0], encoding='utf-8') as f:
+            base = json.load(f)
+        with open(archivos[1], encoding='utf-8') as f:
+            nuevo = json.load(f)
+
+        regresiones = comparar_resultados(base, nuevo, umbral / 100)
+        if regresiones:
+            print(f"\n❌ {len(regresiones)} etapas más lentas que la base (umbral {umbral:g}%)")
+            return 1
+        print(f"\n✅ Sin regresiones (umbral {umbral:g}%)")
+        return 0
+
+    resumen = ejecutar_benchmark(tamanos, dpis, repeticiones)
+    with open(salida, 'w', encoding='utf-8') as f:
+        json.dump(resumen, f, indent=2, ensure_ascii=False)
+
+    print(f"\n{'Etapa':<40} {'Mediana (ms)':>12}")
+    print("-" * 53)
+    for etapa, tiempos in resumen['resultados'].items():
+        print(f"{etapa:<40} {tiempos['mediana'] * 1000:>12.2f}")
+    print(f"\n💾 Resultados guardados en: {salida}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,416 @@
+#!/usr/bin/env python3
+"""
+Caché persistente en disco para resultados de Bardoneon
+Las entradas se direccionan por contenido (hash) y se desalojan por LRU
+"""
+
+import os
+import shutil
+import hashlib
+import tempfile
+from pathlib import Path
+
+from importacion_diferida import modulo_diferido
+
+# NumPy solo lo necesita la caché de rasters (no se carga al arrancar las CLIs)
+np = modulo_diferido('numpy')
+
+
+def directorio_cache_por_defecto(subcarpeta):
+    """
+    Devuelve la carpeta de caché por defecto para una subcarpeta dada
+
+    Se puede cambiar con la variable de entorno BARDONEON_CACHE_DIR
+    (o XDG_CACHE_HOME siguiendo la convención de Linux).
+    """
+    base = os.environ.get('BARDONEON_CACHE_DIR')
+    if not base:
+        base = Path(os.environ.get('XDG_CACHE_HOME', Path.home() / '.cache')) / 'bardoneon'
+    return Path(base) / subcarpeta
+
+
+def hash_archivo(ruta, tam_bloque=1024 * 1024):
+    """
+    Calcula el SHA-256 del contenido de un archivo leyendo por bloques
+
+    Args:
+        ruta (str): Ruta del archivo
+        tam_bloque (int): Tamaño de cada lectura en bytes
+
+    Returns:
+        str: Hash hexadecimal
+    """
+    h = hashlib.sha256()
+    with open(ruta, 'rb') as f:
+        for bloque in iter(lambda: f.read(tam_bloque), b''):
+            h.update(bloque)
+    return h.hexdigest()
+
+
+class CacheLRU:
+    """
+    Caché de archivos en un directorio, con límite de tamaño y desalojo LRU
+
+    Cada entrada es un archivo '<clave><extension>'. La fecha de modificación
+    se actualiza en cada acierto y se usa como marca de último uso.
+    """
+
+    def __init__(self, directorio, limite_mb=1024, extension=''):
+        self.directorio = Path(directorio)
+        self.limite_bytes = int(limite_mb * 1024 * 1024)
+        self.extension = extension
+
+    def ruta_entrada(self, clave):
+        """Ruta del archivo asociado a una clave"""
+        return self.directorio / f"{clave}{self.extension}"
+
+    def obtener(self, clave):
+        """
+        Busca una entrada en la caché
+
+        Returns:
+            Path|None: Ruta de la entrada si existe, None si no
+        """
+        ruta = self.ruta_entrada(clave)
+        try:
+            os.utime(ruta)  # Marcar como usada recientemente
+        except OSError:
+            return None
+        return ruta
+
+    def guardar(self, clave, archivo_origen):
+        """
+        Copia un archivo a la caché de forma atómica y aplica el límite de tamaño
+
+        Returns:
+            Path: Ruta de la entrada guardada
+        """
+        self.directorio.mkdir(parents=True, exist_ok=True)
+        destino = self.ruta_entrada(clave)
+
+        # Copiar a un temporal en el mismo directorio y renombrar (atómico)
+        fd, temporal = tempfile.mkstemp(dir=self.directorio, suffix='.tmp')
+        os.close(fd)
+        try:
+            shutil.copyfile(archivo_origen, temporal)
+            os.replace(temporal, destino)
+        except Exception:
+            Path(temporal).unlink(missing_ok=True)
+            raise
+
+        self.desalojar()
+        return destino
+
+    def guardar_bytes(self, clave, datos):
+        """
+        Guarda un bloque de bytes como entrada de la caché (escritura atómica)
+
+        Returns:
+            Path: Ruta de la entrada guardada
+        """
+        self.directorio.mkdir(parents=True, exist_ok=True)
+        destino = self.ruta_entrada(clave)
+
+        fd, temporal = tempfile.mkstemp(dir=self.directorio, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(datos)
+            os.replace(temporal, destino)
+        except Exception:
+            Path(temporal).unlink(missing_ok=True)
+            raise
+
+        self.desalojar()
+        return destino
+
+    def desalojar(self):
+        """
+        Elimina las entradas menos usadas hasta quedar por debajo del límite
+
+        Returns:
+            list: Rutas eliminadas
+        """
+        if not self.directorio.exists():
+            return []
+
+        entradas = []
+        total = 0
+        for ruta in self.directorio.glob(f"*{self.extension}"):
+            if ruta.suffix == '.tmp':
+                continue
+            try:
+                info = ruta.stat()
+            except OSError:
+                continue
+            entradas.append((info.st_mtime, info.st_size, ruta))
+            total += info.st_size
+
+        eliminadas = []
+        for _, tam, ruta in sorted(entradas):
+            if total <= self.limite_bytes:
+                break
+            try:
+                ruta.unlink()
+                total -= tam
+                eliminadas.append(ruta)
+            except OSError:
+                pass
+
+        return eliminadas
+
+
+class CacheConversion(CacheLRU):
+    """
+    Caché de conversiones PDF → MusicXML
+
+    La clave combina el hash del PDF con la versión y las opciones de Audiveris,
+    de modo que un cambio de versión u opciones invalida las entradas anteriores.
+    """
+
+    def __init__(self, directorio=None, limite_mb=2048):
+        super().__init__(directorio or directorio_cache_por_defecto('mxl'), limite_mb, extension='.mxl')
+
+    def calcular_clave(self, pdf_path, version_audiveris, opciones):
+        """
+        Calcula la clave de caché de una conversión
+
+        Args:
+            pdf_path (str): Ruta al archivo PDF
+            version_audiveris (str): Identificador de la versión de Audiveris
+            opciones (list): Opciones pasadas a Audiveris
+
+        Returns:
+            str: Clave hexadecimal
+        """
+        h = hashlib.sha256()
+        h.update(hash_archivo(pdf_path).encode())
+        h.update(b'\0' + version_audiveris.encode())
+        h.update(b'\0' + ' '.join(opciones).encode())
+        return h.hexdigest()
+
+
+class CachePartituras(CacheLRU):
+    """
+    Caché de partituras ya analizadas por music21 (congeladas con freezeThaw)
+
+    La clave combina el hash del archivo con la versión de music21, porque el
+    formato congelado no es compatible entre versiones.
+    """
+
+    def __init__(self, directorio=None, limite_mb=1024):
+        super().__init__(directorio or directorio_cache_por_defecto('partituras'), limite_mb, extension='.p')
+
+    def calcular_clave(self, archivo, version_music21):
+        """
+        Calcula la clave de caché de una partitura
+
+        Args:
+            archivo (str): Ruta al archivo de la partitura
+            version_music21 (str): Versión de music21 instalada
+
+        Returns:
+            str: Clave hexadecimal
+        """
+        h = hashlib.sha256()
+        h.update(hash_archivo(archivo).encode())
+        h.update(b'\0' + version_music21.encode())
+        return h.hexdigest()
+
+
+class CachePaginas(CacheLRU):
+    """
+    Caché de reconocimientos de páginas sueltas (MusicXML de una página)
+
+    La clave combina el hash del contenido de la página con la versión y las
+    opciones de Audiveris. Permite volver a reconocer solo las páginas que
+    cambiaron cuando se reemplaza un PDF.
+    """
+
+    def __init__(self, directorio=None, limite_mb=2048):
+        super().__init__(directorio or directorio_cache_por_defecto('paginas'), limite_mb, extension='.mxl')
+
+    def calcular_clave(self, hash_pagina, version_audiveris, opciones):
+        """
+        Calcula la clave de caché del reconocimiento de una página
+
+        Args:
+            hash_pagina (str): Hash del contenido de la página (ver fragmentos_omr.hashes_paginas)
+            version_audiveris (str): Identificador de la versión de Audiveris
+            opciones (list): Opciones pasadas a Audiveris
+
+        Returns:
+            str: Clave hexadecimal
+        """
+        h = hashlib.sha256()
+        h.update(hash_pagina.encode())
+        h.update(b'\0' + version_audiveris.encode())
+        h.update(b'\0' + ' '.join(opciones).encode())
+        return h.hexdigest()
+
+
+class CacheRasters(CacheLRU):
+    """
+    Caché de páginas renderizadas en escala de grises, como archivos .npy
+
+    Las entradas se abren con memoria mapeada (np.load con mmap_mode='r'): varios
+    procesos y ejecuciones leen el mismo archivo sin copiarlo ni volver a
+    renderizar, y el sistema operativo solo carga las filas que se tocan. La
+    clave combina el hash del PDF, la página, el DPI y la versión del renderizador.
+    """
+
+    def __init__(self, directorio=None, limite_mb=2048):
+        super().__init__(directorio or directorio_cache_por_defecto('rasters'), limite_mb, extension='.npy')
+
+    def calcular_clave(self, hash_pdf, pagina, dpi, version_render=''):
+        """
+        Calcula la clave de caché de una página renderizada
+
+        Args:
+            hash_pdf (str): Hash del archivo PDF (ver hash_archivo)
+            pagina (int): Número de página (0-indexado)
+            dpi (int): Resolución de renderizado
+            version_render (str): Versión del renderizador (ej: de MuPDF)
+
+        Returns:
+            str: Clave hexadecimal
+        """
+        h = hashlib.sha256()
+        h.update(hash_pdf.encode())
+        h.update(f"\0{pagina}\0{dpi}\0{version_render}".encode())
+        return h.hexdigest()
+
+    def abrir(self, clave):
+        """
+        Abre una entrada como array de solo lectura con memoria mapeada
+
+        Returns:
+            numpy.memmap|None: Imagen de la página, o None si no está (o está dañada)
+        """
+        ruta = self.obtener(clave)
+        if ruta is None:
+            return None
+        try:
+            return np.load(ruta, mmap_mode='r')
+        except (OSError, ValueError):
+            return None
+
+    def abrir_en_disco(self, clave):
+        """
+        Abre una entrada sin mapearla: solo se lee la cabecera del .npy
+
+        Returns:
+            RasterEnDisco|None: Acceso por filas a la página, o None si no está
+        """
+        ruta = self.obtener(clave)
+        if ruta is None:
+            return None
+        try:
+            with open(ruta, 'rb') as f:
+                version = np.lib.format.read_magic(f)
+                if version == (1, 0):
+                    forma, orden_fortran, dtype = np.lib.format.read_array_header_1_0(f)
+                else:
+                    forma, orden_fortran, dtype = np.lib.format.read_array_header_2_0(f)
+                offset = f.tell()
+        except (OSError, ValueError):
+            return None
+        if orden_fortran or len(forma) != 2:
+            return None
+        return RasterEnDisco(ruta, forma, dtype, offset)
+
+    def guardar_array(self, clave, imagen):
+        """
+        Guarda una imagen ya renderizada como entrada (escritura atómica)
+
+        Returns:
+            Path: Ruta de la entrada guardada
+        """
+        archivo, temporal = self.crear_archivo(imagen.shape, imagen.dtype)
+        try:
+            archivo.write(np.ascontiguousarray(imagen).data)
+        except Exception:
+            self.descartar(temporal, archivo)
+            raise
+        return self.publicar(clave, archivo, temporal)
+
+    def crear_archivo(self, forma, dtype='uint8'):
+        """
+        Crea un .npy temporal en la carpeta de la caché para escribirlo por filas
+        (ej: franja por franja, sin tener la página completa en memoria)
+
+        Returns:
+            tuple: (archivo abierto tras la cabecera, ruta del temporal); las filas
+                   se escriben en orden con archivo.write y se confirma con
+                   publicar() o se descarta con descartar()
+        """
+        self.directorio.mkdir(parents=True, exist_ok=True)
+        fd, temporal = tempfile.mkstemp(dir=self.directorio, suffix='.tmp')
+        archivo = os.fdopen(fd, 'wb')
+        try:
+            np.lib.format.write_array_header_1_0(archivo, {
+                'descr': np.lib.format.dtype_to_descr(np.dtype(dtype)),
+                'fortran_order': False,
+                'shape': tuple(forma),
+            })
+        except Exception:
+            self.descartar(temporal, archivo)
+            raise
+        return archivo, temporal
+
+    def publicar(self, clave, archivo, temporal):
+        """Confirma un archivo creado con crear_archivo como entrada de la caché"""
+        destino = self.ruta_entrada(clave)
+        try:
+            archivo.close()
+            os.replace(temporal, destino)
+        except Exception:
+            self.descartar(temporal)
+            raise
+        self.desalojar()
+        return destino
+
+    def descartar(self, temporal, archivo=None):
+        """Elimina un archivo temporal que no se llegó a publicar"""
+        if archivo is not None:
+            archivo.close()
+        Path(temporal).unlink(missing_ok=True)
+
+
+class RasterEnDisco:
+    """
+    Página de la caché de rasters leída por rangos de filas
+
+    Cada lectura mapea solo las filas pedidas y el mapa se libera al soltar el
+    array, así la memoria residente depende del tamaño de la franja o del
+    recorte y no del de la página.
+
+    Args:
+        ruta (Path): Archivo .npy de la entrada
+        forma (tuple): (alto, ancho) de la página
+        dtype (numpy.dtype): Tipo de los píxeles
+        offset (int): Bytes de la cabecera del .npy
+    """
+
+    def __init__(self, ruta, forma, dtype, offset):
+        self.ruta = ruta
+        self.shape = tuple(forma)
+        self.dtype = dtype
+        self.offset = offset
+
+    def filas(self, desde, hasta):
+        """
+        Returns:
+            numpy.memmap: Filas [desde, hasta) de la página (solo lectura)
+        """
+        alto, ancho = self.shape
+        desde, hasta = max(0, desde), min(alto, hasta)
+        return np.memmap(self.ruta, dtype=self.dtype, mode='r', shape=(hasta - desde, ancho),
+                         offset=self.offset + desde * ancho * self.dtype.itemsize)
+
+    def region(self, caja):
+        """
+        Returns:
+            numpy.ndarray: Copia de la región (x_inicio, y_inicio, x_fin, y_fin)
+        """
+        x_inicio, y_inicio, x_fin, y_fin = caja
+        return np.array(self.filas(y_inicio, y_fin)[:, x_inicio:x_fin])
@@ -4,11 +4,136 @@ Detector de líneas de pentagrama en PDFs usando PyMuPDF
 No requiere poppler - funciona directamente en Windows
 """
 
-import cv2
 import numpy as np
-import fitz  # PyMuPDF
+import os
 import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
 from pathlib import Path
+from instrumentacion import Instrumentacion
+from cache_partituras import CacheRasters, hash_archivo
+from importacion_diferida import modulo_diferido
+
+# OpenCV y PyMuPDF se importan al usarlos por primera vez (la ayuda y los errores
+# de argumentos no los cargan)
+cv2 = modulo_diferido('cv2')
+fitz = modulo_diferido('fitz')  # PyMuPDF
+
+class ImagenPixmap(np.ndarray):
+    """
+    Array de NumPy construido sobre las muestras de un fitz.Pixmap
+    
+    Guarda una referencia al pixmap para que su buffer siga vivo mientras
+    exista el array o cualquier vista derivada de él.
+    """
+    pixmap = None
+
+def renderizar_pagina(doc, pagina=0, dpi=200, gris=True):
+    """
+    Renderiza una página de un documento ya abierto como array de NumPy
+    
+    El array se construye directamente sobre el buffer de muestras del pixmap,
+    sin copias intermedias ni codificación/decodificación de imagen.
+    
+    Args:
+        doc (fitz.Document): Documento abierto con fitz.open
+        pagina (int): Número de página (0-indexado)
+        dpi (int): Resolución
+        gris (bool): Si True, renderiza directamente en escala de grises (2D);
+                     si False, devuelve RGB (alto x ancho x 3)
+        
+    Returns:
+        numpy.ndarray: Imagen de la página
+    """
+    page = doc.load_page(pagina)
+    
+    # Crear matriz de transformación para el DPI deseado
+    mat = fitz.Matrix(dpi/72, dpi/72)
+    espacio_color = fitz.csGRAY if gris else fitz.csRGB
+    pix = page.get_pixmap(matrix=mat, colorspace=espacio_color, alpha=False)
+    
+    # Vista sobre las muestras del pixmap (el array mantiene vivo el pixmap)
+    muestras = np.frombuffer(pix.samples_mv, dtype=np.uint8).view(ImagenPixmap)
+    muestras.pixmap = pix
+    filas = muestras.reshape(pix.height, pix.stride)[:, :pix.width * pix.n]
+    
+    if pix.n == 1:
+        return filas
+    return filas.reshape(pix.height, pix.width, pix.n)
+
+def renderizar_region(doc, pagina, dpi, caja):
+    """
+    Renderiza en escala de grises solo una región de la página (clip de PyMuPDF)
+    
+    Args:
+        doc (fitz.Document): Documento abierto
+        pagina (int): Número de página (0-indexado)
+        dpi (int): Resolución
+        caja (tuple): (x_inicio, y_inicio, x_fin, y_fin) en píxeles de la página
+                      completa renderizada a ese DPI
+        
+    Returns:
+        numpy.ndarray: Imagen 2D de la región (alto y ancho de la caja)
+    """
+    page = doc.load_page(pagina)
+    escala = dpi / 72
+    x_inicio, y_inicio, x_fin, y_fin = caja
+    x0, y0 = page.rect.x0, page.rect.y0
+    clip = fitz.Rect(x0 + x_inicio / escala, y0 + y_inicio / escala, x0 + x_fin / escala, y0 + y_fin / escala)
+    pix = page.get_pixmap(matrix=fitz.Matrix(escala, escala), colorspace=fitz.csGRAY,
+                          alpha=False, clip=clip)
+    
+    muestras = np.frombuffer(pix.samples_mv, dtype=np.uint8).view(ImagenPixmap)
+    muestras.pixmap = pix
+    # El redondeo de PyMuPDF puede añadir o quitar una fila o columna en los bordes
+    return muestras.reshape(pix.height, pix.stride)[:y_fin - y_inicio, :min(pix.width, x_fin - x_inicio)]
+
+class RastersPDF:
+    """
+    Páginas renderizadas de un PDF guardadas en una CacheRasters
+    
+    Args:
+        cache (CacheRasters): Caché de páginas renderizadas
+        hash_pdf (str): Hash del archivo PDF (identifica el documento en la caché)
+    """
+    
+    def __init__(self, cache, hash_pdf):
+        self.cache = cache
+        self.hash_pdf = hash_pdf
+        self.version_render = str(getattr(fitz, 'VersionBind', ''))
+    
+    def clave(self, pagina, dpi):
+        return self.cache.calcular_clave(self.hash_pdf, pagina, dpi, self.version_render)
+    
+    def abrir(self, pagina, dpi):
+        """Página en escala de grises con memoria mapeada, o None si no está en la caché"""
+        return self.cache.abrir(self.clave(pagina, dpi))
+    
+    def abrir_en_disco(self, pagina, dpi):
+        """Página leída por rangos de filas (RasterEnDisco), o None si no está en la caché"""
+        return self.cache.abrir_en_disco(self.clave(pagina, dpi))
+    
+    def renderizar(self, doc, pagina, dpi):
+        """
+        Devuelve la página de la caché o la renderiza y la guarda
+        
+        Returns:
+            tuple: (imagen en escala de grises, True si vino de la caché)
+        """
+        imagen = self.abrir(pagina, dpi)
+        if imagen is not None:
+            return imagen, True
+        imagen = renderizar_pagina(doc, pagina, dpi)
+        try:
+            self.cache.guardar_array(self.clave(pagina, dpi), imagen)
+        except OSError as e:
+            print(f"ERROR guardando en la caché de rasters: {e}")
+        return imagen, False
+
+def tamano_renderizado(doc, pagina, dpi):
+    """Ancho y alto en píxeles de una página renderizada a ese DPI"""
+    rect = doc.load_page(pagina).rect * fitz.Matrix(dpi / 72, dpi / 72)
+    return rect.irect.width, rect.irect.height
 
 def pdf_a_imagen_pymupdf(ruta_pdf, pagina=0, dpi=200):
     """
@@ -23,31 +148,13 @@ def pdf_a_imagen_pymupdf(ruta_pdf, pagina=0, dpi=200):
         numpy.ndarray: Imagen en formato OpenCV (BGR)
     """
     try:
-        # Abrir el PDF
-        doc = fitz.open(ruta_pdf)
-        
-        if pagina >= len(doc):
-            print(f"❌ La página {pagina+1} no existe. El PDF tiene {len(doc)} páginas.")
-            return None
-        
-        # Obtener la página
-        page = doc.load_page(pagina)
-        
-        # Crear matriz de transformación para el DPI deseado
-        mat = fitz.Matrix(dpi/72, dpi/72)
-        
-        # Renderizar página a imagen
-        pix = page.get_pixmap(matrix=mat)
-        
-        # Convertir a array numpy
-        img_data = pix.tobytes("ppm")
-        
-        # Convertir a formato OpenCV
-        nparr = np.frombuffer(img_data, np.uint8)
-        imagen = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-        
-        doc.close()
-        return imagen
+        with fitz.open(ruta_pdf) as doc:
+            if pagina >= len(doc):
+                print(f"❌ La página {pagina+1} no existe. El PDF tiene {len(doc)} páginas.")
+                return None
+            
+            rgb = renderizar_pagina(doc, pagina, dpi, gris=False)
+            return cv2.cvtColor(rgb, cv2.COLOR_RGB2BGR)
         
     except Exception as e:
         print(f"❌ Error al convertir PDF: {e}")
@@ -58,14 +165,14 @@ def detectar_lineas_pentagrama(imagen):
     Detecta líneas de pentagrama en una imagen
     
     Args:
-        imagen (numpy.ndarray): Imagen en formato OpenCV
+        imagen (numpy.ndarray): Imagen en escala de grises o BGR
         
     Returns:
         tuple: (lineas_detectadas, pentagramas, imagen_resultado)
     """
     
-    # Convertir a escala de grises
-    gris = cv2.cvtColor(imagen, cv2.COLOR_BGR2GRAY)
+    # Convertir a escala de grises (si la imagen no lo está ya)
+    gris = imagen if imagen.ndim == 2 else cv2.cvtColor(imagen, cv2.COLOR_BGR2GRAY)
     
     # Aplicar filtro gaussiano para reducir ruido
     gris_suave = cv2.GaussianBlur(gris, (3, 3), 0)
@@ -101,13 +208,337 @@ def detectar_lineas_pentagrama(imagen):
     
     return lineas, lineas_horizontales
 
-def agrupar_pentagramas(lineas, tolerancia=30):
+def _umbral_otsu(gris, paso=4):
+    """
+    Calcula el umbral de Otsu de una imagen en escala de grises con NumPy
+    
+    El histograma se toma sobre una submuestra (una de cada 'paso' filas y columnas),
+    suficiente para estimar el umbral y mucho más rápido que recorrer toda la página.
+    """
+    muestra = gris[::paso, ::paso]
+    histograma = np.bincount(muestra.ravel(), minlength=256).astype(np.float64)
+    total = muestra.size
+    omega = np.cumsum(histograma) / total
+    mu = np.cumsum(histograma * np.arange(256)) / total
+    mu_total = mu[-1]
+    
+    with np.errstate(divide='ignore', invalid='ignore'):
+        varianza = (mu_total * omega - mu) ** 2 / (omega * (1 - omega))
+    # Imagen de un solo tono (ej: franja en blanco): solo el negro puro cuenta como tinta
+    if np.isnan(varianza).all():
+        return 0
+    return int(np.nanargmax(varianza))
+
+def detectar_lineas_proyeccion(imagen, tolerancia_hueco=3):
+    """
+    Detecta líneas de pentagrama con el perfil de proyección horizontal
+    
+    Binariza la imagen, descarta las filas con pocos píxeles negros y analiza las
+    rachas horizontales de las filas restantes, todo con operaciones de NumPy.
+    Devuelve las mismas tuplas (x1, y, x2, y) que detectar_lineas_pentagrama.
+    
+    Args:
+        imagen (numpy.ndarray): Imagen en escala de grises o BGR
+        tolerancia_hueco (int): Huecos horizontales (en píxeles) que no cortan una línea
+        
+    Returns:
+        tuple: (lineas_detectadas, imagen_lineas)
+    """
+    gris = imagen if imagen.ndim == 2 else cv2.cvtColor(imagen, cv2.COLOR_BGR2GRAY)
+    alto, ancho = gris.shape
+    longitud_minima = min(ancho // 4, 100)  # Igual que el kernel del método morfológico
+    
+    # Binarización global (True = tinta) y perfil de proyección por filas
+    binaria = gris <= _umbral_otsu(gris)
+    perfil = np.count_nonzero(binaria, axis=1)
+    candidatas = np.flatnonzero(perfil >= longitud_minima)
+    imagen_lineas = np.zeros((alto, ancho), dtype=np.uint8)
+    
+    if candidatas.size == 0:
+        return [], imagen_lineas
+    
+    # Rachas horizontales de las filas candidatas (inicio incluido, fin excluido)
+    filas = np.pad(binaria[candidatas], ((0, 0), (1, 1))).view(np.int8)
+    bordes = np.diff(filas, axis=1)
+    fila_ini, x_ini = np.nonzero(bordes == 1)
+    _, x_fin = np.nonzero(bordes == -1)
+    
+    # Unir rachas de la misma fila separadas por huecos pequeños
+    hueco = x_ini[1:] - x_fin[:-1]
+    misma_fila = fila_ini[1:] == fila_ini[:-1]
+    nueva = np.concatenate(([True], ~(misma_fila & (hueco <= tolerancia_hueco))))
+    indices = np.flatnonzero(nueva)
+    x_ini = x_ini[indices]
+    x_fin = np.maximum.reduceat(x_fin, indices)
+    fila_ini = fila_ini[indices]
+    
+    largas = (x_fin - x_ini) >= longitud_minima
+    if not np.any(largas):
+        return [], imagen_lineas
+    
+    y = candidatas[fila_ini[largas]]
+    x_ini = x_ini[largas]
+    x_fin = x_fin[largas]
+    
+    for yy, xi, xf in zip(y.tolist(), x_ini.tolist(), x_fin.tolist()):
+        imagen_lineas[yy, xi:xf] = 255
+    
+    # Filas consecutivas forman una misma línea (líneas de más de 1 px de grosor)
+    inicios = np.flatnonzero(np.concatenate(([True], np.diff(y) > 1)))
+    y_ini = y[inicios]
+    y_fin = np.maximum.reduceat(y, inicios)
+    x1 = np.minimum.reduceat(x_ini, inicios)
+    x2 = np.maximum.reduceat(x_fin, inicios)
+    y_centro = y_ini + (y_fin - y_ini + 1) // 2
+    
+    lineas = list(zip(x1.tolist(), y_centro.tolist(), x2.tolist(), y_centro.tolist()))
+    return lineas, imagen_lineas
+
+# Motores de detección de líneas disponibles
+MOTORES_DETECCION = {
+    'morfologia': detectar_lineas_pentagrama,
+    'proyeccion': detectar_lineas_proyeccion,
+}
+
+def comparar_motores(imagen, tolerancia_y=3):
+    """
+    Compara velocidad y coincidencia de los dos motores de detección en una imagen
+    
+    Args:
+        imagen (numpy.ndarray): Imagen de la página
+        tolerancia_y (int): Diferencia vertical máxima para considerar iguales dos líneas
+        
+    Returns:
+        dict: Tiempos, número de líneas, coincidencias y acuerdo (0..1) entre motores
+    """
+    t = time.perf_counter()
+    lineas_morf, _ = detectar_lineas_pentagrama(imagen)
+    tiempo_morf = time.perf_counter() - t
+    
+    t = time.perf_counter()
+    lineas_proy, _ = detectar_lineas_proyeccion(imagen)
+    tiempo_proy = time.perf_counter() - t
+    
+    coincidencias = 0
+    if lineas_morf and lineas_proy:
+        morf = np.array(lineas_morf)
+        proy = np.array(lineas_proy)
+        # Misma altura (con tolerancia) y rangos horizontales solapados
+        cerca = np.abs(morf[:, None, 1] - proy[None, :, 1]) <= tolerancia_y
+        solapan = (morf[:, None, 0] < proy[None, :, 2]) & (proy[None, :, 0] < morf[:, None, 2])
+        coincidencias = int(np.count_nonzero(np.any(cerca & solapan, axis=1)))
+    
+    total = len(lineas_morf) + len(lineas_proy)
+    return {
+        'tiempo_morfologia': tiempo_morf,
+        'tiempo_proyeccion': tiempo_proy,
+        'lineas_morfologia': len(lineas_morf),
+        'lineas_proyeccion': len(lineas_proy),
+        'coincidencias': coincidencias,
+        'acuerdo': 2 * coincidencias / total if total else 1.0,
+    }
+
+def estimar_espaciado_pentagrama(imagen, columnas=200):
+    """
+    Estima el grosor de las líneas y el espacio entre líneas del pentagrama
+    
+    Usa los histogramas de rachas verticales de una muestra de columnas: la racha
+    negra más frecuente es el grosor de línea y la blanca más frecuente, el espacio
+    entre líneas. Ambos valores escalan con el DPI y el tamaño del grabado.
+    
+    Args:
+        imagen (numpy.ndarray): Imagen en escala de grises o BGR
+        columnas (int): Número aproximado de columnas a muestrear
+        
+    Returns:
+        tuple: (grosor, espaciado) en píxeles, o (None, None) si no se pudo estimar
+    """
+    negras, blancas = histogramas_rachas(imagen, columnas)
+    if negras is None:
+        return None, None
+    return int(negras.argmax()), int(blancas.argmax())
+
+def histogramas_rachas(imagen, columnas=200):
+    """
+    Histogramas de las rachas verticales negras y blancas de una muestra de columnas
+    
+    Los histogramas de varias franjas de una misma página se pueden sumar antes
+    de tomar el máximo (ver detectar_lineas_por_franjas).
+    
+    Returns:
+        tuple: (histograma de rachas negras, histograma de rachas blancas) como
+               arrays indexados por longitud, o (None, None) si no hay rachas
+    """
+    gris = imagen if imagen.ndim == 2 else cv2.cvtColor(imagen, cv2.COLOR_BGR2GRAY)
+    paso = max(1, gris.shape[1] // columnas)
+    
+    # Columnas muestreadas como filas (True = tinta), con bordes blancos
+    muestra = np.pad((gris[:, ::paso] <= _umbral_otsu(gris)).T, ((0, 0), (1, 1)))
+    bordes = np.diff(muestra.view(np.int8), axis=1)
+    columna, inicio = np.nonzero(bordes == 1)
+    _, fin = np.nonzero(bordes == -1)
+    
+    if inicio.size < 2:
+        return None, None
+    
+    negras = fin - inicio
+    misma_columna = columna[1:] == columna[:-1]
+    blancas = (inicio[1:] - fin[:-1])[misma_columna]
+    
+    if blancas.size == 0:
+        return None, None
+    
+    return np.bincount(negras), np.bincount(blancas)
+
+def _sumar_histogramas(a, b):
+    """Suma dos histogramas de distinta longitud (None = vacío)"""
+    if a is None:
+        return b
+    if b is None:
+        return a
+    if len(a) < len(b):
+        a, b = b, a
+    a = a.copy()
+    a[:len(b)] += b
+    return a
+
+def _escribir_filas(archivo, franja, y_inicio, y_fin, escritas, ancho):
+    """
+    Escribe en la caché las filas de una franja que aún no se escribieron
+    
+    Returns:
+        int: Filas de la página escritas hasta ahora
+    """
+    filas = franja[escritas - y_inicio:]
+    esperadas = y_fin - escritas
+    if filas.shape != (esperadas, ancho):
+        # El redondeo del clip puede dejar la franja una fila o columna más corta: rellenar en blanco
+        completas = np.full((esperadas, ancho), 255, dtype=np.uint8)
+        completas[:filas.shape[0], :filas.shape[1]] = filas[:esperadas, :ancho]
+        filas = completas
+    archivo.write(np.ascontiguousarray(filas).data)
+    return y_fin
+
+# Bytes por píxel que reservan a la vez la franja y las copias de la detección
+# (gris, suavizado, binaria, líneas y temporales de OpenCV/NumPy)
+BYTES_POR_PIXEL_DETECCION = 6
+
+def detectar_lineas_por_franjas(doc, pagina, dpi, motor='morfologia', memoria_mb=64, rasters=None):
+    """
+    Detecta las líneas de una página renderizándola en franjas horizontales solapadas
+    
+    Cada franja se renderiza con un clip de PyMuPDF y se analiza por separado, de
+    modo que la memoria pico depende de memoria_mb y no del DPI. Las franjas se
+    solapan para que toda línea quede entera en alguna de ellas; cada franja se
+    queda solo con las líneas cuyo centro cae en su zona propia (la mitad del
+    solape a cada lado), así las líneas del solape no se duplican.
+    
+    Args:
+        doc (fitz.Document): Documento abierto
+        pagina (int): Número de página (0-indexado)
+        dpi (int): Resolución de renderizado
+        motor (str): Motor de detección de líneas (ver MOTORES_DETECCION)
+        memoria_mb (int): Memoria aproximada por franja, incluida la detección
+        rasters (RastersPDF): Caché de páginas: si la página está, cada franja se lee
+                              del archivo (solo sus filas); si no, las filas nuevas de
+                              cada franja se escriben en él en orden
+        
+    Returns:
+        dict: 'lineas' en coordenadas de la página completa, 'grosor', 'espaciado',
+              'franjas', 'raster' (RasterEnDisco de la caché o None) y tiempos de
+              'render' y 'deteccion'
+    """
+    ancho, alto = tamano_renderizado(doc, pagina, dpi)
+    raster = rasters.abrir_en_disco(pagina, dpi) if rasters else None
+    archivo = temporal = None
+    if raster is not None:
+        alto, ancho = raster.shape
+    elif rasters:
+        try:
+            archivo, temporal = rasters.cache.crear_archivo((alto, ancho))
+        except OSError as e:
+            print(f"ERROR guardando en la caché de rasters: {e}")
+    # El solape cubre un pentagrama entero a 200 DPI (proporcional a otros DPI)
+    solape = round(80 * dpi / 200)
+    alto_franja = memoria_mb * 1024 * 1024 // (ancho * BYTES_POR_PIXEL_DETECCION)
+    alto_franja = max(alto_franja, 3 * solape)
+    
+    lineas = []
+    negras = blancas = None
+    franjas = 0
+    render = deteccion = 0.0
+    y_inicio = 0
+    # Filas ya escritas en la caché (las del solape no se repiten)
+    escritas = 0
+    try:
+        while True:
+            y_fin = min(alto, y_inicio + alto_franja)
+            t = time.perf_counter()
+            if raster is not None:
+                franja = raster.filas(y_inicio, y_fin)
+            else:
+                franja = renderizar_region(doc, pagina, dpi, (0, y_inicio, ancho, y_fin))
+                if archivo is not None:
+                    escritas = _escribir_filas(archivo, franja, y_inicio, y_fin, escritas, ancho)
+            render += time.perf_counter() - t
+            
+            t = time.perf_counter()
+            lineas_franja, _ = MOTORES_DETECCION[motor](franja)
+            # Zona propia: de la mitad del solape anterior a la mitad del siguiente
+            propia_inicio = y_inicio + solape // 2 if y_inicio > 0 else 0
+            propia_fin = y_fin - solape // 2 if y_fin < alto else alto
+            for x1, y1, x2, y2 in lineas_franja:
+                if propia_inicio <= y_inicio + y1 < propia_fin:
+                    lineas.append((x1, y_inicio + y1, x2, y_inicio + y2))
+            negras_franja, blancas_franja = histogramas_rachas(franja)
+            negras = _sumar_histogramas(negras, negras_franja)
+            blancas = _sumar_histogramas(blancas, blancas_franja)
+            deteccion += time.perf_counter() - t
+            
+            franjas += 1
+            # Soltar la franja (y su mapa de memoria) antes de la siguiente
+            del franja, lineas_franja
+            if y_fin >= alto:
+                break
+            y_inicio = y_fin - solape
+    except BaseException:
+        # La entrada a medio escribir no se publica
+        if archivo is not None:
+            rasters.cache.descartar(temporal, archivo)
+        raise
+    
+    if archivo is not None:
+        try:
+            rasters.cache.publicar(rasters.clave(pagina, dpi), archivo, temporal)
+        except OSError as e:
+            print(f"ERROR guardando en la caché de rasters: {e}")
+    
+    return {
+        'lineas': lineas,
+        'grosor': int(negras.argmax()) if negras is not None else None,
+        'espaciado': int(blancas.argmax()) if blancas is not None else None,
+        'franjas': franjas,
+        'raster': raster,
+        'render': render,
+        'deteccion': deteccion,
+    }
+
+def agrupar_pentagramas(lineas, tolerancia=None, espaciado=None, grosor=None):
     """
     Agrupa líneas en pentagramas
     
+    Primero fusiona las detecciones casi duplicadas de una misma línea gruesa y
+    luego agrupa las líneas en pentagramas de hasta 5 líneas, todo de forma
+    vectorizada. Los umbrales se derivan del espaciado entre líneas, por lo que
+    no dependen del DPI de renderizado.
+    
     Args:
         lineas (list): Lista de líneas [(x1, y1, x2, y2), ...]
         tolerancia (int): Distancia máxima entre líneas del mismo pentagrama
+                          (None = se calcula a partir del espaciado)
+        espaciado (int): Espacio entre líneas (ver estimar_espaciado_pentagrama);
+                         si no se indica, se estima con las propias líneas
+        grosor (int): Grosor de las líneas en píxeles
         
     Returns:
         list: Lista de pentagramas
@@ -116,157 +547,725 @@ def agrupar_pentagramas(lineas, tolerancia=30):
         return []
     
     # Ordenar líneas por posición Y
-    lineas_ordenadas = sorted(lineas, key=lambda l: l[1])
+    datos = np.array(sorted(lineas, key=lambda l: l[1]), dtype=np.int64)
+    y = datos[:, 1]
+    grosor = grosor or 1
+    
+    # Distancia entre líneas consecutivas de un pentagrama
+    if espaciado:
+        distancia = espaciado + grosor
+    else:
+        saltos = np.diff(y)
+        saltos = saltos[saltos > grosor + 1]
+        if saltos.size == 0:
+            return []
+        distancia = int(np.bincount(saltos).argmax())
+    
+    # Fusionar detecciones duplicadas de la misma línea
+    umbral_duplicado = max(1, min(grosor + 1, distancia // 3))
+    inicios = np.flatnonzero(np.concatenate(([True], np.diff(y) > umbral_duplicado)))
+    cantidad = np.diff(np.append(inicios, len(y)))
+    x1 = np.minimum.reduceat(datos[:, 0], inicios)
+    x2 = np.maximum.reduceat(datos[:, 2], inicios)
+    y = np.add.reduceat(y, inicios) // cantidad
+    
+    # Líneas separadas por más de la tolerancia empiezan un grupo nuevo
+    # (por defecto, 2.5 distancias: admite una línea no detectada)
+    if tolerancia is None:
+        tolerancia = 2.5 * distancia
+    grupo = np.cumsum(np.concatenate(([True], np.diff(y) > tolerancia)))
+    
+    # Dividir los grupos de más de 5 líneas en bloques de 5
+    inicio_grupo = np.flatnonzero(np.concatenate(([True], np.diff(grupo) != 0)))
+    posicion = np.arange(len(y)) - np.repeat(inicio_grupo, np.diff(np.append(inicio_grupo, len(y))))
+    clave = grupo * (len(y) + 1) + posicion // 5
     
+    # Si el grupo tiene al menos 3 líneas, considerarlo pentagrama
+    cortes = np.flatnonzero(np.diff(clave) != 0) + 1
     pentagramas = []
-    grupo_actual = [lineas_ordenadas[0]]
+    for indices in np.split(np.arange(len(y)), cortes):
+        if len(indices) >= 3:
+            pentagramas.append([(int(x1[k]), int(y[k]), int(x2[k]), int(y[k])) for k in indices])
     
-    for i in range(1, len(lineas_ordenadas)):
-        linea_actual = lineas_ordenadas[i]
-        linea_anterior = lineas_ordenadas[i-1]
+    return pentagramas
+
+def extraer_recortes(imagen, pentagramas, dpi=200):
+    """
+    Recorta cada pentagrama de la página sin copiar píxeles
+    
+    Args:
+        imagen (numpy.ndarray): Imagen de la página
+        pentagramas (list): Pentagramas devueltos por agrupar_pentagramas
+        dpi (int): Resolución de la imagen (para escalar el margen)
         
-        # Calcular distancia vertical
-        distancia = abs(linea_actual[1] - linea_anterior[1])
+    Returns:
+        list: Diccionarios con 'imagen' (vista de NumPy sobre la página),
+              'caja' (x_inicio, y_inicio, x_fin, y_fin) y 'lineas'
+    """
+    recortes = []
+    for caja, lineas in cajas_recortes(pentagramas, imagen.shape[1], imagen.shape[0], dpi):
+        x_inicio, y_inicio, x_fin, y_fin = caja
+        recortes.append({
+            'imagen': imagen[y_inicio:y_fin, x_inicio:x_fin],
+            'caja': caja,
+            'lineas': lineas,
+        })
+    
+    return recortes
+
+def extraer_recortes_renderizados(doc, pagina, pentagramas, ancho, alto, dpi=200):
+    """
+    Como extraer_recortes, pero renderiza cada pentagrama por separado (clip de
+    PyMuPDF) en lugar de recortar una página completa ya renderizada
+    
+    Args:
+        doc (fitz.Document): Documento abierto
+        pagina (int): Número de página (0-indexado)
+        pentagramas (list): Pentagramas en coordenadas de la página renderizada a 'dpi'
+        ancho, alto (int): Tamaño en píxeles de la página completa a 'dpi'
+        dpi (int): Resolución de los recortes
+        
+    Returns:
+        list: Diccionarios con 'imagen', 'caja' y 'lineas'
+    """
+    return [{'imagen': renderizar_region(doc, pagina, dpi, caja), 'caja': caja, 'lineas': lineas}
+            for caja, lineas in cajas_recortes(pentagramas, ancho, alto, dpi)]
+
+def _recortes_sin_pagina(doc, pagina, pentagramas, dpi, raster=None):
+    """
+    Recortes de los pentagramas sin cargar la página completa: leídos de la caché
+    de rasters (solo las filas de cada recorte) o renderizados uno a uno
+    
+    Args:
+        raster (RasterEnDisco): Página en la caché, o None para renderizar los recortes
+    """
+    if raster is None:
+        ancho, alto = tamano_renderizado(doc, pagina, dpi)
+        return extraer_recortes_renderizados(doc, pagina, pentagramas, ancho, alto, dpi)
+    alto, ancho = raster.shape
+    return [{'imagen': raster.region(caja), 'caja': caja, 'lineas': lineas}
+            for caja, lineas in cajas_recortes(pentagramas, ancho, alto, dpi)]
+
+def escalar_pentagramas(pentagramas, escala):
+    """
+    Lleva los pentagramas localizados a una resolución a las coordenadas de otra
+    
+    Args:
+        pentagramas (list): Pentagramas devueltos por agrupar_pentagramas
+        escala (float): Cociente entre los DPI de destino y los de localización
+        
+    Returns:
+        list: Pentagramas con las coordenadas escaladas (enteros)
+    """
+    return [[tuple(round(coordenada * escala) for coordenada in linea) for linea in pentagrama]
+            for pentagrama in pentagramas]
+
+def cajas_recortes(pentagramas, ancho, alto, dpi=200):
+    """
+    Calcula la caja de recorte de cada pentagrama (con margen, dentro de la página)
+    
+    Returns:
+        list: Tuplas ((x_inicio, y_inicio, x_fin, y_fin), número de líneas)
+    """
+    # Añadir margen de 30 píxeles a 200 DPI (proporcional a otros DPI)
+    margen = round(30 * dpi / 200)
+    margen_abajo = margen
+    cajas = []
+    
+    for pentagrama in pentagramas:
+        # Calcular límites del pentagrama
+        x_min = min(linea[0] for linea in pentagrama)  # X mínimo
+        x_max = max(linea[2] for linea in pentagrama)  # X máximo
+        y_min = min(linea[1] for linea in pentagrama)  # Y mínimo
+        y_max = max(linea[1] for linea in pentagrama)  # Y máximo
+        
+        x_inicio = max(0, x_min - margen)
+        y_inicio = max(0, y_min - margen)
+        x_fin = min(ancho, x_max + margen)
+        y_fin = min(alto, y_max + margen_abajo)
+        
+        cajas.append(((x_inicio, y_inicio, x_fin, y_fin), len(pentagrama)))
+    
+    return cajas
+
+class EscritorImagenes:
+    """
+    Guarda imágenes en segundo plano con un pool de hilos
+    
+    cv2.imwrite libera el GIL mientras codifica, así que varias imágenes se
+    codifican en paralelo y quien las encola no espera al disco.
+    
+    Args:
+        formato (str): 'png', 'jpg' o 'webp'
+        compresion (int): Nivel de compresión PNG (0-9) o calidad JPEG/WebP (0-100);
+                          None = valor por defecto del formato
+        hilos (int): Hilos de escritura
+    """
+    
+    # Formato → (parámetro de cv2.imwrite, valor por defecto)
+    PARAMETROS = {
+        'png': ('IMWRITE_PNG_COMPRESSION', 3),
+        'jpg': ('IMWRITE_JPEG_QUALITY', 95),
+        'webp': ('IMWRITE_WEBP_QUALITY', 90),
+    }
+    
+    def __init__(self, formato='png', compresion=None, hilos=4):
+        if formato not in self.PARAMETROS:
+            raise ValueError(f"Formato de imagen no soportado: {formato}")
+        self.formato = formato
+        parametro, por_defecto = self.PARAMETROS[formato]
+        self.parametros = [getattr(cv2, parametro), por_defecto if compresion is None else compresion]
+        self.pool = ThreadPoolExecutor(max_workers=hilos)
+        self.pendientes = []
+    
+    def guardar(self, ruta_base, imagen):
+        """
+        Encola la escritura de una imagen
+        
+        Args:
+            ruta_base (str): Ruta de salida sin extensión
+            imagen (numpy.ndarray): Imagen (puede ser una vista; se mantiene viva hasta escribirla)
+            
+        Returns:
+            str: Ruta final del archivo (con la extensión del formato)
+        """
+        ruta = f"{ruta_base}.{self.formato}"
+        self.pendientes.append((ruta, self.pool.submit(cv2.imwrite, ruta, imagen, self.parametros)))
+        return ruta
+    
+    def esperar(self):
+        """
+        Espera a que terminen las escrituras encoladas
+        
+        Returns:
+            list: Tuplas (ruta, error) de las escrituras que fallaron
+        """
+        errores = []
+        for ruta, futuro in self.pendientes:
+            try:
+                if not futuro.result():
+                    errores.append((ruta, "cv2.imwrite no pudo escribir el archivo"))
+            except Exception as e:
+                errores.append((ruta, str(e)))
+        self.pendientes = []
+        return errores
+    
+    def cerrar(self):
+        """Espera las escrituras pendientes y libera los hilos"""
+        errores = self.esperar()
+        self.pool.shutdown()
+        return errores
+
+def analizar_pagina(doc, ruta_pdf, pagina, dpi=200, motor='morfologia', escritor=None, depuracion=False,
+                    memoria_franjas_mb=None, dpi_localizacion=None, rasters=None):
+    """
+    Detecta los pentagramas de una página y, opcionalmente, guarda sus recortes
+    
+    Args:
+        doc (fitz.Document): Documento abierto
+        ruta_pdf (str): Ruta al archivo PDF (para nombrar los archivos generados)
+        pagina (int): Número de página (0-indexado)
+        dpi (int): Resolución de renderizado
+        motor (str): Motor de detección de líneas (ver MOTORES_DETECCION)
+        escritor (EscritorImagenes): Escritor para guardar los recortes en
+                                     temporal_files/ (None = no se guardan)
+        depuracion (bool): Si True, guarda también las imágenes de depuración
+                           (página con líneas marcadas y máscara de líneas)
+        memoria_franjas_mb (int): Si se indica, la página se analiza en franjas de
+                                  esta memoria aproximada (ver detectar_lineas_por_franjas)
+                                  y los recortes se renderizan uno a uno; None = página completa
+        dpi_localizacion (int): Si es menor que 'dpi', los pentagramas se localizan en
+                                una página renderizada a esta resolución y solo sus
+                                regiones se renderizan a 'dpi' (ver escalar_pentagramas)
+        rasters (RastersPDF): Caché de páginas renderizadas (None = renderizar siempre)
+        
+    Returns:
+        dict: Líneas, pentagramas, recortes, archivos de depuración, tiempos por etapa
+              y si el render principal vino de la caché ('raster_en_cache')
+    """
+    tiempos = {}
+    inicio = time.perf_counter()
+    inicio_cpu = time.process_time()
+    franjas = None
+    # Página renderizada y pentagramas en sus coordenadas (para la depuración)
+    imagen = None
+    pentagramas_imagen = None
+    en_cache = False
+    
+    if dpi_localizacion and dpi_localizacion < dpi:
+        # Localizar a baja resolución y renderizar a 'dpi' solo las regiones de los pentagramas
+        if rasters:
+            imagen, en_cache = rasters.renderizar(doc, pagina, dpi_localizacion)
+        else:
+            imagen = renderizar_pagina(doc, pagina, dpi_localizacion)
+        tiempos['render'] = time.perf_counter() - inicio
+        
+        t = time.perf_counter()
+        lineas, imagen_lineas = MOTORES_DETECCION[motor](imagen)
+        tiempos['deteccion'] = time.perf_counter() - t
         
-        if distancia <= tolerancia:
-            grupo_actual.append(linea_actual)
+        t = time.perf_counter()
+        grosor, espaciado = estimar_espaciado_pentagrama(imagen)
+        pentagramas_imagen = agrupar_pentagramas(lineas, espaciado=espaciado, grosor=grosor)
+        escala = dpi / dpi_localizacion
+        pentagramas = escalar_pentagramas(pentagramas_imagen, escala)
+        grosor = round(grosor * escala) if grosor else grosor
+        espaciado = round(espaciado * escala) if espaciado else espaciado
+        tiempos['agrupacion'] = time.perf_counter() - t
+        
+        t = time.perf_counter()
+        # Si la página a 'dpi' ya está en la caché, los recortes se leen de ella
+        raster = rasters.abrir_en_disco(pagina, dpi) if rasters else None
+        recortes = _recortes_sin_pagina(doc, pagina, pentagramas, dpi, raster)
+    elif memoria_franjas_mb:
+        # Render y detección por franjas: nunca hay una página completa en memoria
+        deteccion = detectar_lineas_por_franjas(doc, pagina, dpi, motor, memoria_franjas_mb, rasters)
+        lineas, grosor, espaciado = deteccion['lineas'], deteccion['grosor'], deteccion['espaciado']
+        franjas = deteccion['franjas']
+        raster = deteccion['raster']
+        en_cache = raster is not None
+        tiempos['render'] = deteccion['render']
+        tiempos['deteccion'] = deteccion['deteccion']
+        
+        t = time.perf_counter()
+        pentagramas = agrupar_pentagramas(lineas, espaciado=espaciado, grosor=grosor)
+        tiempos['agrupacion'] = time.perf_counter() - t
+        
+        t = time.perf_counter()
+        recortes = _recortes_sin_pagina(doc, pagina, pentagramas, dpi, raster)
+    else:
+        # Renderizar la página directamente en escala de grises (o abrirla de la caché)
+        if rasters:
+            imagen, en_cache = rasters.renderizar(doc, pagina, dpi)
         else:
-            # Si el grupo tiene al menos 3 líneas, considerarlo pentagrama
-            if len(grupo_actual) >= 3:
-                pentagramas.append(grupo_actual)
-            grupo_actual = [linea_actual]
+            imagen = renderizar_pagina(doc, pagina, dpi)
+        tiempos['render'] = time.perf_counter() - inicio
+        
+        # Detectar líneas
+        t = time.perf_counter()
+        lineas, imagen_lineas = MOTORES_DETECCION[motor](imagen)
+        tiempos['deteccion'] = time.perf_counter() - t
+        
+        # Estimar el espaciado del pentagrama y agrupar las líneas
+        t = time.perf_counter()
+        grosor, espaciado = estimar_espaciado_pentagrama(imagen)
+        pentagramas = pentagramas_imagen = agrupar_pentagramas(lineas, espaciado=espaciado, grosor=grosor)
+        tiempos['agrupacion'] = time.perf_counter() - t
+        
+        # Extraer recortes de cada pentagrama (vistas sobre la página)
+        t = time.perf_counter()
+        recortes = extraer_recortes(imagen, pentagramas, dpi)
+    nombre_archivo = Path(ruta_pdf).stem
     
-    # Agregar el último grupo
-    if len(grupo_actual) >= 3:
-        pentagramas.append(grupo_actual)
+    if escritor:
+        # Crear carpeta tmp si no existe
+        carpeta_tmp = Path("temporal_files")
+        carpeta_tmp.mkdir(exist_ok=True)
+        for i, recorte in enumerate(recortes):
+            recorte['archivo'] = escritor.guardar(
+                str(carpeta_tmp / f"{nombre_archivo}_pagina_{pagina+1}_pentagrama_{i+1}"), recorte['imagen'])
+    tiempos['recortes'] = time.perf_counter() - t
     
-    return pentagramas
+    archivos_depuracion = []
+    # Las imágenes de depuración necesitan la página completa (no se generan por franjas;
+    # en el modo de localización se dibujan sobre la página de baja resolución)
+    if depuracion and imagen is not None:
+        # Imagen completa con líneas marcadas
+        resultado = cv2.cvtColor(imagen, cv2.COLOR_GRAY2BGR)
+        colores = [(255, 0, 0), (0, 255, 0), (0, 0, 255), (255, 255, 0), (255, 0, 255)]
+        
+        for i, pentagrama in enumerate(pentagramas_imagen):
+            color = colores[i % len(colores)]
+            for x1, y1, x2, y2 in pentagrama:
+                cv2.line(resultado, (x1, y1), (x2, y2), color, 2)
+        
+        archivo_completo = f"{nombre_archivo}_pagina_{pagina+1}_completa_marcada.png"
+        archivo_lineas = f"{nombre_archivo}_pagina_{pagina+1}_lineas.png"
+        cv2.imwrite(archivo_completo, resultado)
+        cv2.imwrite(archivo_lineas, imagen_lineas)
+        archivos_depuracion = [archivo_completo, archivo_lineas]
+    
+    tiempos['total'] = time.perf_counter() - inicio
+    tiempos['cpu'] = time.process_time() - inicio_cpu
+    
+    return {
+        'pagina': pagina,
+        'lineas': len(lineas),
+        'pentagramas': len(pentagramas),
+        'grosor': grosor,
+        'espaciado': espaciado,
+        'franjas': franjas,
+        'raster_en_cache': en_cache,
+        'recortes': recortes,
+        'archivos_depuracion': archivos_depuracion,
+        'tiempos': tiempos,
+    }
 
-def analizar_pdf_completo(ruta_pdf):
+# Documento, escritor de imágenes y caché de rasters de cada proceso del pool
+# (ver _inicializar_trabajador)
+_documento_trabajador = None
+_escritor_trabajador = None
+_rasters_trabajador = None
+
+def _inicializar_trabajador(ruta_pdf, opciones_escritor, opciones_rasters):
+    """Abre el PDF y crea el escritor de imágenes y la caché una vez en cada proceso del pool"""
+    global _documento_trabajador, _escritor_trabajador, _rasters_trabajador
+    _documento_trabajador = fitz.open(ruta_pdf)
+    if opciones_escritor is not None:
+        _escritor_trabajador = EscritorImagenes(**opciones_escritor)
+    if opciones_rasters is not None:
+        _rasters_trabajador = _crear_rasters(**opciones_rasters)
+
+def _crear_rasters(hash_pdf, directorio=None, limite_mb=None):
+    """Crea el acceso a la caché de rasters de un PDF"""
+    return RastersPDF(CacheRasters(directorio, limite_mb or 2048), hash_pdf)
+
+def _analizar_pagina_en_proceso(ruta_pdf, pagina, dpi, motor, depuracion, memoria_franjas_mb,
+                                dpi_localizacion):
+    """
+    Analiza una página con el documento abierto por el proceso del pool
+    
+    Los recortes se codifican en segundo plano mientras se termina la página; antes
+    de devolver el resultado se espera a que estén en disco.
+    """
+    resultado = analizar_pagina(_documento_trabajador, ruta_pdf, pagina, dpi, motor,
+                                _escritor_trabajador, depuracion, memoria_franjas_mb, dpi_localizacion,
+                                _rasters_trabajador)
+    resultado['errores_escritura'] = _escritor_trabajador.esperar() if _escritor_trabajador else []
+    return _sin_pixeles(resultado)
+
+def _sin_pixeles(resultado):
+    """Quita las vistas de imagen de los recortes (no se envían entre procesos ni se acumulan)"""
+    for recorte in resultado['recortes']:
+        recorte.pop('imagen', None)
+    return resultado
+
+def parsear_rango_paginas(texto, num_paginas):
+    """
+    Convierte una selección de páginas ('1-5,8,10-') a índices 0-indexados
+    
+    Args:
+        texto (str): Páginas o rangos separados por comas (numeradas desde 1)
+        num_paginas (int): Total de páginas del documento
+        
+    Returns:
+        list: Índices de página ordenados y sin repetir
+    """
+    paginas = set()
+    for parte in texto.split(','):
+        parte = parte.strip()
+        if not parte:
+            continue
+        if '-' in parte:
+            desde, hasta = parte.split('-', 1)
+            desde = int(desde) if desde.strip() else 1
+            hasta = int(hasta) if hasta.strip() else num_paginas
+        else:
+            desde = hasta = int(parte)
+        paginas.update(range(max(desde, 1) - 1, min(hasta, num_paginas)))
+    return sorted(paginas)
+
+def seleccionar_paginas(paginas, max_paginas, num_paginas):
+    """
+    Resuelve la selección de páginas a analizar
+    
+    Args:
+        paginas (list|str): Índices 0-indexados, rango de texto ('1-5,8') o None (todas)
+        max_paginas (int): Máximo de páginas (None = sin límite)
+        num_paginas (int): Total de páginas del documento
+        
+    Returns:
+        list: Índices de página válidos
+    """
+    if isinstance(paginas, str):
+        paginas = parsear_rango_paginas(paginas, num_paginas)
+    
+    seleccion = [p for p in (paginas if paginas is not None else range(num_paginas))
+                 if 0 <= p < num_paginas]
+    if max_paginas:
+        seleccion = seleccion[:max_paginas]
+    return seleccion
+
+def comparar_motores_pdf(ruta_pdf, paginas=None, max_paginas=None, dpi=200):
+    """
+    Compara los motores de detección página por página e informa velocidad y acuerdo
+    
+    Args:
+        ruta_pdf (str): Ruta al archivo PDF
+        paginas (list|str): Páginas a comparar (ver seleccionar_paginas)
+        max_paginas (int): Máximo de páginas a comparar
+        dpi (int): Resolución de renderizado
+    """
+    print(f"⚖️  Comparando motores de detección en: {ruta_pdf}")
+    
+    try:
+        with fitz.open(ruta_pdf) as doc:
+            seleccion = seleccionar_paginas(paginas, max_paginas, len(doc))
+            
+            total_morf = total_proy = 0.0
+            acuerdos = []
+            for pagina in seleccion:
+                comparacion = comparar_motores(renderizar_pagina(doc, pagina, dpi))
+                total_morf += comparacion['tiempo_morfologia']
+                total_proy += comparacion['tiempo_proyeccion']
+                acuerdos.append(comparacion['acuerdo'])
+                
+                print(f"\n📄 Página {pagina + 1}:")
+                print(f"   🔬 Morfología: {comparacion['lineas_morfologia']} líneas en "
+                      f"{comparacion['tiempo_morfologia'] * 1000:.1f} ms")
+                print(f"   📊 Proyección: {comparacion['lineas_proyeccion']} líneas en "
+                      f"{comparacion['tiempo_proyeccion'] * 1000:.1f} ms")
+                print(f"   🤝 Coincidencias: {comparacion['coincidencias']} "
+                      f"(acuerdo {comparacion['acuerdo']:.1%})")
+        
+        if seleccion:
+            print(f"\n📊 RESUMEN DE LA COMPARACIÓN:")
+            print(f"   🔬 Morfología: {total_morf:.3f} s")
+            print(f"   📊 Proyección: {total_proy:.3f} s")
+            if total_proy > 0:
+                print(f"   ⚡ Aceleración: {total_morf / total_proy:.1f}x")
+            print(f"   🤝 Acuerdo medio: {sum(acuerdos) / len(acuerdos):.1%}")
+        
+    except Exception as e:
+        print(f"❌ Error al procesar PDF: {e}")
+
+def analizar_pdf_completo(ruta_pdf, paginas=None, max_paginas=None, trabajos=None, dpi=200,
+                          motor='morfologia', guardar_recortes=True, formato_recortes='png',
+                          compresion=None, depuracion=False, archivo_metricas=None,
+                          memoria_franjas_mb=None, dpi_localizacion=None, usar_cache=True,
+                          directorio_cache=None, limite_cache_mb=None):
     """
-    Analiza todas las páginas de un PDF
+    Analiza las páginas de un PDF repartiéndolas en un pool de procesos
     
     Args:
         ruta_pdf (str): Ruta al archivo PDF
+        paginas (list|str): Páginas a analizar (0-indexadas) o rango de texto como
+                            '1-5,8' (numerado desde 1); None = todas
+        max_paginas (int): Máximo de páginas a analizar
+        trabajos (int): Procesos simultáneos (None = número de núcleos)
+        dpi (int): Resolución de renderizado
+        motor (str): Motor de detección de líneas (ver MOTORES_DETECCION)
+        guardar_recortes (bool): Si True, guarda los recortes en temporal_files/
+        formato_recortes (str): Formato de los recortes ('png', 'jpg' o 'webp')
+        compresion (int): Compresión PNG (0-9) o calidad JPEG/WebP (0-100)
+        depuracion (bool): Si True, guarda las imágenes de depuración de cada página
+        archivo_metricas (str): Archivo JSON Lines donde agregar las métricas del documento
+        memoria_franjas_mb (int): Analizar cada página en franjas de esta memoria
+                                  aproximada (para DPI altos); None = página completa
+        dpi_localizacion (int): Localizar los pentagramas a esta resolución y renderizar
+                                a 'dpi' solo sus regiones; None = una sola pasada a 'dpi'
+        usar_cache (bool): Si True, reutiliza las páginas ya renderizadas (caché de rasters)
+        directorio_cache (str): Carpeta base de las cachés (los rasters van en 'rasters/')
+        limite_cache_mb (int): Espacio máximo en disco de la caché de rasters
     """
     
     print(f"🔍 Analizando archivo: {ruta_pdf}")
     
+    instrumentacion = Instrumentacion(archivo_metricas)
+    with instrumentacion.documento(ruta_pdf, dpi=dpi, motor=motor,
+                                   dpi_localizacion=dpi_localizacion) as registro:
+        registro['exito'] = _analizar_pdf_completo(ruta_pdf, paginas, max_paginas, trabajos, dpi, motor,
+                                                   guardar_recortes, formato_recortes, compresion,
+                                                   depuracion, memoria_franjas_mb, dpi_localizacion,
+                                                   usar_cache, directorio_cache, limite_cache_mb,
+                                                   instrumentacion)
+
+def _analizar_pdf_completo(ruta_pdf, paginas, max_paginas, trabajos, dpi, motor, guardar_recortes,
+                           formato_recortes, compresion, depuracion, memoria_franjas_mb, dpi_localizacion,
+                           usar_cache, directorio_cache, limite_cache_mb, instrumentacion):
+    """Cuerpo de analizar_pdf_completo; devuelve True si se pudo analizar el PDF"""
     try:
         # Abrir PDF para obtener información
-        doc = fitz.open(ruta_pdf)
-        num_paginas = len(doc)
-        doc.close()
+        with fitz.open(ruta_pdf) as doc:
+            num_paginas = len(doc)
         
         print(f"📚 Páginas encontradas: {num_paginas}")
         
+        seleccion = seleccionar_paginas(paginas, max_paginas, num_paginas)
+        if not seleccion:
+            print("❌ No hay páginas para analizar")
+            return False
+        
+        trabajos = max(1, min(trabajos or os.cpu_count() or 1, len(seleccion)))
+        print(f"⚙️  Analizando {len(seleccion)} páginas con {trabajos} procesos")
+        if dpi_localizacion and dpi_localizacion < dpi:
+            print(f"🔭 Localización a {dpi_localizacion} DPI, recortes a {dpi} DPI")
+        elif memoria_franjas_mb:
+            print(f"🧩 Render por franjas de ~{memoria_franjas_mb} MB por proceso")
+            if depuracion:
+                print("⚠️  Las imágenes de depuración no se generan en el modo por franjas")
+        
+        inicio = time.perf_counter()
+        resultados = []
+        errores_escritura = []
+        opciones_escritor = ({'formato': formato_recortes, 'compresion': compresion}
+                             if guardar_recortes else None)
+        opciones_rasters = None
+        if usar_cache:
+            opciones_rasters = {
+                'hash_pdf': hash_archivo(ruta_pdf),
+                'directorio': Path(directorio_cache) / 'rasters' if directorio_cache else None,
+                'limite_mb': limite_cache_mb,
+            }
+        
+        if trabajos == 1:
+            escritor = EscritorImagenes(**opciones_escritor) if opciones_escritor else None
+            rasters = _crear_rasters(**opciones_rasters) if opciones_rasters else None
+            with fitz.open(ruta_pdf) as doc:
+                for pagina in seleccion:
+                    try:
+                        resultado = analizar_pagina(doc, ruta_pdf, pagina, dpi, motor, escritor, depuracion,
+                                                    memoria_franjas_mb, dpi_localizacion, rasters)
+                        resultados.append(_sin_pixeles(resultado))
+                    except Exception as e:
+                        print(f"❌ Error en la página {pagina + 1}: {e}")
+            if escritor:
+                errores_escritura.extend(escritor.cerrar())
+        else:
+            with ProcessPoolExecutor(max_workers=trabajos, initializer=_inicializar_trabajador,
+                                     initargs=(ruta_pdf, opciones_escritor, opciones_rasters)) as pool:
+                futuros = {pool.submit(_analizar_pagina_en_proceso, ruta_pdf, pagina, dpi, motor,
+                                       depuracion, memoria_franjas_mb, dpi_localizacion): pagina
+                           for pagina in seleccion}
+                for futuro in as_completed(futuros):
+                    try:
+                        resultado = futuro.result()
+                        errores_escritura.extend(resultado['errores_escritura'])
+                        resultados.append(resultado)
+                    except Exception as e:
+                        print(f"❌ Error en la página {futuros[futuro] + 1}: {e}")
+        
+        duracion = time.perf_counter() - inicio
+        
+        # Informar en orden de página
         total_lineas = 0
         total_pentagramas = 0
-        archivos_lineas_temporales = []  # Lista para rastrear archivos temporales
+        paginas_en_cache = 0
+        archivos_depuracion = []
         
-        for pagina in range(min(num_paginas, 3)):  # Procesar máximo 3 páginas
-            print(f"\n📄 Procesando página {pagina + 1}...")
-            
-            # Convertir página a imagen
-            imagen = pdf_a_imagen_pymupdf(ruta_pdf, pagina)
-            
-            if imagen is None:
-                continue
-            
-            # Detectar líneas
-            lineas, imagen_lineas = detectar_lineas_pentagrama(imagen)
-            
-            # Agrupar en pentagramas
-            pentagramas = agrupar_pentagramas(lineas)
-            
-            print(f"   📏 Líneas detectadas: {len(lineas)}")
-            print(f"   🎼 Pentagramas detectados: {len(pentagramas)}")
-            
-            total_lineas += len(lineas)
-            total_pentagramas += len(pentagramas)
+        for resultado in sorted(resultados, key=lambda r: r['pagina']):
+            tiempos = resultado['tiempos']
+            print(f"\n📄 Página {resultado['pagina'] + 1}:")
+            print(f"   📏 Líneas detectadas: {resultado['lineas']}")
+            print(f"   🎼 Pentagramas detectados: {resultado['pentagramas']}")
+            print(f"   📐 Grosor de línea: {resultado['grosor']} px, espaciado: {resultado['espaciado']} px")
+            if resultado['franjas']:
+                print(f"   🧩 Franjas renderizadas: {resultado['franjas']}")
+            if resultado['raster_en_cache']:
+                print(f"   ♻️  Página recuperada de la caché de rasters")
+                paginas_en_cache += 1
+            print(f"   ⏱️  {tiempos['total']:.2f} s (render {tiempos['render']:.2f}, "
+                  f"detección {tiempos['deteccion']:.2f}, agrupación {tiempos['agrupacion']:.3f}, "
+                  f"recortes {tiempos['recortes']:.2f})")
             
-            # Crear carpeta tmp si no existe
-            carpeta_tmp = Path("temporal_files")
-            carpeta_tmp.mkdir(exist_ok=True)
-            
-            # Extraer recortes de cada pentagrama
-            nombre_archivo = Path(ruta_pdf).stem
-            print(f"     Extrayendo recortes de pentagramas...")
-            
-            for i, pentagrama in enumerate(pentagramas):
-                print(f"     Pentagrama {i+1}: {len(pentagrama)} líneas")
-                
-                # Calcular límites del pentagrama
-                x_min = min(linea[0] for linea in pentagrama)  # X mínimo
-                x_max = max(linea[2] for linea in pentagrama)  # X máximo
-                y_min = min(linea[1] for linea in pentagrama)  # Y mínimo
-                y_max = max(linea[1] for linea in pentagrama)  # Y máximo
-                
-                # Añadir margen de 20 píxeles (30 hacia abajo)
-                margen = 30
-                margen_abajo = 30  # 10 píxeles extra hacia abajo
-                x_inicio = max(0, x_min - margen)
-                y_inicio = max(0, y_min - margen)
-                x_fin = min(imagen.shape[1], x_max + margen)
-                y_fin = min(imagen.shape[0], y_max + margen_abajo)
-                
-                # Recortar la imagen
-                recorte = imagen[y_inicio:y_fin, x_inicio:x_fin]
-                
-                # Guardar el recorte en la carpeta tmp
-                archivo_recorte = carpeta_tmp / f"{nombre_archivo}_pagina_{pagina+1}_pentagrama_{i+1}.png"
-                cv2.imwrite(str(archivo_recorte), recorte)
-                
+            for i, recorte in enumerate(resultado['recortes']):
+                x_inicio, y_inicio, x_fin, y_fin = recorte['caja']
+                print(f"     Pentagrama {i+1}: {recorte['lineas']} líneas")
                 print(f"       📐 Recorte: X={x_inicio}-{x_fin}, Y={y_inicio}-{y_fin}")
-                print(f"       💾 Guardado: {archivo_recorte}")
-            
-            # También crear imagen completa con líneas marcadas (opcional)
-            resultado = imagen.copy()
-            colores = [(255, 0, 0), (0, 255, 0), (0, 0, 255), (255, 255, 0), (255, 0, 255)]
-            
-            for i, pentagrama in enumerate(pentagramas):
-                color = colores[i % len(colores)]
-                for x1, y1, x2, y2 in pentagrama:
-                    cv2.line(resultado, (x1, y1), (x2, y2), color, 2)
+                if 'archivo' in recorte:
+                    print(f"       💾 Guardado: {recorte['archivo']}")
             
-            archivo_completo = f"{nombre_archivo}_pagina_{pagina+1}_completa_marcada.png"
-            cv2.imwrite(archivo_completo, resultado)
-            archivos_lineas_temporales.append(archivo_completo)  # Este también se borrará
+            for etapa in ('render', 'deteccion', 'agrupacion', 'recortes'):
+                instrumentacion.agregar_etapa(etapa, tiempos[etapa], pagina=resultado['pagina'] + 1)
+            instrumentacion.agregar_etapa('pagina', tiempos['total'], cpu=tiempos['cpu'],
+                                          pagina=resultado['pagina'] + 1)
             
-            # También guardar la imagen de líneas detectadas
-            archivo_lineas = f"{nombre_archivo}_pagina_{pagina+1}_lineas.png"
-            cv2.imwrite(archivo_lineas, imagen_lineas)
-            archivos_lineas_temporales.append(archivo_lineas)  # Añadir a la lista para borrar después
+            total_lineas += resultado['lineas']
+            total_pentagramas += resultado['pentagramas']
+            archivos_depuracion.extend(resultado['archivos_depuracion'])
         
         print(f"\n📊 RESUMEN TOTAL:")
+        print(f"   📄 Páginas analizadas: {len(resultados)} de {num_paginas}")
         print(f"   📏 Total de líneas: {total_lineas}")
         print(f"   🎼 Total de pentagramas: {total_pentagramas}")
+        print(f"   ⏱️  Tiempo total: {duracion:.2f} s")
+        if usar_cache:
+            print(f"   ♻️  Páginas de la caché de rasters: {paginas_en_cache}")
         
         if total_pentagramas > 0:
             promedio = total_lineas / total_pentagramas
             print(f"   📈 Promedio líneas por pentagrama: {promedio:.1f}")
         
-        # Borrar archivos temporales de líneas
-        print(f"\n🗑️  Limpiando archivos temporales...")
-        for archivo_temp in archivos_lineas_temporales:
-            try:
-                Path(archivo_temp).unlink()
-                print(f"   ✅ Borrado: {archivo_temp}")
-            except Exception as e:
-                print(f"   ❌ Error al borrar {archivo_temp}: {e}")
+        for archivo, error in errores_escritura:
+            print(f"   ❌ Error al guardar {archivo}: {error}")
         
-        print(f"   📁 Se mantuvieron solo los archivos de pentagramas")
+        if archivos_depuracion:
+            print(f"\n🐞 Imágenes de depuración guardadas: {len(archivos_depuracion)}")
+        
+        return len(resultados) == len(seleccion)
         
     except Exception as e:
         print(f"❌ Error al procesar PDF: {e}")
+        return False
 
 def main():
     """Función principal"""
     
-    if len(sys.argv) > 1:
-        archivo = sys.argv[1]
+    # Opciones: --pages 1-5,8  --max-pages N  --jobs N  --dpi N  --engine morfologia|proyeccion
+    #           --compare-engines  --no-crops  --crop-format png|jpg|webp  --compression N
+    #           --debug-images  --metrics archivo.jsonl  --strip-mb N  --locate-dpi N
+    #           --no-cache  --cache-dir carpeta  --cache-size MB
+    opciones = {}
+    comparar = False
+    archivo = None
+    argumentos = sys.argv[1:]
+    try:
+        while argumentos:
+            opcion = argumentos.pop(0)
+            if opcion == '--pages' and argumentos:
+                opciones['paginas'] = argumentos.pop(0)
+            elif opcion == '--max-pages' and argumentos:
+                opciones['max_paginas'] = int(argumentos.pop(0))
+            elif opcion == '--jobs' and argumentos:
+                opciones['trabajos'] = int(argumentos.pop(0))
+            elif opcion == '--dpi' and argumentos:
+                opciones['dpi'] = int(argumentos.pop(0))
+            elif opcion == '--engine' and argumentos:
+                opciones['motor'] = argumentos.pop(0)
+                if opciones['motor'] not in MOTORES_DETECCION:
+                    print(f"❌ Motor desconocido: {opciones['motor']} ({', '.join(MOTORES_DETECCION)})")
+                    return
+            elif opcion == '--compare-engines':
+                comparar = True
+            elif opcion == '--no-crops':
+                opciones['guardar_recortes'] = False
+            elif opcion == '--crop-format' and argumentos:
+                opciones['formato_recortes'] = argumentos.pop(0).lower()
+                if opciones['formato_recortes'] not in EscritorImagenes.PARAMETROS:
+                    print(f"❌ Formato de imagen no soportado: {opciones['formato_recortes']}")
+                    return
+            elif opcion == '--compression' and argumentos:
+                opciones['compresion'] = int(argumentos.pop(0))
+            elif opcion == '--debug-images':
+                opciones['depuracion'] = True
+            elif opcion == '--metrics' and argumentos:
+                opciones['archivo_metricas'] = argumentos.pop(0)
+            elif opcion == '--strip-mb' and argumentos:
+                opciones['memoria_franjas_mb'] = int(argumentos.pop(0))
+            elif opcion == '--locate-dpi' and argumentos:
+                opciones['dpi_localizacion'] = int(argumentos.pop(0))
+            elif opcion == '--no-cache':
+                opciones['usar_cache'] = False
+            elif opcion == '--cache-dir' and argumentos:
+                opciones['directorio_cache'] = argumentos.pop(0)
+            elif opcion == '--cache-size' and argumentos:
+                opciones['limite_cache_mb'] = int(argumentos.pop(0))
+            else:
+                archivo = opcion
+    except ValueError:
+        print("❌ Error: --max-pages, --jobs, --dpi, --compression, --strip-mb, --locate-dpi y "
+              "--cache-size requieren un número entero")
+        return
+    
+    if archivo and comparar:
+        if Path(archivo).exists():
+            comparar_motores_pdf(archivo, opciones.get('paginas'), opciones.get('max_paginas'),
+                                 opciones.get('dpi', 200))
+        else:
+            print(f"❌ Archivo no encontrado: {archivo}")
+    elif archivo:
         if Path(archivo).exists():
-            analizar_pdf_completo(archivo)
+            analizar_pdf_completo(archivo, **opciones)
         else:
             print(f"❌ Archivo no encontrado: {archivo}")
     else:
@@ -280,10 +1279,14 @@ def main():
             
             # Procesar el primer PDF
             print(f"\n🎯 Procesando: {archivos_pdf[0]}")
-            analizar_pdf_completo(str(archivos_pdf[0]))
+            analizar_pdf_completo(str(archivos_pdf[0]), **opciones)
         else:
             print("❌ No se encontraron archivos PDF")
-            print("💡 Uso: python detector_pymupdf.py <archivo.pdf>")
+            print("💡 Uso: python detector_pymupdf.py [--pages 1-5,8] [--max-pages N] [--jobs N] [--dpi N] "
+                  "[--engine morfologia|proyeccion] [--compare-engines] [--no-crops] "
+                  "[--crop-format png|jpg|webp] [--compression N] [--debug-images] "
+                  "[--metrics archivo.jsonl] [--strip-mb N] [--locate-dpi N] [--no-cache] "
+                  "[--cache-dir carpeta] [--cache-size MB] <archivo.pdf>")
 
 if __name__ == "__main__":
     main()
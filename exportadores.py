@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+"""
+Exportadores de la tabla de notas (TXT, CSV, JSON Lines y NPZ)
+Las filas se generan por lotes a partir de las columnas de la TablaNotas y se
+escriben en bloques grandes, en lugar de formatear y escribir nota por nota
+"""
+
+import csv
+
+from importacion_diferida import modulo_diferido
+
+# NumPy se importa al exportar, no al cargar el módulo (la CLI solo necesita FORMATOS)
+np = modulo_diferido('numpy')
+
+# Formato → extensión del archivo de salida
+FORMATOS = {
+    'txt': '.txt',
+    'csv': '.csv',
+    'jsonl': '.jsonl',
+    'npz': '.npz',
+}
+
+# Filas que se formatean y escriben de una vez
+TAM_LOTE = 20000
+
+COLUMNAS_CSV = ['elemento', 'tipo', 'nombre', 'nombre_latino', 'midi', 'octava',
+                'compas', 'offset', 'duracion', 'parte']
+
+
+def _texto_o_vacio(valores, validos, vacio=''):
+    """Convierte un array numérico a texto, con 'vacio' donde no es válido"""
+    return np.where(validos, valores.astype(str), vacio)
+
+
+def columnas_elementos(tabla):
+    """
+    Calcula las columnas de texto de cada nota/acorde tal como aparecen en el TXT
+
+    Args:
+        tabla (TablaNotas): Tabla de notas
+
+    Returns:
+        tuple: Arrays (tipos, etiquetas, octavas, compases), uno por elemento
+    """
+    d = tabla.datos
+    inicios, fines = tabla.limites_grupos()
+    tamanos = fines - inicios
+    nombres = tabla.nombres_alturas(latino=True)
+
+    primeras = d[inicios]
+    es_otro = primeras['midi'] < 0
+    es_acorde = tamanos > 1
+
+    tipos = np.where(es_otro, 'Otro', np.where(es_acorde, 'Acorde', 'Nota'))
+
+    # Solo los acordes necesitan unir varios nombres
+    etiquetas = nombres[inicios].astype(object)
+    for k in np.flatnonzero(es_acorde).tolist():
+        etiquetas[k] = '/'.join(nombres[inicios[k]:fines[k]].tolist())
+
+    octavas = np.where(es_otro, 'N/A', np.where(es_acorde, 'Multi', primeras['octava'].astype(str)))
+    # Como en el TXT original, el compás 0 (anacrusa) se muestra como N/A
+    compases = _texto_o_vacio(primeras['compas'], primeras['compas'] > 0, 'N/A')
+
+    return tipos, etiquetas, octavas, compases
+
+
+def exportar_txt(tabla, ruta, titulo, compositor, fecha):
+    """
+    Exporta la tabla con el formato de texto de ancho fijo del análisis musical
+
+    Args:
+        tabla (TablaNotas): Tabla de notas
+        ruta (str): Archivo de salida
+        titulo (str): Título de la partitura
+        compositor (str): Compositor de la partitura
+        fecha (str): Fecha de análisis a mostrar en el encabezado
+    """
+    tipos, etiquetas, octavas, compases = columnas_elementos(tabla)
+    total = len(tipos)
+
+    with open(ruta, 'w', encoding='utf-8') as f:
+        f.write("=" * 80 + "\n"
+                "ANÁLISIS MUSICAL - NOTAS EXTRAÍDAS\n"
+                + "=" * 80 + "\n\n"
+                f"Título: {titulo}\n"
+                f"Compositor: {compositor}\n"
+                f"Total de notas: {total}\n"
+                f"Fecha de análisis: {fecha}\n\n"
+                + "-" * 80 + "\n"
+                "LISTADO COMPLETO DE NOTAS\n"
+                + "-" * 80 + "\n\n"
+                f"{'Nº':<4} {'Tipo':<8} {'Nota/Acorde':<20} {'Octava':<7} {'Compás':<7}\n"
+                + "-" * 50 + "\n")
+
+        for inicio in range(0, total, TAM_LOTE):
+            fin = min(inicio + TAM_LOTE, total)
+            f.write(''.join(
+                f"{n:<4} {tipo:<8} {etiqueta:<20} {octava:<7} {compas:<7}\n"
+                for n, tipo, etiqueta, octava, compas in zip(
+                    range(inicio + 1, fin + 1),
+                    tipos[inicio:fin].tolist(), etiquetas[inicio:fin].tolist(),
+                    octavas[inicio:fin].tolist(), compases[inicio:fin].tolist())
+            ))
+
+        f.write("\n" + "=" * 50 + "\n"
+                "Fin del análisis\n"
+                + "=" * 50 + "\n")
+
+
+def _columnas_filas(tabla):
+    """
+    Columnas de texto por fila de la tabla (una fila por altura) para CSV y JSON Lines
+
+    Returns:
+        list: Arrays en el orden de COLUMNAS_CSV
+    """
+    d = tabla.datos
+    inicios, fines = tabla.limites_grupos()
+    tipos, _, _, _ = columnas_elementos(tabla)
+
+    # Elemento (1..N) y tipo al que pertenece cada fila
+    elemento = np.repeat(np.arange(1, len(inicios) + 1), fines - inicios)
+    con_altura = d['midi'] >= 0
+
+    return [
+        elemento.astype(str),
+        np.repeat(tipos, fines - inicios),
+        tabla.nombres_alturas(),
+        tabla.nombres_alturas(latino=True),
+        _texto_o_vacio(d['midi'], con_altura),
+        _texto_o_vacio(d['octava'], con_altura),
+        _texto_o_vacio(d['compas'], d['compas'] >= 0),
+        d['offset'].astype(str),
+        d['duracion'].astype(str),
+        d['parte'].astype(str),
+    ]
+
+
+def exportar_csv(tabla, ruta):
+    """Exporta la tabla a CSV (una fila por altura; los acordes comparten 'elemento')"""
+    columnas = _columnas_filas(tabla)
+    total = len(tabla.datos)
+
+    with open(ruta, 'w', encoding='utf-8', newline='') as f:
+        escritor = csv.writer(f)
+        escritor.writerow(COLUMNAS_CSV)
+        for inicio in range(0, total, TAM_LOTE):
+            fin = min(inicio + TAM_LOTE, total)
+            escritor.writerows(zip(*(columna[inicio:fin].tolist() for columna in columnas)))
+
+
+def exportar_jsonl(tabla, ruta):
+    """Exporta la tabla a JSON Lines (un objeto por altura, campos como en el CSV)"""
+    d = tabla.datos
+    columnas = _columnas_filas(tabla)
+    # Valores ausentes como null en JSON
+    columnas[4] = _texto_o_vacio(d['midi'], d['midi'] >= 0, 'null')
+    columnas[5] = _texto_o_vacio(d['octava'], d['midi'] >= 0, 'null')
+    columnas[6] = _texto_o_vacio(d['compas'], d['compas'] >= 0, 'null')
+    total = len(d)
+
+    with open(ruta, 'w', encoding='utf-8') as f:
+        for inicio in range(0, total, TAM_LOTE):
+            fin = min(inicio + TAM_LOTE, total)
+            f.write(''.join(
+                f'{{"elemento": {e}, "tipo": "{t}", "nombre": "{n}", "nombre_latino": "{nl}", '
+                f'"midi": {m}, "octava": {o}, "compas": {c}, "offset": {of}, "duracion": {du}, '
+                f'"parte": {p}}}\n'
+                for e, t, n, nl, m, o, c, of, du, p in zip(
+                    *(columna[inicio:fin].tolist() for columna in columnas))
+            ))
+
+
+def exportar_npz(tabla, ruta):
+    """Exporta la tabla completa en formato columnar binario (.npz de NumPy)"""
+    tabla.guardar_npz(ruta)
+
+
+def exportar(tabla, ruta, formato='txt', titulo=None, compositor=None, fecha=''):
+    """
+    Exporta la tabla en el formato indicado
+
+    Args:
+        tabla (TablaNotas): Tabla de notas
+        ruta (str): Archivo de salida
+        formato (str): Uno de FORMATOS ('txt', 'csv', 'jsonl', 'npz')
+        titulo (str): Título (solo TXT; por defecto, el de la tabla)
+        compositor (str): Compositor (solo TXT; por defecto, el de la tabla)
+        fecha (str): Fecha de análisis (solo TXT)
+    """
+    if formato == 'txt':
+        exportar_txt(tabla, ruta, titulo or tabla.titulo, compositor or tabla.compositor, fecha)
+    elif formato == 'csv':
+        exportar_csv(tabla, ruta)
+    elif formato == 'jsonl':
+        exportar_jsonl(tabla, ruta)
+    elif formato == 'npz':
+        exportar_npz(tabla, ruta)
+    else:
+        raise ValueError(f"Formato '{formato}' no soportado. Formatos: {', '.join(FORMATOS)}")
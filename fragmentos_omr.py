@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+"""
+Reconocimiento fragmentado de partituras grandes
+Divide un PDF en fragmentos de páginas que Audiveris reconoce en paralelo y
+une los MusicXML resultantes en orden, con numeración de compases continua.
+También calcula un hash por página para reprocesar solo las páginas modificadas
+"""
+
+import io
+import hashlib
+import zipfile
+import xml.etree.ElementTree as ET
+from pathlib import Path
+
+import fitz  # PyMuPDF
+
+from lector_musicxml import abrir_musicxml, _etiqueta, _numero_compas, ErrorLecturaMusicXML
+
+CONTENEDOR_MXL = (
+    '<?xml version="1.0" encoding="UTF-8"?>\n'
+    '<container>\n'
+    '  <rootfiles>\n'
+    '    <rootfile full-path="{nombre}" media-type="application/vnd.recordare.musicxml+xml"/>\n'
+    '  </rootfiles>\n'
+    '</container>\n'
+)
+
+
+def contar_paginas(ruta_pdf):
+    """Número de páginas de un PDF"""
+    with fitz.open(ruta_pdf) as doc:
+        return doc.page_count
+
+
+def dividir_pdf(ruta_pdf, paginas_por_fragmento, directorio):
+    """
+    Divide un PDF en PDFs más pequeños de páginas consecutivas
+
+    Args:
+        ruta_pdf (str): Ruta al PDF original
+        paginas_por_fragmento (int): Páginas de cada fragmento
+        directorio (str): Carpeta donde se escriben los fragmentos
+
+    Returns:
+        list: Rutas de los fragmentos, en orden de páginas
+    """
+    directorio = Path(directorio)
+    nombre = Path(ruta_pdf).stem
+    fragmentos = []
+
+    with fitz.open(ruta_pdf) as doc:
+        for numero, desde in enumerate(range(0, doc.page_count, paginas_por_fragmento), start=1):
+            hasta = min(desde + paginas_por_fragmento, doc.page_count) - 1
+            ruta = directorio / f"{nombre}_fragmento_{numero:03d}.pdf"
+            with fitz.open() as fragmento:
+                fragmento.insert_pdf(doc, from_page=desde, to_page=hasta)
+                fragmento.save(str(ruta))
+            fragmentos.append(str(ruta))
+
+    return fragmentos
+
+
+def extraer_paginas(ruta_pdf, paginas, directorio):
+    """
+    Extrae páginas sueltas de un PDF, cada una como un PDF de una página
+
+    Args:
+        ruta_pdf (str): Ruta al PDF original
+        paginas (list): Índices de página (base 0)
+        directorio (str): Carpeta donde se escriben las páginas
+
+    Returns:
+        list: Rutas de los PDFs, en el mismo orden que 'paginas'
+    """
+    directorio = Path(directorio)
+    nombre = Path(ruta_pdf).stem
+    rutas = []
+
+    with fitz.open(ruta_pdf) as doc:
+        for pagina in paginas:
+            ruta = directorio / f"{nombre}_pagina_{pagina + 1:04d}.pdf"
+            with fitz.open() as salida:
+                salida.insert_pdf(doc, from_page=pagina, to_page=pagina)
+                salida.save(str(ruta))
+            rutas.append(str(ruta))
+
+    return rutas
+
+
+def hashes_paginas(ruta_pdf):
+    """
+    Calcula un hash del contenido de cada página de un PDF
+
+    El hash cubre el tamaño y la rotación de la página, su flujo de contenido
+    y los flujos de las imágenes y formularios que dibuja, pero no los números
+    de objeto internos: volver a guardar el PDF sin tocar una página no cambia
+    su hash.
+
+    Args:
+        ruta_pdf (str): Ruta al PDF
+
+    Returns:
+        list: Hash hexadecimal de cada página, en orden
+    """
+    hashes = []
+    with fitz.open(ruta_pdf) as doc:
+        for pagina in doc:
+            h = hashlib.sha256()
+            h.update(f"{tuple(pagina.rect)}|{pagina.rotation}".encode())
+            h.update(pagina.read_contents())
+            xrefs = [imagen[0] for imagen in pagina.get_images(full=True)]
+            xrefs += [xobjeto[0] for xobjeto in pagina.get_xobjects()]
+            for xref in xrefs:
+                h.update(b'\0' + (doc.xref_stream_raw(xref) or b''))
+            hashes.append(h.hexdigest())
+    return hashes
+
+
+def leer_raiz_musicxml(ruta):
+    """Lee el árbol completo de un MusicXML (.mxl o .xml) y devuelve su raíz score-partwise"""
+    with abrir_musicxml(ruta) as flujo:
+        raiz = ET.parse(flujo).getroot()
+    if _etiqueta(raiz) != 'score-partwise':
+        raise ErrorLecturaMusicXML(f"Formato '{_etiqueta(raiz)}' no soportado al unir fragmentos")
+    return raiz
+
+
+def _partes(raiz):
+    """Elementos <part> de una partitura, en orden"""
+    return [hijo for hijo in raiz if _etiqueta(hijo) == 'part']
+
+
+def _compases(parte):
+    """Elementos <measure> de una parte, en orden"""
+    return [hijo for hijo in parte if _etiqueta(hijo) == 'measure']
+
+
+def _ultimo_numero(partes):
+    """Mayor número de compás de las partes (0 si no hay compases numerados)"""
+    numeros = [_numero_compas(compas.get('number')) for parte in partes for compas in _compases(parte)]
+    return max((n for n in numeros if n is not None), default=0)
+
+
+def _renumerar(compas, desplazamiento):
+    """Suma 'desplazamiento' al número del compás conservando sufijos ('12a' → '40a')"""
+    texto = compas.get('number') or ''
+    numero = _numero_compas(texto)
+    if numero is None:
+        return
+    sufijo = texto.strip()[len(str(numero)):]
+    compas.set('number', f"{numero + desplazamiento}{sufijo}")
+
+
+def unir_musicxml(archivos_mxl, ruta_salida):
+    """
+    Une los MusicXML de los fragmentos de una partitura en uno solo
+
+    El primer fragmento aporta los metadatos y la lista de partes; los compases
+    de los siguientes se añaden a la parte con el mismo índice, renumerados para
+    continuar la numeración. Si un fragmento reconoce menos partes, las que
+    faltan se completan con compases vacíos para mantenerlas alineadas.
+
+    Args:
+        archivos_mxl (list): MusicXML de los fragmentos, en orden de páginas
+        ruta_salida (str): Archivo de salida (.mxl comprimido o .xml/.musicxml)
+
+    Returns:
+        int: Número total de compases de la primera parte
+    """
+    base = leer_raiz_musicxml(archivos_mxl[0])
+    partes_base = _partes(base)
+
+    for archivo in archivos_mxl[1:]:
+        partes = _partes(leer_raiz_musicxml(archivo))
+        if len(partes) != len(partes_base):
+            print(f"⚠️  {Path(archivo).name}: {len(partes)} partes reconocidas (se esperaban {len(partes_base)})")
+
+        ultimo = _ultimo_numero(partes_base)
+        numeros = [_numero_compas(c.get('number')) for parte in partes for c in _compases(parte)]
+        primero = min((n for n in numeros if n is not None), default=1)
+        # El primer compás numerado del fragmento pasa a ser el siguiente al último ya unido
+        desplazamiento = ultimo + 1 - primero
+        longitud = max((len(_compases(parte)) for parte in partes), default=0)
+
+        for indice, parte_base in enumerate(partes_base):
+            if indice < len(partes):
+                for compas in _compases(partes[indice]):
+                    _renumerar(compas, desplazamiento)
+                    parte_base.append(compas)
+            else:
+                for k in range(longitud):
+                    parte_base.append(ET.Element('measure', number=str(ultimo + 1 + k)))
+
+    _escribir_musicxml(base, ruta_salida)
+    return len(_compases(partes_base[0])) if partes_base else 0
+
+
+def _escribir_musicxml(raiz, ruta_salida):
+    """Escribe una partitura como .mxl comprimido o como XML plano según la extensión"""
+    buffer = io.BytesIO()
+    ET.ElementTree(raiz).write(buffer, encoding='UTF-8', xml_declaration=True)
+
+    ruta_salida = Path(ruta_salida)
+    if ruta_salida.suffix.lower() != '.mxl':
+        ruta_salida.write_bytes(buffer.getvalue())
+        return
+
+    nombre = ruta_salida.with_suffix('.xml').name
+    with zipfile.ZipFile(ruta_salida, 'w', zipfile.ZIP_DEFLATED) as zf:
+        # Por la especificación, 'mimetype' va primero y sin comprimir
+        zf.writestr(zipfile.ZipInfo('mimetype'), 'application/vnd.recordare.musicxml')
+        zf.writestr('META-INF/container.xml', CONTENEDOR_MXL.format(nombre=nombre))
+        zf.writestr(nombre, buffer.getvalue())
@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+"""
+Importación diferida de módulos pesados (music21, cv2, PyMuPDF, NumPy)
+El módulo se declara al cargar el programa pero solo se importa en el primer
+acceso a uno de sus atributos, así la ayuda, los errores de argumentos y los
+aciertos de caché no pagan el tiempo de importación de las bibliotecas.
+"""
+
+import importlib
+
+
+class ModuloDiferido:
+    """
+    Representante de un módulo que se importa en el primer acceso a un atributo
+
+    La importación la hace importlib.import_module, que es segura entre hilos
+    (a diferencia de importlib.util.LazyLoader en Python < 3.12), por lo que el
+    mismo representante se puede usar desde los hilos del servicio.
+
+    Args:
+        nombre (str): Nombre del módulo; puede ser un submódulo ('music21.converter')
+    """
+
+    def __init__(self, nombre):
+        self._nombre = nombre
+        self._modulo = None
+
+    def __getattr__(self, atributo):
+        # Solo se llama para atributos que no son del representante
+        modulo = self._modulo
+        if modulo is None:
+            modulo = self._modulo = importlib.import_module(self._nombre)
+        return getattr(modulo, atributo)
+
+    def __repr__(self):
+        estado = 'cargado' if self._modulo is not None else 'sin cargar'
+        return f"<módulo diferido '{self._nombre}' ({estado})>"
+
+
+def modulo_diferido(nombre):
+    """
+    Devuelve un módulo que se importa realmente en el primer acceso a un atributo
+
+    Args:
+        nombre (str): Nombre del módulo (ej: 'music21', 'cv2')
+
+    Returns:
+        ModuloDiferido: Representante del módulo
+    """
+    return ModuloDiferido(nombre)
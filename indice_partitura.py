@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+"""
+Índice de compases y posiciones de una partitura analizada
+Ordena las notas de una TablaNotas por parte, compás y posición una sola vez, de
+modo que las consultas por rango ("compases 120 a 160 de la parte 3") son
+búsquedas binarias en lugar de recorridos de la partitura completa
+"""
+
+import os
+
+import numpy as np
+
+
+def parsear_rango_compases(texto):
+    """
+    Convierte un rango de compases ('120-160', '12', '30-', '-8') en (desde, hasta)
+
+    Args:
+        texto (str): Rango de compases, ambos extremos incluidos
+
+    Returns:
+        tuple: (desde, hasta); None en un extremo = sin límite
+
+    Raises:
+        ValueError: Si el texto no es un rango válido
+    """
+    texto = texto.strip()
+    if '-' in texto:
+        desde, hasta = texto.split('-', 1)
+    else:
+        desde = hasta = texto
+    desde = int(desde) if desde.strip() else None
+    hasta = int(hasta) if hasta.strip() else None
+    if desde is not None and hasta is not None and hasta < desde:
+        raise ValueError(f"Rango de compases vacío: {texto}")
+    return desde, hasta
+
+
+class IndicePartitura:
+    """
+    Índice ordenado de los elementos (notas y acordes) de una TablaNotas
+
+    Los elementos de cada parte ocupan un tramo contiguo, ordenado por compás y
+    posición dentro del compás; 'limites_partes' indica dónde empieza cada tramo.
+    Los elementos sin compás conocido (-1) quedan al principio de su tramo.
+
+    Args:
+        compases (numpy.ndarray): Compás de cada elemento, en el orden del índice
+        offsets (numpy.ndarray): Posición de cada elemento dentro de su compás (negras)
+        inicios (numpy.ndarray): Primera fila de la tabla de cada elemento
+        fines (numpy.ndarray): Fila final (exclusiva) de cada elemento
+        limites_partes (numpy.ndarray): Inicio del tramo de cada parte (num_partes + 1 valores)
+        num_filas (int): Filas de la tabla indexada (para comprobar que el índice le corresponde)
+    """
+
+    def __init__(self, compases, offsets, inicios, fines, limites_partes, num_filas):
+        self.compases = compases
+        self.offsets = offsets
+        self.inicios = inicios
+        self.fines = fines
+        self.limites_partes = limites_partes
+        self.num_filas = num_filas
+
+    @classmethod
+    def desde_tabla(cls, tabla):
+        """
+        Construye el índice de una tabla (un ordenamiento de O(n log n))
+
+        Args:
+            tabla (TablaNotas): Notas de la partitura
+
+        Returns:
+            IndicePartitura: Índice de la tabla
+        """
+        d = tabla.datos
+        inicios, fines = tabla.limites_grupos()
+        partes = d['parte'][inicios]
+        compases = d['compas'][inicios]
+        offsets = d['offset'][inicios]
+
+        # lexsort ordena por la última clave primero: parte, compás, posición
+        orden = np.lexsort((offsets, compases, partes))
+        num_partes = max(tabla.num_partes, int(partes.max()) + 1 if len(partes) else 0)
+        limites_partes = np.searchsorted(partes[orden], np.arange(num_partes + 1))
+
+        return cls(compases[orden], offsets[orden], inicios[orden], fines[orden],
+                   limites_partes, len(d))
+
+    @classmethod
+    def cargar(cls, ruta):
+        """Carga un índice guardado con guardar()"""
+        with np.load(ruta, allow_pickle=False) as archivo:
+            return cls(archivo['compases'], archivo['offsets'], archivo['inicios'],
+                       archivo['fines'], archivo['limites_partes'], int(archivo['num_filas']))
+
+    @classmethod
+    def cargar_vigente(cls, ruta, archivo_origen, tabla):
+        """
+        Carga el índice guardado si sigue correspondiendo a la partitura
+
+        Args:
+            ruta (str): Archivo del índice
+            archivo_origen (str): Partitura de la que se extrajo la tabla
+            tabla (TablaNotas): Tabla a la que debe corresponder
+
+        Returns:
+            IndicePartitura: Índice guardado, o None si no existe, es anterior a la
+                             partitura o no coincide con la tabla
+        """
+        try:
+            if os.path.getmtime(ruta) < os.path.getmtime(archivo_origen):
+                return None
+            indice = cls.cargar(ruta)
+        except (OSError, KeyError, ValueError):
+            return None
+        if indice.num_filas != len(tabla.datos) or indice.num_partes != tabla.num_partes:
+            return None
+        return indice
+
+    def guardar(self, ruta):
+        """
+        Guarda el índice en un archivo .npz (sin comprimir, para cargarlo rápido)
+
+        Args:
+            ruta (str): Ruta del archivo de salida
+        """
+        with open(ruta, 'wb') as archivo:
+            np.savez(archivo, compases=self.compases, offsets=self.offsets, inicios=self.inicios,
+                     fines=self.fines, limites_partes=self.limites_partes,
+                     num_filas=np.array(self.num_filas))
+
+    @property
+    def num_partes(self):
+        return len(self.limites_partes) - 1
+
+    def __len__(self):
+        return len(self.inicios)
+
+    def _tramo(self, parte, compas_desde, compas_hasta, offset_desde, offset_hasta):
+        """Posiciones [ini, fin) del índice que caen en el rango dentro de una parte"""
+        ini, fin = int(self.limites_partes[parte]), int(self.limites_partes[parte + 1])
+        compases = self.compases[ini:fin]
+        offsets = self.offsets[ini:fin]
+
+        # Sin límite inferior se incluyen también los elementos sin compás (-1)
+        desde = np.searchsorted(compases, compas_desde, 'left') if compas_desde is not None else 0
+        if compas_desde is not None and offset_desde is not None:
+            fin_compas = np.searchsorted(compases, compas_desde, 'right')
+            desde += np.searchsorted(offsets[desde:fin_compas], offset_desde, 'left')
+
+        if compas_hasta is None:
+            hasta = len(compases)
+        elif offset_hasta is not None:
+            inicio_compas = np.searchsorted(compases, compas_hasta, 'left')
+            hasta = np.searchsorted(compases, compas_hasta, 'right')
+            hasta = inicio_compas + np.searchsorted(offsets[inicio_compas:hasta], offset_hasta, 'left')
+        else:
+            hasta = np.searchsorted(compases, compas_hasta, 'right')
+
+        return ini + int(desde), ini + max(int(desde), int(hasta))
+
+    def compases_distintos(self, compas_desde=None, compas_hasta=None):
+        """
+        Cuenta los números de compás distintos de cada parte dentro de un rango
+
+        No supone que los compases vayan de 1 a N: sirve con anacrusas (compás 0),
+        repeticiones o numeraciones reiniciadas. Los elementos sin compás (-1) no cuentan.
+
+        Args:
+            compas_desde (int): Primer compás (incluido); None = desde el principio
+            compas_hasta (int): Último compás (incluido); None = hasta el final
+
+        Returns:
+            list: Número de compases distintos con elementos, por parte
+        """
+        conteos = []
+        for parte in range(self.num_partes):
+            ini, fin = self._tramo(parte, compas_desde, compas_hasta, None, None)
+            compases = self.compases[ini:fin]
+            compases = compases[compases >= 0]
+            # El tramo está ordenado por compás: cada cambio de valor es un compás nuevo
+            conteos.append(int(np.count_nonzero(np.diff(compases))) + 1 if len(compases) else 0)
+        return conteos
+
+    def consultar(self, compas_desde=None, compas_hasta=None, partes=None,
+                  offset_desde=None, offset_hasta=None):
+        """
+        Busca los elementos de un rango de compases y posiciones (O(log n) por parte)
+
+        Args:
+            compas_desde (int): Primer compás (incluido); None = desde el principio
+            compas_hasta (int): Último compás (incluido); None = hasta el final
+            partes (list): Índices de las partes a consultar (None = todas)
+            offset_desde (float): Posición mínima (incluida) dentro de compas_desde
+            offset_hasta (float): Posición máxima (excluida) dentro de compas_hasta
+
+        Returns:
+            numpy.ndarray: Filas de la tabla que forman los elementos encontrados,
+                           en el orden de la tabla
+        """
+        partes = range(self.num_partes) if partes is None else partes
+        tramos = [self._tramo(parte, compas_desde, compas_hasta, offset_desde, offset_hasta)
+                  for parte in partes if 0 <= parte < self.num_partes]
+        seleccion = [np.arange(ini, fin) for ini, fin in tramos if fin > ini]
+        if not seleccion:
+            return np.empty(0, dtype=np.intp)
+
+        posiciones = np.concatenate(seleccion)
+        # Devolver las filas en el orden de la tabla (el de exportación)
+        orden = np.argsort(self.inicios[posiciones], kind='stable')
+        inicios = self.inicios[posiciones][orden]
+        largos = self.fines[posiciones][orden] - inicios
+        # Expandir cada elemento (inicio, largo) a sus filas sin bucles de Python
+        desplazamientos = np.arange(largos.sum()) - np.repeat(np.cumsum(largos) - largos, largos)
+        return np.repeat(inicios, largos) + desplazamientos
@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+"""
+Instrumentación por etapas de las conversiones de Bardoneon
+Registra tiempo real, tiempo de CPU, memoria y subprocesos de cada etapa y
+emite un registro por documento (JSON Lines o funciones propias). Desactivada,
+cada etapa cuesta una comprobación de atributo.
+"""
+
+import os
+import json
+import time
+import tempfile
+import functools
+import threading
+import subprocess
+from contextlib import contextmanager, nullcontext
+
+try:
+    import resource
+except ImportError:  # Windows: sin datos de memoria ni de CPU de los subprocesos
+    resource = None
+
+
+def _rss_pico_proceso():
+    """
+    Memoria residente pico del proceso completo en MB (None si la plataforma no
+    lo permite). Es el máximo desde que arrancó el proceso, no el de una etapa.
+    """
+    if resource is None:
+        return None
+    # ru_maxrss está en KB en Linux (en bytes en macOS; se asume Linux)
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def ejecutar_subproceso(comando, cwd=None):
+    """
+    Ejecuta un comando capturando su salida y mide los recursos de ese hijo
+
+    El hijo se recoge con os.wait4, que devuelve el uso de recursos de ese proceso
+    (y de los suyos ya terminados) y no el de todos los hijos del programa; así
+    los trabajos concurrentes no se atribuyen la CPU de otros.
+
+    Args:
+        comando (list): Comando y argumentos
+        cwd (str): Directorio de trabajo del comando
+
+    Returns:
+        tuple: (subprocess.CompletedProcess con stdout y stderr como texto,
+                dict con 'cpu' en segundos y 'rss_pico_mb', o None si la plataforma
+                no tiene os.wait4)
+    """
+    if not hasattr(os, 'wait4'):
+        return subprocess.run(comando, capture_output=True, text=True, cwd=cwd), None
+
+    # La salida va a archivos temporales: leer tuberías obligaría a esperar al
+    # proceso con communicate(), que lo recoge sin devolver su uso de recursos
+    with tempfile.TemporaryFile() as salida, tempfile.TemporaryFile() as errores:
+        proceso = subprocess.Popen(comando, stdout=salida, stderr=errores, cwd=cwd)
+        try:
+            _, estado, uso = os.wait4(proceso.pid, 0)
+        except BaseException:
+            proceso.kill()
+            proceso.wait()
+            raise
+        proceso.returncode = os.waitstatus_to_exitcode(estado)
+        salida.seek(0)
+        errores.seek(0)
+        resultado = subprocess.CompletedProcess(
+            comando, proceso.returncode,
+            salida.read().decode(errors='replace'), errores.read().decode(errors='replace'))
+    # ru_maxrss está en KB en Linux
+    return resultado, {'cpu': uso.ru_utime + uso.ru_stime, 'rss_pico_mb': uso.ru_maxrss / 1024}
+
+
+class EscritorJSONL:
+    """
+    Destino de métricas que agrega cada registro como una línea de un archivo JSON Lines
+
+    Cada línea se escribe con una sola llamada en modo O_APPEND, de modo que varios
+    procesos del lote pueden compartir el mismo archivo sin mezclar líneas.
+    """
+
+    def __init__(self, ruta):
+        self.ruta = str(ruta)
+
+    def __call__(self, registro):
+        linea = (json.dumps(registro, ensure_ascii=False, default=str) + '\n').encode('utf-8')
+        fd = os.open(self.ruta, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, linea)
+        finally:
+            os.close(fd)
+
+
+class Instrumentacion:
+    """
+    Recolector de métricas por documento y por etapa
+
+    Args:
+        archivo_metricas (str): Archivo JSON Lines donde se agrega un registro por documento
+        hooks (list): Funciones adicionales que reciben cada registro (dict)
+
+    Sin archivo ni hooks la instrumentación queda desactivada y documento() y
+    etapa() devuelven contextos vacíos.
+    """
+
+    def __init__(self, archivo_metricas=None, hooks=None):
+        self.hooks = list(hooks or [])
+        if archivo_metricas:
+            self.hooks.append(EscritorJSONL(archivo_metricas))
+        self.activa = bool(self.hooks)
+        self._documento = None
+        self._bloqueo = threading.Lock()
+        self._local = threading.local()
+
+    def agregar_hook(self, hook):
+        """Añade una función que recibirá cada registro y activa la instrumentación"""
+        self.hooks.append(hook)
+        self.activa = True
+
+    def emitir(self, registro):
+        """Entrega un registro a todos los destinos (un fallo de uno no afecta a los demás)"""
+        for hook in self.hooks:
+            try:
+                hook(registro)
+            except Exception as e:
+                print(f"ERROR emitiendo métricas: {e}")
+
+    def documento(self, nombre, **datos):
+        """
+        Contexto que agrupa las etapas de un documento y emite su registro al salir
+
+        Si ya hay un documento abierto, el contexto no hace nada (las etapas se
+        suman al documento exterior).
+
+        Yields:
+            dict: Registro del documento; se le pueden añadir campos (ej: 'exito')
+        """
+        if not self.activa or self._documento is not None:
+            return nullcontext({})
+        return self._medir_documento(nombre, datos)
+
+    @contextmanager
+    def _medir_documento(self, nombre, datos):
+        registro = {'documento': str(nombre), **datos,
+                    'inicio': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                    'etapas': [], 'subprocesos': []}
+        self._documento = registro
+        reloj, cpu = time.perf_counter(), time.process_time()
+        try:
+            yield registro
+        except BaseException as e:
+            registro['exito'] = False
+            registro['error'] = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            self._documento = None
+            registro['duracion'] = time.perf_counter() - reloj
+            registro['cpu'] = time.process_time() - cpu
+            # Recursos de los subprocesos de este documento (medidos uno a uno)
+            medidos = [sub for sub in registro['subprocesos'] if sub.get('cpu') is not None]
+            registro['cpu_subprocesos'] = sum(sub['cpu'] for sub in medidos) if medidos else None
+            registro['rss_pico_subprocesos_mb'] = max((sub['rss_pico_mb'] for sub in medidos), default=None)
+            registro['rss_pico_proceso_mb'] = _rss_pico_proceso()
+            registro.setdefault('exito', True)
+            self.emitir(registro)
+
+    def etapa(self, nombre, **datos):
+        """
+        Contexto que mide una etapa: tiempo real, CPU propia, CPU de los subprocesos
+        lanzados en la etapa y RSS pico del proceso
+
+        Las etapas medidas fuera de un documento se emiten como registros sueltos.
+        """
+        if not self.activa:
+            return nullcontext()
+        return self._medir_etapa(nombre, datos)
+
+    @contextmanager
+    def _medir_etapa(self, nombre, datos):
+        pila = getattr(self._local, 'pila', None)
+        if pila is None:
+            pila = self._local.pila = []
+        etapa = {'etapa': nombre, **datos, 'profundidad': len(pila), 'cpu_subprocesos': 0.0}
+        pila.append(etapa)
+        reloj, cpu = time.perf_counter(), time.process_time()
+        try:
+            yield etapa
+        except BaseException as e:
+            etapa['error'] = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            pila.pop()
+            etapa['duracion'] = time.perf_counter() - reloj
+            etapa['cpu'] = time.process_time() - cpu
+            etapa['rss_pico_proceso_mb'] = _rss_pico_proceso()
+            self._agregar(etapa)
+
+    def agregar_etapa(self, nombre, duracion, **datos):
+        """Registra una etapa ya medida en otro lugar (ej: en un proceso del pool)"""
+        if self.activa:
+            self._agregar({'etapa': nombre, 'duracion': duracion, **datos})
+
+    def registrar_subproceso(self, comando, codigo, duracion, uso=None):
+        """
+        Registra un subproceso terminado (ej: una ejecución de Audiveris)
+
+        Args:
+            comando (list): Comando ejecutado
+            codigo (int): Código de salida (None si no llegó a ejecutarse)
+            duracion (float): Tiempo real en segundos
+            uso (dict): 'cpu' y 'rss_pico_mb' de ese subproceso (ver ejecutar_subproceso)
+        """
+        if not self.activa:
+            return
+        pila = getattr(self._local, 'pila', None)
+        uso = uso or {}
+        subproceso = {'comando': os.path.basename(str(comando[0])), 'argumentos': len(comando) - 1,
+                      'codigo_salida': codigo, 'duracion': duracion,
+                      'cpu': uso.get('cpu'), 'rss_pico_mb': uso.get('rss_pico_mb'),
+                      'etapa': pila[-1]['etapa'] if pila else None}
+        # La CPU del subproceso cuenta en las etapas abiertas de este hilo
+        if uso.get('cpu') is not None:
+            for etapa in pila or []:
+                etapa['cpu_subprocesos'] += uso['cpu']
+        with self._bloqueo:
+            if self._documento is not None:
+                self._documento['subprocesos'].append(subproceso)
+                return
+        self.emitir({'documento': None, 'subprocesos': [subproceso]})
+
+    def _agregar(self, etapa):
+        with self._bloqueo:
+            if self._documento is not None:
+                self._documento['etapas'].append(etapa)
+                return
+        self.emitir({'documento': None, 'etapas': [etapa]})
+
+
+def medir_etapa(nombre):
+    """
+    Decorador para métodos de objetos con atributo 'instrumentacion': mide cada
+    llamada como una etapa con ese nombre
+    """
+    def decorador(metodo):
+        @functools.wraps(metodo)
+        def envoltura(self, *args, **kwargs):
+            instrumentacion = self.instrumentacion
+            if not instrumentacion.activa:
+                return metodo(self, *args, **kwargs)
+            with instrumentacion.etapa(nombre):
+                return metodo(self, *args, **kwargs)
+        return envoltura
+    return decorador
@@ -0,0 +1,266 @@
+#!/usr/bin/env python3
+"""
+Lector rápido de MIDI (.mid/.midi) sin music21
+Recorre los eventos del Standard MIDI File pista por pista, empareja note-on y
+note-off y genera las notas y acordes con su compás, sin cuantizar ni construir
+streams de music21
+"""
+
+import heapq
+import struct
+from fractions import Fraction
+
+from lector_musicxml import NotaXML, _duracion_en_negras
+
+# Nombre de cada clase de altura con la ortografía que usa music21 para MIDI
+NOMBRES_MIDI = ('C', 'C#', 'D', 'E-', 'E', 'F', 'F#', 'G', 'G#', 'A', 'B-', 'B')
+
+# Bytes de datos de cada mensaje de canal (según los 4 bits altos del estado)
+BYTES_MENSAJE = {0x80: 2, 0x90: 2, 0xA0: 2, 0xB0: 2, 0xC0: 1, 0xD0: 1, 0xE0: 2}
+
+
+class ErrorLecturaMIDI(Exception):
+    """El archivo no se puede leer con el lector rápido (usar music21)"""
+
+
+def _leer_varlen(datos, posicion):
+    """Lee un número de longitud variable; devuelve (valor, nueva posición)"""
+    valor = 0
+    while True:
+        byte = datos[posicion]
+        posicion += 1
+        valor = (valor << 7) | (byte & 0x7F)
+        if byte < 0x80:
+            return valor, posicion
+
+
+class MapaCompases:
+    """
+    Convierte ticks en (compás, posición en negras dentro del compás)
+
+    Los cambios de compás (meta 0x58) se registran en orden de tiempo; antes del
+    primero se asume 4/4. Los compases se numeran desde 1.
+
+    Args:
+        division (int): Ticks por negra del archivo
+    """
+
+    def __init__(self, division):
+        self.division = division
+        # (tick de inicio, compás de inicio, ticks por compás)
+        self.tramos = [(0, 1, Fraction(4 * division))]
+
+    def cambiar(self, tick, numerador, exponente_denominador):
+        """Registra un cambio de compás (numerador / 2**exponente) en un tick"""
+        ticks_por_compas = Fraction(4 * self.division * numerador, 2 ** exponente_denominador)
+        inicio, compas, largo = self.tramos[-1]
+        if tick < inicio:
+            return
+        # El cambio empieza un compás nuevo aunque llegue a mitad de uno (se redondea hacia arriba)
+        transcurridos = -(-(tick - inicio) // largo)
+        if tick == inicio:
+            self.tramos[-1] = (inicio, compas, ticks_por_compas)
+        else:
+            self.tramos.append((tick, compas + int(transcurridos), ticks_por_compas))
+
+    def posicion(self, tick):
+        """
+        Returns:
+            tuple: (número de compás, posición dentro del compás en negras como float)
+        """
+        for inicio, compas, largo in reversed(self.tramos):
+            if tick >= inicio:
+                break
+        completos, resto = divmod(tick - inicio, largo)
+        return compas + int(completos), float(resto / self.division)
+
+    def compases_hasta(self, tick):
+        """Número de compases que ocupa una parte que termina en 'tick'"""
+        if tick <= 0:
+            return 0
+        compas, offset = self.posicion(tick)
+        return compas - 1 if offset == 0 else compas
+
+
+class LectorMIDI:
+    """
+    Lector incremental de un Standard MIDI File (formatos 0 y 1)
+
+    Cada pista con notas es una parte (en el formato 0, cada canal). Las notas
+    se obtienen con el generador notas(); los contadores (partes, compases) se
+    completan a medida que se recorre el archivo. Las notas de igual inicio y
+    duración dentro de una parte forman un acorde.
+
+    Args:
+        ruta (str): Ruta al archivo MIDI
+    """
+
+    def __init__(self, ruta):
+        self.ruta = str(ruta)
+        self.titulo = None
+        self.compositor = None
+        self.num_partes = 0
+        self.compases_por_parte = []
+        self.formato = None
+        self.division = None
+
+    def notas(self):
+        """
+        Genera las notas y acordes parte por parte y, dentro de cada parte, por
+        tiempo de inicio
+
+        Yields:
+            NotaXML: Nota o acorde con su compás, posición y duración en negras
+        """
+        with open(self.ruta, 'rb') as flujo:
+            yield from self._recorrer(flujo)
+
+    def _recorrer(self, flujo):
+        cabecera = flujo.read(14)
+        if len(cabecera) < 14 or cabecera[:4] != b'MThd':
+            raise ErrorLecturaMIDI("No es un archivo MIDI estándar")
+        longitud, formato, num_pistas, division = struct.unpack('>IHHH', cabecera[4:])
+        flujo.seek(longitud - 6, 1)
+        if formato > 1:
+            raise ErrorLecturaMIDI(f"Formato MIDI {formato} no soportado por el lector rápido")
+        if division & 0x8000:
+            raise ErrorLecturaMIDI("División SMPTE no soportada por el lector rápido")
+        self.formato = formato
+        self.division = division
+        mapa = MapaCompases(division)
+
+        for _ in range(num_pistas):
+            datos = self._leer_pista(flujo)
+            if datos is None:
+                break
+            if formato == 0:
+                # Una sola pista con todos los canales: cada canal es una parte
+                por_canal = {}
+                for nota in self._notas_pista(datos, mapa):
+                    por_canal.setdefault(nota[0], []).append(nota[1:])
+                for canal in sorted(por_canal):
+                    yield from self._emitir_parte(iter(por_canal[canal]), mapa)
+            else:
+                yield from self._emitir_parte((nota[1:] for nota in self._notas_pista(datos, mapa)), mapa)
+
+    def _leer_pista(self, flujo):
+        """Lee el siguiente bloque MTrk (saltando bloques desconocidos); None al terminar"""
+        while True:
+            cabecera = flujo.read(8)
+            if len(cabecera) < 8:
+                return None
+            tipo, longitud = cabecera[:4], struct.unpack('>I', cabecera[4:])[0]
+            datos = flujo.read(longitud)
+            if tipo == b'MTrk':
+                return datos
+
+    def _notas_pista(self, datos, mapa):
+        """
+        Empareja los note-on y note-off de una pista
+
+        Las notas se generan en orden de inicio en cuanto ya no puede empezar otra
+        antes, de modo que solo se retienen las notas que suenan a la vez.
+
+        Yields:
+            tuple: (canal, tick de inicio, tick de fin, altura MIDI)
+        """
+        posicion = 0
+        tick = 0
+        estado = None
+        # (canal, altura) → ticks de inicio de las notas que suenan (FIFO)
+        activas = {}
+        terminadas = []
+        secuencia = 0
+        fin = len(datos)
+
+        while posicion < fin:
+            delta, posicion = _leer_varlen(datos, posicion)
+            tick += delta
+
+            # Notas terminadas que empiezan antes que cualquier nota activa y que el tick actual
+            if terminadas:
+                limite = min([tick] + [inicios[0] for inicios in activas.values()])
+                while terminadas and terminadas[0][0] < limite:
+                    inicio, _, final, canal, altura = heapq.heappop(terminadas)
+                    yield canal, inicio, final, altura
+
+            byte = datos[posicion]
+            if byte == 0xFF:
+                tipo = datos[posicion + 1]
+                longitud, posicion = _leer_varlen(datos, posicion + 2)
+                if tipo == 0x58 and longitud >= 2:
+                    mapa.cambiar(tick, datos[posicion], datos[posicion + 1])
+                posicion += longitud
+                if tipo == 0x2F:
+                    break
+                continue
+            if byte in (0xF0, 0xF7):
+                longitud, posicion = _leer_varlen(datos, posicion + 1)
+                posicion += longitud
+                estado = None
+                continue
+
+            if byte & 0x80:
+                estado = byte
+                posicion += 1
+            elif estado is None:
+                raise ErrorLecturaMIDI("Datos MIDI sin byte de estado")
+            tipo, canal = estado & 0xF0, estado & 0x0F
+            if tipo == 0x90 and datos[posicion + 1] > 0:
+                activas.setdefault((canal, datos[posicion]), []).append(tick)
+            elif tipo == 0x80 or tipo == 0x90:
+                clave = (canal, datos[posicion])
+                inicios = activas.get(clave)
+                if inicios:
+                    heapq.heappush(terminadas, (inicios.pop(0), secuencia, tick) + clave)
+                    secuencia += 1
+                    if not inicios:
+                        del activas[clave]
+            posicion += BYTES_MENSAJE.get(tipo, 0)
+
+        # Notas sin note-off: terminan con la pista
+        for (canal, altura), inicios in activas.items():
+            for inicio in inicios:
+                heapq.heappush(terminadas, (inicio, secuencia, tick, canal, altura))
+                secuencia += 1
+        while terminadas:
+            inicio, _, final, canal, altura = heapq.heappop(terminadas)
+            yield canal, inicio, final, altura
+
+    def _emitir_parte(self, notas, mapa):
+        """
+        Agrupa en acordes las notas (inicio, fin, altura) de una parte y las genera
+        como NotaXML; las partes sin notas no cuentan
+        """
+        parte = self.num_partes
+        grupo = []
+        ultimo_fin = None
+
+        for inicio, final, altura in notas:
+            if grupo and inicio != grupo[0][0]:
+                yield from self._acordes(grupo, mapa, parte)
+                grupo = []
+            grupo.append((inicio, final, altura))
+            ultimo_fin = final if ultimo_fin is None else max(ultimo_fin, final)
+        if grupo:
+            yield from self._acordes(grupo, mapa, parte)
+
+        if ultimo_fin is not None:
+            self.num_partes += 1
+            self.compases_por_parte.append(mapa.compases_hasta(ultimo_fin))
+
+    def _acordes(self, grupo, mapa, parte):
+        """Genera las notas de igual inicio: un acorde por cada duración distinta"""
+        inicio = grupo[0][0]
+        compas, offset = mapa.posicion(inicio)
+        por_duracion = {}
+        for _, final, altura in grupo:
+            por_duracion.setdefault(final - inicio, []).append(altura)
+
+        for ticks in sorted(por_duracion):
+            alturas = sorted(set(por_duracion[ticks]))
+            nombres = tuple(NOMBRES_MIDI[altura % 12] for altura in alturas)
+            octavas = tuple(altura // 12 - 1 for altura in alturas)
+            tipo = 'Acorde' if len(alturas) > 1 else 'Nota'
+            yield NotaXML(tipo, nombres, octavas, compas, offset,
+                          _duracion_en_negras(ticks, self.division), parte)
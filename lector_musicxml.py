@@ -0,0 +1,285 @@
+#!/usr/bin/env python3
+"""
+Lector rápido de MusicXML (.mxl/.xml/.musicxml) sin music21
+Recorre el XML de forma incremental y genera las notas y acordes con su compás,
+sin construir el árbol de objetos de music21
+"""
+
+import re
+import zipfile
+import xml.etree.ElementTree as ET
+from collections import namedtuple
+from fractions import Fraction
+from pathlib import Path
+
+# Nota o acorde extraído del XML. 'nombres' y 'octavas' tienen un valor por altura;
+# los nombres usan el mismo formato que pitch.name de music21 (ej: 'C#', 'B-')
+NotaXML = namedtuple('NotaXML', ['tipo', 'nombres', 'octavas', 'compas', 'offset', 'duracion', 'parte'])
+
+ALTERACIONES = {-2: '--', -1: '-', 0: '', 1: '#', 2: '##'}
+
+
+class ErrorLecturaMusicXML(Exception):
+    """El archivo no se puede leer con el lector rápido (usar music21)"""
+
+
+def _etiqueta(elemento):
+    """Nombre de la etiqueta sin espacio de nombres"""
+    return elemento.tag.rsplit('}', 1)[-1]
+
+
+def _numero_compas(texto):
+    """Número de compás como entero ('12a' → 12); None si no tiene dígitos"""
+    coincidencia = re.match(r'\s*(\d+)', texto or '')
+    return int(coincidencia.group(1)) if coincidencia else None
+
+
+def _duracion_en_negras(divisiones, divisions):
+    """
+    Convierte una duración en divisiones a negras, igual que music21:
+    float si es exacta en binario, Fraction en caso contrario (tresillos)
+    """
+    valor = Fraction(divisiones, divisions)
+    if valor.denominator & (valor.denominator - 1) == 0:
+        return float(valor)
+    return valor
+
+
+def abrir_musicxml(ruta):
+    """
+    Abre el XML de una partitura como flujo binario
+
+    Los .mxl se descomprimen en memoria leyendo el rootfile indicado en
+    META-INF/container.xml.
+    """
+    ruta = Path(ruta)
+    if ruta.suffix.lower() != '.mxl':
+        return open(ruta, 'rb')
+
+    zf = zipfile.ZipFile(ruta)
+    nombre = None
+    try:
+        contenedor = ET.fromstring(zf.read('META-INF/container.xml'))
+        for elemento in contenedor.iter():
+            if _etiqueta(elemento) == 'rootfile':
+                nombre = elemento.get('full-path')
+                break
+    except KeyError:
+        pass
+
+    if not nombre:
+        candidatos = [n for n in zf.namelist()
+                      if not n.startswith('META-INF/') and n.lower().endswith(('.xml', '.musicxml'))]
+        if not candidatos:
+            zf.close()
+            raise ErrorLecturaMusicXML(f"No se encontró el XML dentro de '{ruta}'")
+        nombre = candidatos[0]
+
+    return zf.open(nombre)
+
+
+# Inicio y cierre de cada <part> de primer nivel (no coincide con part-list, part-name...)
+_INICIO_PARTE = re.compile(rb'<part[\s>]')
+_FIN_PARTE = re.compile(rb'</part\s*>')
+# Identificador de una parte, la part-list y cada score-part de la cabecera
+_ID_PARTE = re.compile(rb'<part\s[^>]*?\bid\s*=\s*["\']([^"\']*)["\']')
+_LISTA_PARTES = re.compile(rb'<part-list\b.*?</part-list\s*>', re.S)
+_PARTE_EN_LISTA = re.compile(rb'<score-part\s[^>]*?\bid\s*=\s*["\']([^"\']*)["\'].*?</score-part\s*>', re.S)
+
+
+def dividir_partes(ruta):
+    """
+    Separa el XML de una partitura en la cabecera y el texto de cada parte
+
+    La cabecera (todo lo anterior a la primera parte: título, part-list...) más
+    el texto de una parte y el cierre forman un MusicXML válido con solo esa
+    parte, que se puede analizar por separado.
+
+    Args:
+        ruta (str): Ruta a la partitura (.mxl, .xml o .musicxml)
+
+    Returns:
+        tuple: (cabecera, [texto de cada parte], cierre) como bytes
+
+    Raises:
+        ErrorLecturaMusicXML: Si las partes no se pueden delimitar con seguridad
+    """
+    with abrir_musicxml(ruta) as flujo:
+        datos = flujo.read()
+
+    inicios = [m.start() for m in _INICIO_PARTE.finditer(datos)]
+    fines = [m.end() for m in _FIN_PARTE.finditer(datos)]
+    if not inicios or len(inicios) != len(fines):
+        raise ErrorLecturaMusicXML("No se pudieron delimitar las partes")
+    # Cada parte debe cerrarse antes de que empiece la siguiente (sin anidamientos)
+    if any(fin < inicio for inicio, fin in zip(inicios, fines)) or \
+            any(siguiente < fin for fin, siguiente in zip(fines, inicios[1:])):
+        raise ErrorLecturaMusicXML("No se pudieron delimitar las partes")
+
+    partes = [datos[inicio:fin] for inicio, fin in zip(inicios, fines)]
+    return datos[:inicios[0]], partes, datos[fines[-1]:]
+
+
+def cabecera_de_parte(cabecera, parte):
+    """
+    Reduce la part-list de la cabecera a la score-part de una sola parte
+
+    Los part-group y las demás score-part se quitan: nombran partes que no
+    están en el documento de una sola parte y music21 no lo podría analizar.
+
+    Args:
+        cabecera (bytes): Cabecera devuelta por dividir_partes()
+        parte (bytes): Texto de una de las partes
+
+    Returns:
+        bytes: Cabecera con solo esa parte en la part-list
+
+    Raises:
+        ErrorLecturaMusicXML: Si la parte no figura en la part-list
+    """
+    identificador = _ID_PARTE.match(parte)
+    lista = _LISTA_PARTES.search(cabecera)
+    if identificador and lista:
+        for entrada in _PARTE_EN_LISTA.finditer(lista.group()):
+            if entrada.group(1) == identificador.group(1):
+                return (cabecera[:lista.start()] + b'<part-list>' + entrada.group() + b'</part-list>'
+                        + cabecera[lista.end():])
+    raise ErrorLecturaMusicXML("La parte no figura en la part-list")
+
+
+class LectorMusicXML:
+    """
+    Lector incremental de una partitura MusicXML (score-partwise)
+
+    Las notas se obtienen con el generador notas(). Los metadatos y los
+    contadores (título, compositor, partes, compases) se completan a medida
+    que se recorre el archivo.
+    """
+
+    def __init__(self, ruta):
+        self.ruta = str(ruta)
+        self.titulo = None
+        self.compositor = None
+        self.num_partes = 0
+        self.compases_por_parte = []
+
+    def notas(self):
+        """
+        Genera las notas y acordes de la partitura en el orden de music21:
+        parte por parte y, dentro de cada parte, pentagrama por pentagrama
+
+        Yields:
+            NotaXML: Nota, acorde u otro elemento con altura indefinida
+        """
+        with abrir_musicxml(self.ruta) as flujo:
+            yield from self._recorrer(flujo)
+
+    def _recorrer(self, flujo):
+        eventos = ET.iterparse(flujo, events=('start', 'end'))
+        raiz = None
+        en_parte = False
+        parte = -1
+        divisions = 1
+        posicion = 0
+        posicion_anterior = 0
+        compas = None
+        compases = 0
+        # Notas de la parte actual agrupadas por pentagrama (se vuelcan al cerrar la parte)
+        por_pentagrama = {}
+        ultima = None
+
+        for evento, elemento in eventos:
+            etiqueta = _etiqueta(elemento)
+
+            if evento == 'start':
+                if raiz is None:
+                    raiz = elemento
+                    if etiqueta != 'score-partwise':
+                        raise ErrorLecturaMusicXML(f"Formato '{etiqueta}' no soportado por el lector rápido")
+                elif etiqueta == 'part' and not en_parte:
+                    en_parte = True
+                    parte += 1
+                    divisions = 1
+                    compases = 0
+                    por_pentagrama = {}
+                    ultima = None
+                elif etiqueta == 'measure' and en_parte:
+                    compas = _numero_compas(elemento.get('number'))
+                    compases += 1
+                    posicion = posicion_anterior = 0
+                continue
+
+            # Eventos 'end'
+            if not en_parte:
+                if etiqueta == 'work-title':
+                    self.titulo = (elemento.text or '').strip() or None
+                elif etiqueta == 'creator' and elemento.get('type') == 'composer' and not self.compositor:
+                    self.compositor = (elemento.text or '').strip() or None
+                continue
+
+            if etiqueta == 'divisions':
+                divisions = int(float(elemento.text))
+            elif etiqueta == 'backup':
+                posicion -= int(elemento.findtext('duration', '0'))
+                elemento.clear()
+            elif etiqueta == 'forward':
+                posicion += int(elemento.findtext('duration', '0'))
+                elemento.clear()
+            elif etiqueta == 'note':
+                ultima = self._procesar_nota(elemento, parte, compas, divisions,
+                                             posicion, posicion_anterior, por_pentagrama, ultima)
+                if elemento.find('chord') is None:
+                    posicion_anterior = posicion
+                    if elemento.find('grace') is None:
+                        posicion += int(elemento.findtext('duration', '0'))
+                elemento.clear()
+            elif etiqueta == 'measure':
+                elemento.clear()
+            elif etiqueta == 'part':
+                en_parte = False
+                self.num_partes += 1
+                self.compases_por_parte.append(compases)
+                for pentagrama in sorted(por_pentagrama):
+                    yield from por_pentagrama[pentagrama]
+                por_pentagrama = {}
+                raiz.clear()
+
+    def _procesar_nota(self, elemento, parte, compas, divisions, posicion, posicion_anterior,
+                       por_pentagrama, ultima):
+        """Incorpora un elemento <note>; devuelve la última nota/acorde emitida"""
+        if elemento.find('rest') is not None:
+            return None
+
+        es_acorde = elemento.find('chord') is not None
+        altura = elemento.find('pitch')
+
+        if altura is not None:
+            alter = int(round(float(altura.findtext('alter', '0'))))
+            nombre = altura.findtext('step', '').strip() + ALTERACIONES.get(alter, '')
+            octava = int(altura.findtext('octave', '4'))
+        else:
+            nombre, octava = None, None
+
+        # Nota añadida a un acorde: se suma a la última nota emitida
+        if es_acorde and ultima is not None and nombre is not None:
+            lista, indice = ultima
+            anterior = lista[indice]
+            lista[indice] = anterior._replace(tipo='Acorde', nombres=anterior.nombres + (nombre,),
+                                              octavas=anterior.octavas + (octava,))
+            return ultima
+
+        if elemento.find('grace') is not None:
+            duracion = 0.0
+        else:
+            duracion = _duracion_en_negras(int(elemento.findtext('duration', '0')), divisions)
+        offset = posicion_anterior if es_acorde else posicion
+
+        if nombre is not None:
+            nota = NotaXML('Nota', (nombre,), (octava,), compas, float(Fraction(offset, divisions)), duracion, parte)
+        else:
+            nota = NotaXML('Otro', ('Unpitched',), (None,), compas, float(Fraction(offset, divisions)), duracion, parte)
+
+        pentagrama = int(elemento.findtext('staff', '1'))
+        lista = por_pentagrama.setdefault(pentagrama, [])
+        lista.append(nota)
+        return lista, len(lista) - 1
@@ -0,0 +1,314 @@
+#!/usr/bin/env python3
+"""
+Servicio de conversión de partituras de larga duración
+Importa music21 una sola vez y recibe trabajos por una API HTTP local (TCP o
+socket Unix) con una cola asyncio acotada. Cada trabajador ejecuta su conversión
+en un hilo, así Audiveris y el análisis no bloquean el bucle de eventos.
+
+API:
+    POST /trabajos        {"archivo": "...", "formato": "txt", "exportar": true, "limpiar": true}
+                          → 202 {"id": ...}; 503 con Retry-After si la cola está llena
+                          'archivo' es un PDF, MusicXML o MIDI; 'exportar' y 'limpiar'
+                          son booleanos de JSON (otro tipo → 400)
+    GET  /trabajos/<id>   → estado y resultado del trabajo
+    GET  /estado          → tamaño de la cola, trabajadores y contadores
+"""
+
+import sys
+import json
+import time
+import uuid
+import asyncio
+import signal
+from collections import OrderedDict
+from pathlib import Path
+
+import exportadores
+from bardoneon import ConversorPartitura, music21
+
+# Trabajos terminados que se conservan para consultar su resultado
+MAX_TRABAJOS_GUARDADOS = 1000
+MAX_TAM_PETICION = 64 * 1024
+# Entradas que acepta el servicio: los PDF pasan por Audiveris, el resto se analiza directamente
+EXTENSIONES_ACEPTADAS = ('.pdf', '.mxl', '.xml', '.musicxml', '.mid', '.midi')
+
+ESTADOS_HTTP = {200: 'OK', 202: 'Accepted', 400: 'Bad Request', 404: 'Not Found',
+                405: 'Method Not Allowed', 413: 'Payload Too Large', 503: 'Service Unavailable'}
+
+
+class ServicioConversion:
+    """
+    Cola acotada de trabajos de conversión atendida por varios trabajadores
+
+    Args:
+        trabajadores (int): Conversiones simultáneas (cada una puede lanzar una JVM de Audiveris)
+        tam_cola (int): Trabajos pendientes admitidos antes de rechazar nuevos
+        opciones_conversor (dict): Argumentos para construir el ConversorPartitura de cada trabajador
+    """
+
+    def __init__(self, trabajadores=2, tam_cola=32, opciones_conversor=None):
+        self.num_trabajadores = trabajadores
+        self.tam_cola = tam_cola
+        self.opciones_conversor = opciones_conversor or {}
+        self.cola = None
+        self.trabajos = OrderedDict()
+        self.contadores = {'recibidos': 0, 'rechazados': 0, 'terminados': 0, 'fallidos': 0}
+        self._tareas = []
+
+    async def iniciar(self):
+        """Crea la cola y los trabajadores (cada uno con su propio conversor)"""
+        self.cola = asyncio.Queue(maxsize=self.tam_cola)
+        for numero in range(self.num_trabajadores):
+            conversor = ConversorPartitura(**self.opciones_conversor)
+            self._tareas.append(asyncio.create_task(self._trabajador(numero, conversor)))
+
+    async def detener(self):
+        """Cancela los trabajadores (los trabajos en curso terminan en su hilo)"""
+        for tarea in self._tareas:
+            tarea.cancel()
+        await asyncio.gather(*self._tareas, return_exceptions=True)
+
+    def encolar(self, peticion):
+        """
+        Valida una petición y la agrega a la cola
+
+        Args:
+            peticion (dict): archivo y, opcionalmente, formato, exportar y limpiar (booleanos)
+
+        Returns:
+            tuple: (código HTTP, cuerpo de la respuesta)
+        """
+        archivo = peticion.get('archivo')
+        if not archivo or not isinstance(archivo, str):
+            return 400, {'error': "Falta 'archivo'"}
+        if not Path(archivo).exists():
+            return 400, {'error': f"El archivo '{archivo}' no existe"}
+        if not archivo.lower().endswith(EXTENSIONES_ACEPTADAS):
+            return 400, {'error': "El archivo debe ser un PDF, un MusicXML o un MIDI"}
+        formato = peticion.get('formato') or self.opciones_conversor.get('formato', 'txt')
+        if formato not in exportadores.FORMATOS:
+            return 400, {'error': f"Formato '{formato}' no soportado ({', '.join(exportadores.FORMATOS)})"}
+        # Solo booleanos de JSON: bool("false") sería True
+        for opcion in ('exportar', 'limpiar'):
+            if not isinstance(peticion.get(opcion, True), bool):
+                return 400, {'error': f"'{opcion}' debe ser true o false"}
+
+        trabajo = {
+            'id': uuid.uuid4().hex,
+            'archivo': archivo,
+            'formato': formato,
+            'exportar': peticion.get('exportar', True),
+            'limpiar': peticion.get('limpiar', True),
+            'estado': 'en_cola',
+            'recibido': time.time(),
+        }
+
+        self.contadores['recibidos'] += 1
+        try:
+            self.cola.put_nowait(trabajo)
+        except asyncio.QueueFull:
+            self.contadores['rechazados'] += 1
+            return 503, {'error': 'Cola llena, reintentar más tarde', 'en_cola': self.cola.qsize()}
+
+        self._guardar_trabajo(trabajo)
+        return 202, {'id': trabajo['id'], 'estado': trabajo['estado'], 'en_cola': self.cola.qsize()}
+
+    def consultar(self, id_trabajo):
+        """Devuelve (código HTTP, cuerpo) con el estado de un trabajo"""
+        trabajo = self.trabajos.get(id_trabajo)
+        if trabajo is None:
+            return 404, {'error': f"Trabajo '{id_trabajo}' desconocido"}
+        return 200, trabajo
+
+    def estado(self):
+        """Resumen del servicio"""
+        return {
+            'en_cola': self.cola.qsize(),
+            'tam_cola': self.tam_cola,
+            'trabajadores': self.num_trabajadores,
+            'en_proceso': sum(1 for t in self.trabajos.values() if t['estado'] == 'procesando'),
+            **self.contadores,
+        }
+
+    def _guardar_trabajo(self, trabajo):
+        """Registra un trabajo y descarta los terminados más antiguos si hay demasiados"""
+        self.trabajos[trabajo['id']] = trabajo
+        while len(self.trabajos) > MAX_TRABAJOS_GUARDADOS:
+            id_antiguo, antiguo = next(iter(self.trabajos.items()))
+            if antiguo['estado'] in ('en_cola', 'procesando'):
+                break
+            del self.trabajos[id_antiguo]
+
+    async def _trabajador(self, numero, conversor):
+        """Atiende trabajos de la cola uno a uno; la conversión se ejecuta en un hilo"""
+        while True:
+            trabajo = await self.cola.get()
+            trabajo['estado'] = 'procesando'
+            trabajo['trabajador'] = numero
+            inicio = time.perf_counter()
+            try:
+                exito = await asyncio.to_thread(self._convertir, conversor, trabajo)
+                trabajo['estado'] = 'terminado' if exito else 'fallido'
+                if exito and trabajo['exportar']:
+                    trabajo['resultado'] = conversor.archivo_exportacion(trabajo['archivo'])
+            except Exception as e:
+                trabajo['estado'] = 'fallido'
+                trabajo['error'] = str(e)
+            finally:
+                trabajo['duracion'] = time.perf_counter() - inicio
+                self.contadores['terminados' if trabajo['estado'] == 'terminado' else 'fallidos'] += 1
+                self.cola.task_done()
+            print(f"{'✅' if trabajo['estado'] == 'terminado' else '❌'} {trabajo['archivo']} "
+                  f"({trabajo['duracion']:.1f} s, trabajador {numero})")
+
+    def _convertir(self, conversor, trabajo):
+        """Ejecuta un trabajo con el conversor del trabajador (en un hilo aparte)"""
+        conversor.formato = trabajo['formato']
+        if trabajo['archivo'].lower().endswith('.pdf'):
+            return conversor.procesar_archivo_completo(trabajo['archivo'], trabajo['exportar'], trabajo['limpiar'])
+        with conversor.instrumentacion.documento(trabajo['archivo'], formato=trabajo['formato']) as registro:
+            registro['exito'] = conversor.leer_partitura(trabajo['archivo'], trabajo['exportar'])
+        return registro['exito']
+
+    async def atender(self, lector, escritor):
+        """Atiende una conexión HTTP/1.1 (una petición por conexión)"""
+        try:
+            codigo, cuerpo = await self._atender_peticion(lector)
+        except (asyncio.IncompleteReadError, ValueError) as e:
+            codigo, cuerpo = 400, {'error': f"Petición mal formada: {e}"}
+
+        datos = json.dumps(cuerpo, ensure_ascii=False, default=str).encode('utf-8')
+        cabeceras = [f"HTTP/1.1 {codigo} {ESTADOS_HTTP.get(codigo, '')}",
+                     'Content-Type: application/json; charset=utf-8',
+                     f"Content-Length: {len(datos)}",
+                     'Connection: close']
+        if codigo == 503:
+            cabeceras.append('Retry-After: 1')
+        escritor.write(('\r\n'.join(cabeceras) + '\r\n\r\n').encode('latin-1') + datos)
+        try:
+            await escritor.drain()
+        finally:
+            escritor.close()
+
+    async def _atender_peticion(self, lector):
+        """Lee una petición y la despacha; devuelve (código HTTP, cuerpo)"""
+        linea = (await lector.readline()).decode('latin-1').strip()
+        if not linea:
+            raise ValueError("petición vacía")
+        metodo, ruta, _ = linea.split(' ', 2)
+
+        longitud = 0
+        while True:
+            cabecera = (await lector.readline()).decode('latin-1').strip()
+            if not cabecera:
+                break
+            nombre, _, valor = cabecera.partition(':')
+            if nombre.strip().lower() == 'content-length':
+                longitud = int(valor)
+        if longitud > MAX_TAM_PETICION:
+            return 413, {'error': 'Petición demasiado grande'}
+
+        if ruta == '/estado' and metodo == 'GET':
+            return 200, self.estado()
+        if ruta == '/trabajos' and metodo == 'POST':
+            cuerpo = await lector.readexactly(longitud) if longitud else b'{}'
+            peticion = json.loads(cuerpo)
+            if not isinstance(peticion, dict):
+                raise ValueError("se esperaba un objeto JSON")
+            return self.encolar(peticion)
+        if ruta.startswith('/trabajos/') and metodo == 'GET':
+            return self.consultar(ruta[len('/trabajos/'):])
+        if ruta in ('/estado', '/trabajos') or ruta.startswith('/trabajos/'):
+            return 405, {'error': f"Método {metodo} no permitido en {ruta}"}
+        return 404, {'error': f"Ruta desconocida: {ruta}"}
+
+
+async def ejecutar_servicio(servicio, host='127.0.0.1', puerto=8765, socket_unix=None):
+    """
+    Inicia el servicio y atiende conexiones hasta recibir SIGINT o SIGTERM
+
+    Args:
+        servicio (ServicioConversion): Servicio a ejecutar
+        host (str): Dirección TCP (si no se usa socket Unix)
+        puerto (int): Puerto TCP
+        socket_unix (str): Ruta de un socket Unix (en lugar de TCP)
+    """
+    # Las CLIs importan music21 solo si lo necesitan; el servicio la carga una vez al arrancar
+    print(f"🎼 music21 {music21.VERSION_STR} cargado")
+    await servicio.iniciar()
+    if socket_unix:
+        servidor = await asyncio.start_unix_server(servicio.atender, path=socket_unix)
+        print(f"🎼 Servicio escuchando en unix:{socket_unix}")
+    else:
+        servidor = await asyncio.start_server(servicio.atender, host, puerto)
+        print(f"🎼 Servicio escuchando en http://{host}:{puerto}")
+    print(f"⚙️  {servicio.num_trabajadores} trabajadores, cola de {servicio.tam_cola} trabajos")
+
+    parar = asyncio.Event()
+    bucle = asyncio.get_running_loop()
+    for senal in (signal.SIGINT, signal.SIGTERM):
+        try:
+            bucle.add_signal_handler(senal, parar.set)
+        except (NotImplementedError, RuntimeError):  # Windows
+            pass
+
+    async with servidor:
+        await parar.wait()
+
+    print("🛑 Deteniendo servicio...")
+    await servicio.detener()
+    if socket_unix:
+        Path(socket_unix).unlink(missing_ok=True)
+
+
+def main():
+    """Función principal"""
+
+    # Opciones: --host H  --port N  --socket RUTA  --workers N  --queue-size N
+    #           --format F  --no-cache  --cache-dir DIR  --metrics archivo.jsonl  --scratch-dir DIR
+    host, puerto, socket_unix = '127.0.0.1', 8765, None
+    trabajadores, tam_cola = None, 32
+    opciones_conversor = {}
+    argumentos = sys.argv[1:]
+    try:
+        while argumentos:
+            opcion = argumentos.pop(0)
+            if opcion == '--host' and argumentos:
+                host = argumentos.pop(0)
+            elif opcion == '--port' and argumentos:
+                puerto = int(argumentos.pop(0))
+            elif opcion == '--socket' and argumentos:
+                socket_unix = argumentos.pop(0)
+            elif opcion == '--workers' and argumentos:
+                trabajadores = int(argumentos.pop(0))
+            elif opcion == '--queue-size' and argumentos:
+                tam_cola = int(argumentos.pop(0))
+            elif opcion == '--format' and argumentos:
+                opciones_conversor['formato'] = argumentos.pop(0).lower()
+            elif opcion == '--no-cache':
+                opciones_conversor['usar_cache'] = False
+            elif opcion == '--cache-dir' and argumentos:
+                opciones_conversor['directorio_cache'] = argumentos.pop(0)
+            elif opcion == '--metrics' and argumentos:
+                opciones_conversor['archivo_metricas'] = argumentos.pop(0)
+            elif opcion == '--scratch-dir' and argumentos:
+                opciones_conversor['directorio_trabajo'] = argumentos.pop(0)
+            else:
+                print(f"💡 Uso: python servicio.py [--host H] [--port N | --socket RUTA] [--workers N] "
+                      f"[--queue-size N] [--format F] [--no-cache] [--cache-dir DIR] [--metrics archivo.jsonl] "
+                      f"[--scratch-dir DIR]")
+                return 1
+    except ValueError:
+        print("❌ Error: --port, --workers y --queue-size requieren un número entero")
+        return 1
+
+    # Por defecto, tantos trabajadores como JVMs de Audiveris admiten los núcleos y la memoria
+    if trabajadores is None:
+        trabajadores = ConversorPartitura(**opciones_conversor).calcular_trabajos_paralelos()
+    servicio = ServicioConversion(max(1, trabajadores), max(1, tam_cola), opciones_conversor)
+    asyncio.run(ejecutar_servicio(servicio, host, puerto, socket_unix))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
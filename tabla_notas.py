@@ -0,0 +1,298 @@
+#!/usr/bin/env python3
+"""
+Tabla columnar de notas basada en arrays estructurados de NumPy
+Es la representación común de las notas extraídas: exportadores y estadísticas
+leen de aquí en lugar de consultar objetos de music21 nota por nota
+"""
+
+import numpy as np
+
+from lector_musicxml import NotaXML
+
+# Una fila por altura. Las alturas de un mismo acorde comparten 'grupo'
+DTYPE_NOTAS = np.dtype([
+    ('midi', np.int16),        # Número MIDI (-1 si no tiene altura definida)
+    ('paso', np.int8),         # 0..6 = C..B (-1 si no tiene altura definida)
+    ('alteracion', np.int8),   # -2..2 (bemoles negativos, sostenidos positivos)
+    ('octava', np.int8),
+    ('compas', np.int32),      # Número de compás (-1 si no se conoce)
+    ('offset', np.float64),    # Posición dentro del compás, en negras
+    ('duracion', np.float64),  # Duración en negras
+    ('parte', np.int16),
+    ('grupo', np.int32),       # Índice de la nota/acorde al que pertenece la fila
+])
+
+PASOS = np.array(['C', 'D', 'E', 'F', 'G', 'A', 'B'])
+PASOS_LATINOS = np.array(['Do', 'Re', 'Mi', 'Fa', 'Sol', 'La', 'Si'])
+SEMITONOS_PASO = np.array([0, 2, 4, 5, 7, 9, 11])
+SUFIJOS_ALTERACION = np.array(['--', '-', '', '#', '##'])
+
+
+def _separar_nombre(nombre):
+    """Separa un nombre de music21 ('C#', 'B-') en (paso, alteración)"""
+    paso = 'CDEFGAB'.find(nombre[:1].upper())
+    alteracion = nombre.count('#') - nombre.count('-')
+    return paso, alteracion
+
+
+class TablaNotas:
+    """
+    Notas de una partitura en un array estructurado (una fila por altura)
+
+    Args:
+        datos (numpy.ndarray): Array con dtype DTYPE_NOTAS
+        titulo (str): Título de la partitura
+        compositor (str): Compositor de la partitura
+        compases_por_parte (list): Número de compases de cada parte
+    """
+
+    def __init__(self, datos, titulo='Sin título', compositor='Desconocido', compases_por_parte=None):
+        self.datos = datos
+        self.titulo = titulo
+        self.compositor = compositor
+        self.compases_por_parte = list(compases_por_parte or [])
+
+    @classmethod
+    def desde_notas(cls, notas, **metadatos):
+        """
+        Construye la tabla en una sola pasada a partir de registros NotaXML
+
+        Args:
+            notas (iterable): NotaXML del lector rápido (o convertidos desde music21)
+            **metadatos: titulo, compositor y compases_por_parte
+
+        Returns:
+            TablaNotas: Tabla construida
+        """
+        filas = []
+        for grupo, nota in enumerate(notas):
+            compas = nota.compas if nota.compas is not None else -1
+            parte = nota.parte or 0
+            offset = float(nota.offset)
+            duracion = float(nota.duracion)
+
+            if nota.tipo == 'Otro':
+                filas.append((-1, -1, 0, 0, compas, offset, duracion, parte, grupo))
+                continue
+
+            for nombre, octava in zip(nota.nombres, nota.octavas):
+                paso, alteracion = _separar_nombre(nombre)
+                octava = octava if octava is not None else 4
+                midi = 12 * (octava + 1) + SEMITONOS_PASO[paso] + alteracion
+                filas.append((midi, paso, alteracion, octava, compas, offset, duracion, parte, grupo))
+
+        return cls(np.array(filas, dtype=DTYPE_NOTAS), **metadatos)
+
+    @classmethod
+    def concatenar(cls, tablas, **metadatos):
+        """
+        Une tablas extraídas por separado (ej: una por parte) en el orden recibido
+
+        Las partes de cada tabla se numeran desde 0 y se desplazan tras las de las
+        tablas anteriores (según sus compases_por_parte); los grupos se desplazan
+        para que sigan siendo únicos y consecutivos.
+
+        Args:
+            tablas (list): TablaNotas a unir
+            **metadatos: titulo y compositor de la tabla resultante
+
+        Returns:
+            TablaNotas: Tabla unida
+        """
+        bloques = []
+        compases_por_parte = []
+        desplazamiento = 0
+        for tabla in tablas:
+            datos = tabla.datos.copy()
+            datos['parte'] += len(compases_por_parte)
+            if len(datos):
+                datos['grupo'] += desplazamiento - datos['grupo'][0]
+                desplazamiento = int(datos['grupo'][-1]) + 1
+            bloques.append(datos)
+            compases_por_parte.extend(tabla.compases_por_parte)
+
+        datos = np.concatenate(bloques) if bloques else np.empty(0, dtype=DTYPE_NOTAS)
+        return cls(datos, compases_por_parte=compases_por_parte, **metadatos)
+
+    @classmethod
+    def cargar_npz(cls, ruta):
+        """Carga una tabla guardada con guardar_npz"""
+        with np.load(ruta, allow_pickle=False) as archivo:
+            return cls(archivo['notas'],
+                       titulo=str(archivo['titulo']),
+                       compositor=str(archivo['compositor']),
+                       compases_por_parte=archivo['compases_por_parte'].tolist())
+
+    def guardar_npz(self, ruta):
+        """
+        Guarda la tabla y sus metadatos en un archivo .npz comprimido
+
+        Args:
+            ruta (str): Ruta del archivo de salida
+        """
+        np.savez_compressed(ruta,
+                            notas=self.datos,
+                            titulo=np.array(self.titulo),
+                            compositor=np.array(self.compositor),
+                            compases_por_parte=np.array(self.compases_por_parte, dtype=np.int32))
+
+    def __len__(self):
+        """Número de notas y acordes (un acorde cuenta como un elemento)"""
+        if len(self.datos) == 0:
+            return 0
+        return 1 + int(np.count_nonzero(np.diff(self.datos['grupo'])))
+
+    @property
+    def num_partes(self):
+        return len(self.compases_por_parte)
+
+    @property
+    def num_compases(self):
+        """Compases de la parte más larga (las partes pueden tener distinto número)"""
+        return max(self.compases_por_parte, default=0)
+
+    def limites_grupos(self):
+        """
+        Índices de inicio y fin de cada nota/acorde dentro de la tabla
+
+        Returns:
+            tuple: (inicios, fines) como arrays de enteros
+        """
+        n = len(self.datos)
+        if n == 0:
+            vacio = np.empty(0, dtype=np.intp)
+            return vacio, vacio
+        cortes = np.flatnonzero(np.diff(self.datos['grupo'])) + 1
+        inicios = np.concatenate(([0], cortes))
+        fines = np.concatenate((cortes, [n]))
+        return inicios, fines
+
+    def subtabla(self, filas):
+        """
+        Tabla con solo algunas filas (ej: las de una consulta de IndicePartitura)
+
+        Args:
+            filas (numpy.ndarray): Índices de las filas a conservar, en orden
+
+        Returns:
+            TablaNotas: Nueva tabla con los mismos metadatos
+        """
+        return TablaNotas(self.datos[filas], titulo=self.titulo, compositor=self.compositor,
+                          compases_por_parte=self.compases_por_parte)
+
+    def nombres_alturas(self, latino=False):
+        """
+        Nombre de cada fila en formato music21 ('C#', 'B-'), o latino ('Do#', 'Si-')
+        si latino=True; 'Unpitched' para las filas sin altura definida
+        """
+        d = self.datos
+        con_altura = d['midi'] >= 0
+        pasos = PASOS_LATINOS if latino else PASOS
+        nombres = np.char.add(pasos[np.clip(d['paso'], 0, 6)],
+                              SUFIJOS_ALTERACION[np.clip(d['alteracion'] + 2, 0, 4)])
+        return np.where(con_altura, nombres, 'Unpitched')
+
+    def elementos(self, inicio=0, fin=None):
+        """
+        Genera las notas y acordes de la tabla como registros NotaXML
+
+        Args:
+            inicio (int): Primer elemento a generar
+            fin (int): Elemento final (exclusivo); None = hasta el último
+        """
+        inicios, fines = self.limites_grupos()
+        inicios, fines = inicios[inicio:fin], fines[inicio:fin]
+        if len(inicios) == 0:
+            return
+
+        d = self.datos
+        nombres = self.nombres_alturas()
+        octavas = d['octava']
+        for ini, fi in zip(inicios.tolist(), fines.tolist()):
+            fila = d[ini]
+            if fila['midi'] < 0:
+                tipo = 'Otro'
+            elif fi - ini == 1:
+                tipo = 'Nota'
+            else:
+                tipo = 'Acorde'
+            compas = int(fila['compas'])
+            yield NotaXML(tipo, tuple(nombres[ini:fi].tolist()), tuple(octavas[ini:fi].tolist()),
+                          compas if compas >= 0 else None, float(fila['offset']),
+                          float(fila['duracion']), int(fila['parte']))
+
+    def estadisticas(self):
+        """
+        Calcula estadísticas de la partitura de forma vectorizada
+
+        Returns:
+            dict: Conteos de elementos, alturas y acordes, rango de alturas
+                  (MIDI y nombre/octava de los extremos) y elementos por parte
+        """
+        d = self.datos
+        inicios, fines = self.limites_grupos()
+        con_altura = np.flatnonzero(d['midi'] >= 0)
+
+        estadisticas = {
+            'elementos': len(inicios),
+            'alturas': int(con_altura.size),
+            'acordes': int(np.count_nonzero(fines - inicios > 1)),
+            'midi_min': None,
+            'midi_max': None,
+            'nota_min': None,
+            'nota_max': None,
+            'elementos_por_parte': np.bincount(d['parte'][inicios], minlength=self.num_partes).tolist(),
+        }
+
+        if con_altura.size:
+            nombres = self.nombres_alturas()
+            midi = d['midi'][con_altura]
+            fila_min = con_altura[np.argmin(midi)]
+            fila_max = con_altura[np.argmax(midi)]
+            estadisticas['midi_min'] = int(d['midi'][fila_min])
+            estadisticas['midi_max'] = int(d['midi'][fila_max])
+            estadisticas['nota_min'] = (str(nombres[fila_min]), int(d['octava'][fila_min]))
+            estadisticas['nota_max'] = (str(nombres[fila_max]), int(d['octava'][fila_max]))
+
+        return estadisticas
+
+    def estadisticas_por_parte(self):
+        """
+        Calcula las estadísticas de cada parte por separado
+
+        Returns:
+            list: Un dict por parte, en orden, con su índice, elementos, alturas,
+                  compases y rango de alturas (MIDI y nombre/octava de los extremos)
+        """
+        d = self.datos
+        inicios, _ = self.limites_grupos()
+        num_partes = max(self.num_partes, int(d['parte'].max()) + 1 if len(d) else 0)
+        elementos = np.bincount(d['parte'][inicios], minlength=num_partes)
+        con_altura = d['midi'] >= 0
+        alturas = np.bincount(d['parte'][con_altura], minlength=num_partes)
+        nombres = self.nombres_alturas() if con_altura.any() else None
+
+        resultado = []
+        for parte in range(num_partes):
+            filas = np.flatnonzero(con_altura & (d['parte'] == parte))
+            estadisticas = {
+                'parte': parte,
+                'elementos': int(elementos[parte]),
+                'alturas': int(alturas[parte]),
+                'compases': self.compases_por_parte[parte] if parte < len(self.compases_por_parte) else 0,
+                'midi_min': None,
+                'midi_max': None,
+                'nota_min': None,
+                'nota_max': None,
+            }
+            if filas.size:
+                midi = d['midi'][filas]
+                fila_min = filas[np.argmin(midi)]
+                fila_max = filas[np.argmax(midi)]
+                estadisticas['midi_min'] = int(d['midi'][fila_min])
+                estadisticas['midi_max'] = int(d['midi'][fila_max])
+                estadisticas['nota_min'] = (str(nombres[fila_min]), int(d['octava'][fila_min]))
+                estadisticas['nota_max'] = (str(nombres[fila_max]), int(d['octava'][fila_max]))
+            resultado.append(estadisticas)
+
+        return resultado
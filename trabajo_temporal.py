@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Directorios de trabajo aislados para cada conversión
+Audiveris y los pasos intermedios escriben en un directorio propio de cada
+trabajo (en RAM si hay tmpfs); los resultados se mueven de forma atómica a su
+destino y el directorio se elimina completo al terminar
+"""
+
+import os
+import shutil
+import tempfile
+from pathlib import Path
+
+
+def base_trabajo_por_defecto():
+    """
+    Carpeta donde se crean los directorios de trabajo
+
+    Se puede cambiar con la variable de entorno BARDONEON_SCRATCH_DIR; si no,
+    se usa /dev/shm (tmpfs en Linux) cuando existe y admite escritura, y en
+    otro caso la carpeta temporal del sistema.
+    """
+    base = os.environ.get('BARDONEON_SCRATCH_DIR')
+    if base:
+        return base
+    if os.path.isdir('/dev/shm') and os.access('/dev/shm', os.W_OK | os.X_OK):
+        return '/dev/shm'
+    return tempfile.gettempdir()
+
+
+def directorio_trabajo(base=None, prefijo='bardoneon_'):
+    """
+    Crea un directorio de trabajo propio para un trabajo
+
+    Args:
+        base (str): Carpeta donde crearlo (None = base_trabajo_por_defecto())
+        prefijo (str): Prefijo del nombre del directorio
+
+    Returns:
+        tempfile.TemporaryDirectory: Contexto que devuelve la ruta y borra el
+                                     directorio completo al salir
+    """
+    base = base or base_trabajo_por_defecto()
+    Path(base).mkdir(parents=True, exist_ok=True)
+    return tempfile.TemporaryDirectory(prefix=prefijo, dir=base)
+
+
+def mover_atomico(origen, destino):
+    """
+    Mueve un archivo a su destino de forma que nunca se vea a medio escribir
+
+    Dentro del mismo sistema de archivos es un rename. Entre sistemas de archivos
+    distintos (ej: de /dev/shm al disco) se copia a un temporal junto al destino
+    y se renombra.
+
+    Args:
+        origen (str): Archivo a mover
+        destino (str): Ruta final
+
+    Returns:
+        str: Ruta final
+    """
+    destino = Path(destino)
+    try:
+        os.replace(origen, destino)
+        return str(destino)
+    except OSError:
+        pass
+
+    fd, temporal = tempfile.mkstemp(dir=destino.parent, prefix=f".{destino.name}.", suffix='.tmp')
+    os.close(fd)
+    try:
+        shutil.copyfile(origen, temporal)
+        os.replace(temporal, destino)
+    except Exception:
+        Path(temporal).unlink(missing_ok=True)
+        raise
+    Path(origen).unlink(missing_ok=True)
+    return str(destino)